@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.company.models import EnvModel
+from apps.pdf_kit.assets import invalidate_env_assets
+
+
+@receiver([post_save, post_delete], sender=EnvModel)
+def _invalidate_pdf_assets_on_env_change(sender, instance, **kwargs):
+    invalidate_env_assets()
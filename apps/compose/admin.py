@@ -7,6 +7,7 @@ from apps.compose.models import (
     Compose,
     ComposeStatus,
     ComposeLink,
+    ComposeRegisterCounter,
     Signer,
     Tag,
     TripVerification,
@@ -27,6 +28,12 @@ from apps.compose.models import (
 )
 
 
+@admin.register(ComposeRegisterCounter)
+class ComposeRegisterCounterAdmin(admin.ModelAdmin):
+    list_display = ['journal', 'last_number']
+    readonly_fields = ['journal', 'last_number']
+
+
 @admin.register(BusinessTrip)
 class BusinessTripAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_date', 'start_date', 'end_date', 'company', 'notice', 'order', 'travel_paper')
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Continues every journal from the highest number already allocated to its documents
+BACKFILL_SQL = """
+INSERT INTO compose_composeregistercounter (journal_id, last_number)
+SELECT journal_id, MAX(register_number_int)
+FROM compose_compose
+WHERE journal_id IS NOT NULL AND register_number_int IS NOT NULL
+GROUP BY journal_id
+ON CONFLICT (journal_id) DO UPDATE SET last_number = GREATEST(
+    compose_composeregistercounter.last_number, EXCLUDED.last_number)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0064_exceptionemployee_activation_comment_and_more'),
+        ('compose', '0102_signingpipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComposeRegisterCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('journal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='compose_counter', to='reference.journal')),
+            ],
+        ),
+        migrations.RunSQL(sql=BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
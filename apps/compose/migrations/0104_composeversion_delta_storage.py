@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compose', '0103_composeregistercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='composeversionmodel',
+            name='data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='composeversionmodel',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='compose.composeversionmodel'),
+        ),
+        migrations.AddField(
+            model_name='composeversionmodel',
+            name='storage',
+            field=models.CharField(choices=[('plain', 'Plain'), ('snapshot', 'Snapshot'), ('delta', 'Delta')], default='plain', max_length=10),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+from apps.compose.versioning import VERSION_SNAPSHOT_INTERVAL, decode_chain, encode_delta, encode_snapshot
+
+BATCH_SIZE = 500
+
+
+def _documents(ComposeVersionModel, storage):
+    return list(ComposeVersionModel.objects.filter(storage=storage)
+                .order_by().values_list('content_type_id', 'object_id').distinct())
+
+
+def compact_versions(apps, schema_editor):
+    """
+    Rewrites the plain versions of every document as snapshots and deltas.
+    """
+    ComposeVersionModel = apps.get_model('compose', 'ComposeVersionModel')
+
+    for content_type_id, object_id in _documents(ComposeVersionModel, 'plain'):
+        versions = list(ComposeVersionModel.objects
+                        .filter(content_type_id=content_type_id, object_id=object_id)
+                        .order_by('id').only('id', 'old_text', 'new_text'))
+        snapshot, base_text = None, None
+        for i, version in enumerate(versions):
+            if i % VERSION_SNAPSHOT_INTERVAL == 0:
+                snapshot = version
+                version.storage = 'snapshot'
+                version.snapshot_id = None
+                version.data = encode_snapshot(version.old_text, version.new_text)
+            else:
+                version.storage = 'delta'
+                version.snapshot_id = snapshot.id
+                version.data = encode_delta(base_text, version.old_text, version.new_text)
+            base_text = version.new_text
+            version.old_text = version.new_text = None
+        ComposeVersionModel.objects.bulk_update(versions, ['storage', 'snapshot_id', 'data', 'old_text', 'new_text'],
+                                                batch_size=BATCH_SIZE)
+
+
+def expand_versions(apps, schema_editor):
+    ComposeVersionModel = apps.get_model('compose', 'ComposeVersionModel')
+
+    for content_type_id, object_id in _documents(ComposeVersionModel, 'snapshot'):
+        versions = list(ComposeVersionModel.objects
+                        .filter(content_type_id=content_type_id, object_id=object_id)
+                        .exclude(storage='plain').order_by('id'))
+        texts, chain = [], []
+        for version in versions:
+            if version.storage == 'snapshot' and chain:
+                texts.extend(decode_chain(chain))
+                chain = []
+            chain.append((version.storage == 'snapshot', version.data))
+        texts.extend(decode_chain(chain))
+
+        for version, (old_text, new_text) in zip(versions, texts):
+            version.old_text, version.new_text = old_text, new_text
+            version.storage, version.snapshot_id, version.data = 'plain', None, None
+        ComposeVersionModel.objects.bulk_update(versions, ['storage', 'snapshot_id', 'data', 'old_text', 'new_text'],
+                                                batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compose', '0104_composeversion_delta_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_versions, expand_versions),
+    ]
@@ -9,9 +9,11 @@ from apps.compose.models.compose import (
     Compose,
     ComposeStatus,
     ComposeLink,
+    ComposeRegisterCounter,
     ComposeVersionModel,
     Approver,
     Signer,
+    SigningPipeline,
     Receiver,
     Tag,
     IABSActionHistory,
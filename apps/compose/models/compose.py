@@ -1,8 +1,11 @@
+from collections import defaultdict
+
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from apps.compose.versioning import VERSION_SNAPSHOT_INTERVAL, decode_chain, encode_delta, encode_snapshot
 from base_model.models import BaseModel
 from utils.constants import CONSTANTS
 
@@ -210,24 +213,120 @@ class Signer(BaseModel):
         return f'{self.id}'
 
 
+class ComposeRegisterCounter(models.Model):
+    """
+    Last register number allocated in a journal; bumped by `GenerateComposeRegisterNumber`.
+    """
+    journal = models.OneToOneField('reference.Journal', on_delete=models.CASCADE, related_name='compose_counter')
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.journal_id} - {self.last_number}'
+
+
+class SigningPipeline(BaseModel):
+    """
+    Work done after a signature is committed: registration, PDF rendering and upload, fan-out.
+    The steps run as a Celery chain (`apps.compose.tasks.signing`); finished steps are recorded
+    so a retry resumes at the step that failed.
+    """
+    compose = models.ForeignKey(Compose, on_delete=models.CASCADE, related_name='signing_pipelines')
+    signer = models.ForeignKey(Signer, on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='signing_pipelines')
+    user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True)
+    performers = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=20,
+                              choices=CONSTANTS.COMPOSE.SIGNING_STATUSES.CHOICES,
+                              default=CONSTANTS.COMPOSE.SIGNING_STATUSES.DEFAULT)
+    step = models.CharField(max_length=50, null=True, blank=True)
+    completed_steps = models.JSONField(default=list, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.compose_id} - {self.status}'
+
+
 class ComposeVersionModel(BaseModel):
+    """
+    One edit of a compose text. Versions are stored as periodic snapshots and zstandard-compressed
+    diffs in between (see `apps.compose.versioning`); `old_text`/`new_text` columns are only filled
+    for rows that predate it. Use `load_texts` to get the texts of any version.
+    """
+    STORAGE = CONSTANTS.COMPOSE.VERSION_STORAGE
+
     old_text = models.TextField(null=True)
     new_text = models.TextField(null=True)
     content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True)
     object_id = models.PositiveBigIntegerField(null=True)
     history_for = GenericForeignKey('content_type', 'object_id')
+    storage = models.CharField(max_length=10, choices=STORAGE.CHOICES, default=STORAGE.DEFAULT)
+    # the snapshot a delta version belongs to; the delta applies to the previous version of that chain
+    snapshot = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    data = models.BinaryField(null=True)
 
     def __str__(self):
         return f'History for {self.content_type} and {self.object_id}'
 
+    @property
+    def chain_id(self):
+        return self.id if self.storage == self.STORAGE.SNAPSHOT else self.snapshot_id
+
+    @classmethod
+    def _chains(cls, chain_ids, up_to_id=None):
+        """
+        Returns {snapshot id: [(version id, (old_text, new_text)), ...]} in version order.
+        """
+        queryset = cls.objects.filter(models.Q(id__in=chain_ids) | models.Q(snapshot_id__in=chain_ids))
+        if up_to_id is not None:
+            queryset = queryset.filter(id__lte=up_to_id)
+        rows = defaultdict(list)
+        for version in queryset.order_by('id').only('id', 'storage', 'snapshot_id', 'data'):
+            rows[version.chain_id].append(version)
+
+        chains = {}
+        for chain_id, versions in rows.items():
+            texts = decode_chain((v.storage == cls.STORAGE.SNAPSHOT, v.data) for v in versions)
+            chains[chain_id] = [(v.id, text) for v, text in zip(versions, texts)]
+        return chains
+
+    @classmethod
+    def load_texts(cls, versions):
+        """
+        Sets `old_text` and `new_text` of the given versions, reading each chain they belong to once.
+        """
+        encoded = [v for v in versions if v.storage != cls.STORAGE.PLAIN]
+        if not encoded:
+            return versions
+        chains = cls._chains({v.chain_id for v in encoded}, up_to_id=max(v.id for v in encoded))
+        texts = {version_id: text for chain in chains.values() for version_id, text in chain}
+        for version in encoded:
+            version.old_text, version.new_text = texts[version.id]
+        return versions
+
     @classmethod
     def create_history(cls, old_text: str, new_text: str, history_for, user_id):
-        cls(
-            old_text=old_text,
-            new_text=new_text,
-            history_for=history_for,
-            created_by_id=user_id
-        ).save()
+        content_type = ContentType.objects.get_for_model(history_for)
+        version = cls(history_for=history_for, created_by_id=user_id)
+
+        with transaction.atomic():
+            # versions of one document are written one at a time, each delta against its predecessor
+            list(type(history_for).objects.select_for_update().filter(pk=history_for.pk).values_list('pk'))
+            previous = cls.objects.filter(content_type=content_type, object_id=history_for.pk) \
+                .order_by('-id').only('id', 'storage', 'snapshot_id').first()
+
+            chain = []
+            if previous is not None and previous.storage != cls.STORAGE.PLAIN:
+                chain = cls._chains([previous.chain_id])[previous.chain_id]
+
+            if not chain or len(chain) >= VERSION_SNAPSHOT_INTERVAL:
+                version.storage = cls.STORAGE.SNAPSHOT
+                version.data = encode_snapshot(old_text, new_text)
+            else:
+                version.storage = cls.STORAGE.DELTA
+                version.snapshot_id = previous.chain_id
+                version.data = encode_delta(chain[-1][1][1], old_text, new_text)
+            version.save()
+        return version
 
 
 class IABSActionHistory(BaseModel):
@@ -13,6 +13,7 @@ from apps.compose.serializers.v1.compose.compose import (
     SignerDetailSerializer,
     SignerList2Serializer,
     SignerListSerializer,
+    SigningPipelineSerializer,
     TagCreateSerializer,
     TagSerializer,
 )
@@ -15,6 +15,7 @@ from apps.compose.models import (
     Compose,
     Approver,
     Signer,
+    SigningPipeline,
     Receiver,
     ComposeVersionModel,
     Tag,
@@ -129,6 +130,22 @@ class SignerListSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class SigningPipelineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SigningPipeline
+        fields = [
+            'id',
+            'compose',
+            'signer',
+            'status',
+            'step',
+            'completed_steps',
+            'error',
+            'created_date',
+            'modified_date',
+        ]
+
+
 class TagSerializer(serializers.ModelSerializer):
     document_sub_type = SelectItemField(model='reference.DocumentSubType', extra_field=['name'], required=False)
 
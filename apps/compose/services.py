@@ -1,13 +1,18 @@
 import os
 import re
+import time
 
 import requests
 from django.core.cache import cache
+from django.db import connection
 from django.utils.crypto import get_random_string
+from requests.adapters import HTTPAdapter
 
-from apps.compose.models import Compose
+from apps.compose.models import ComposeRegisterCounter
 from apps.user.models import User
+from utils.e_imzo import get_e_imzo_client
 from utils.exception import get_response_message, ValidationError2
+from utils.latency import LatencyStats
 from utils.tools import get_user_ip
 
 
@@ -32,11 +37,8 @@ class DigitalSignatureService:
         """
         This function is responsible for attaching timestamp to the pkcs7.
         """
-        url = os.getenv('TIMESTAMP_URL')
         try:
-            response = requests.post(url, data=self.pkcs7, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+            return get_e_imzo_client().attach_timestamp(self.pkcs7, self.headers)
         except requests.exceptions.RequestException as e:
             message = get_response_message(self.request, 625)
             message['message'] = message['message'].format(e=e)
@@ -48,11 +50,8 @@ class DigitalSignatureService:
         """
         ts = self.attache_timestamp()
         pkcs7 = ts.get('pkcs7b64')
-        url = os.getenv('VERIFY_ATTACHED')
         try:
-            response = requests.post(url, headers=self.headers, data=pkcs7)
-            response.raise_for_status()
-            return response.json()
+            return get_e_imzo_client().verify_attached(pkcs7, self.headers)
         except requests.exceptions.RequestException as e:
             message = get_response_message(self.request, 625)
             message['message'] = message['message'].format(e=e)
@@ -140,35 +139,77 @@ class DigitalSignatureService:
 
 
 class GenerateComposeRegisterNumber:
+    """
+    Allocates the next register number of a journal from `ComposeRegisterCounter`.
+
+    The counter row is created or incremented by a single INSERT ... ON CONFLICT DO UPDATE
+    RETURNING statement, so numbers of a journal are unique. Its row lock is held until the
+    surrounding transaction ends, so a registration allocates its number as its last step
+    before the writes that use it, like docflow's `allocate_reg_number`.
+    """
+    SQL = f"""
+        INSERT INTO {ComposeRegisterCounter._meta.db_table} (journal_id, last_number)
+        VALUES (%s, 1)
+        ON CONFLICT (journal_id) DO UPDATE SET last_number = {ComposeRegisterCounter._meta.db_table}.last_number + 1
+        RETURNING last_number
+    """
+
     def __init__(self, journal_index, journal_id):
         self.journal_index = journal_index
         self.journal_id = journal_id
 
+    def next_number(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(self.SQL, [self.journal_id])
+            return cursor.fetchone()[0]
+
     def generate(self):
-        last_object = (Compose.objects.filter(journal_id=self.journal_id,
-                                              register_number_int__isnull=False).
-                       order_by('-register_number_int').first())
-        new_register_number = last_object.register_number_int + 1
+        new_register_number = self.next_number()
         return f"{self.journal_index}/{new_register_number}", new_register_number
 
     def generate_power_of_attorney_number(self):
-        last_object = (Compose.objects.filter(journal_id=self.journal_id,
-                                              register_number_int__isnull=False).
-                       order_by('-register_number_int').first())
-        # Calculate the new register number
-        new_register_number = last_object.register_number_int + 1 if last_object else 1
+        new_register_number = self.next_number()
         # Format the register number with leading zeros (e.g., "00001")
         formatted_register_number = str(new_register_number).zfill(5)  # 5 digits
 
         return f"ISH-{formatted_register_number}", new_register_number
 
 
+# seconds to connect to IABS and to wait for its response
+IABS_CONNECT_TIMEOUT = float(os.getenv('IABS_CONNECT_TIMEOUT', 5))
+IABS_READ_TIMEOUT = float(os.getenv('IABS_READ_TIMEOUT', 60))
+# keep-alive connections per process, also the number of IABS calls a task runs in parallel
+IABS_POOL_SIZE = int(os.getenv('IABS_POOL_SIZE', 8))
+
+_iabs_sessions = {}
+
+
+def get_iabs_session() -> requests.Session:
+    # keyed by pid so that forked workers never share a parent's sockets
+    session = _iabs_sessions.get(os.getpid())
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=IABS_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session = _iabs_sessions.setdefault(os.getpid(), session)
+    return session
+
+
 class IABSRequestService:
+    """
+    Client of the IABS request service. Calls share a keep-alive session and
+    are safe to make from several threads; `stats` collects their latency per endpoint.
+    """
+
     def __init__(self):
         self.url = os.getenv('IABS_REQUEST_SERVICE_URL')
         self.username = os.getenv('IABS_USERNAME')
         self.password = os.getenv('IABS_PASSWORD')
         self.cache_token_key = "iabs_token"
+        self.session = get_iabs_session()
+        self.timeout = (IABS_CONNECT_TIMEOUT, IABS_READ_TIMEOUT)
+        self.stats = LatencyStats()
 
     def get_token(self):
         """
@@ -184,7 +225,7 @@ class IABSRequestService:
             'password': self.password
         }
         try:
-            response = requests.post(url, json=data)
+            response = self.session.post(url, json=data, timeout=self.timeout)
             response.raise_for_status()
             token = response.json().get('token')
             cache.set(self.cache_token_key, token, timeout=60 * 60 * 1)  # Cache the token for 1 hour
@@ -209,11 +250,14 @@ class IABSRequestService:
     def _send_request(self, url, data, endpoint=None):
         headers = self.get_headers()
         request_id = headers.get('requestId')
+        started = time.perf_counter()
+        ok = False
         try:
-            response = requests.post(url, json=data, headers=headers)
+            response = self.session.post(url, json=data, headers=headers, timeout=self.timeout)
             response.raise_for_status()
             result = response.json()
             result['request_id'] = request_id
+            ok = True
             return result
         except requests.exceptions.RequestException as e:
             msg = 'No response text available'
@@ -240,6 +284,8 @@ class IABSRequestService:
                 "endpoint": endpoint,
                 "request_id": request_id
             }
+        finally:
+            self.stats.record(endpoint, time.perf_counter() - started, ok)
 
     def create_order(self, data):
         url = f"{self.url}/1.0.0/create-order-doc"
@@ -1,3 +1,3 @@
-from apps.compose.tasks import utils
+from apps.compose.tasks import utils, signing
 
-__all__ = ['utils']
+__all__ = ['utils', 'signing']
@@ -0,0 +1,139 @@
+"""
+Asynchronous part of signing a compose document.
+
+`SignerViewSet.sign` commits the signature and creates a `SigningPipeline`;
+the steps below run afterwards as a Celery chain, one task per step.
+Every step is idempotent, so a retried or duplicated task never registers
+a document twice or uploads its PDF again, and the status of each transition
+is pushed to the signer's socket.
+"""
+import logging
+
+from celery import chain
+from django.db import transaction
+from django.utils import timezone
+
+from apps.compose.models import Compose, SigningPipeline
+from config.celery import app
+from config.middlewares.current_user import set_current_user
+from utils.constants import CONSTANTS
+from utils.global_socket import send_to_user_socket
+
+STATUSES = CONSTANTS.COMPOSE.SIGNING_STATUSES
+
+
+def register_step(pipeline):
+    """
+    Creates the base document. The compose row is locked, so concurrent pipelines of
+    the last two signers register it once; the register number is allocated only after
+    that check. Nothing is rendered here, so the journal's counter row is locked briefly.
+    """
+    from apps.compose.tools import register_document_after_signing
+
+    with transaction.atomic():
+        compose = Compose.objects.select_for_update().get(id=pipeline.compose_id)
+        if compose.registered_document_id:
+            return
+        register_document_after_signing(compose, pipeline.performers)
+
+
+def render_step(pipeline):
+    """
+    Renders the PDF of the registered document and of the decrees registered with it.
+    """
+    from apps.compose.tools import get_registered_compose_ids, render_registered_document
+
+    compose = Compose.objects.get(id=pipeline.compose_id)
+    for compose_id in get_registered_compose_ids(compose):
+        render_registered_document(compose_id)
+
+
+def upload_step(pipeline):
+    """
+    Uploads the rendered PDFs that are still pending or whose upload failed.
+    """
+    from apps.compose.tools import get_registered_compose_ids, upload_registered_document
+
+    compose = Compose.objects.get(id=pipeline.compose_id)
+    for compose_id in get_registered_compose_ids(compose):
+        upload_registered_document(compose_id)
+
+
+def notify_step(pipeline):
+    """
+    Tells the author and the signer that the document has been registered.
+    """
+    compose = Compose.objects.only('id', 'author_id', 'register_number', 'registered_document_id') \
+        .get(id=pipeline.compose_id)
+    if not compose.registered_document_id:
+        return
+    send_to_user_socket({
+        'type': 'compose_registered',
+        'compose_id': compose.id,
+        'register_number': compose.register_number,
+        'registered_document_id': compose.registered_document_id,
+    }, *{compose.author_id, pipeline.user_id} - {None})
+
+
+SIGNING_STEPS = {
+    'register': register_step,
+    'render': render_step,
+    'upload': upload_step,
+    'notify': notify_step,
+}
+
+
+def _set_status(pipeline, **fields):
+    for name, value in fields.items():
+        setattr(pipeline, name, value)
+    SigningPipeline.objects.filter(id=pipeline.id).update(modified_date=timezone.now(), **fields)
+    if pipeline.user_id:
+        send_to_user_socket({
+            'type': 'compose_signing',
+            'pipeline_id': pipeline.id,
+            'compose_id': pipeline.compose_id,
+            'status': pipeline.status,
+            'step': pipeline.step,
+            'error': pipeline.error,
+        }, pipeline.user_id)
+
+
+@app.task(bind=True, max_retries=2, default_retry_delay=30, name='compose.run_signing_step')
+def run_signing_step(self, pipeline_id, step):
+    pipeline = SigningPipeline.objects.select_related('user').get(id=pipeline_id)
+    if step in pipeline.completed_steps:
+        return
+
+    _set_status(pipeline, status=STATUSES.RUNNING, step=step)
+    # BaseModel and the action log read the acting user from the current thread
+    set_current_user(pipeline.user)
+    try:
+        SIGNING_STEPS[step](pipeline)
+    except Exception as e:
+        logging.exception(f"Signing pipeline {pipeline_id} failed at step {step}")
+        if self.request.retries < self.max_retries:
+            _set_status(pipeline, status=STATUSES.RETRYING, error=str(e))
+            raise self.retry(exc=e)
+        _set_status(pipeline, status=STATUSES.FAILED, error=str(e))
+        raise
+    finally:
+        set_current_user(None)
+
+    completed_steps = pipeline.completed_steps + [step]
+    is_last = len(completed_steps) == len(SIGNING_STEPS)
+    _set_status(pipeline,
+                completed_steps=completed_steps,
+                status=STATUSES.DONE if is_last else STATUSES.RUNNING,
+                error=None)
+
+
+def start_signing_pipeline(pipeline):
+    """
+    Enqueues the steps the pipeline has not finished yet; a failed pipeline resumes at its failed step.
+    """
+    steps = [step for step in SIGNING_STEPS if step not in pipeline.completed_steps]
+    if not steps:
+        return None
+    if pipeline.status == STATUSES.FAILED:
+        _set_status(pipeline, status=STATUSES.PENDING, error=None)
+    return chain(*[run_signing_step.si(pipeline.id, step) for step in steps]).apply_async()
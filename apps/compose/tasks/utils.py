@@ -1,12 +1,14 @@
 import logging
 import requests
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 
 from apps.compose.models import BusinessTrip, Compose, IABSActionHistory, IABSRequestCallHistory
-from apps.compose.services import IABSRequestService
+from apps.compose.services import IABSRequestService, IABS_POOL_SIZE
 from utils.tools import split_reg_number
 
 
@@ -37,14 +39,14 @@ def add_object_id_to_trip(self, notice_id, object_id, **kwargs):
         create_trip_verification(compose)
 
 
-def create_iabs_action(trip, status, action, compose_id=None,
-                       result=None, user_id=None, iabs_id=None,
-                       request_body=None, response_body=None,
-                       endpoint=None, type=None, request_id=None):
+def build_iabs_action(trip, status, action, compose_id=None,
+                      result=None, user_id=None, iabs_id=None,
+                      request_body=None, response_body=None,
+                      endpoint=None, type=None, request_id=None):
     """
-    This function creates an IABS action history entry for a given trip.
+    This function builds an unsaved IABS action history entry and its request call entry for a given trip.
     """
-    iabs_obj = IABSActionHistory.objects.create(
+    iabs_obj = IABSActionHistory(
         status=status,
         history_for=trip,
         result=result,
@@ -58,7 +60,7 @@ def create_iabs_action(trip, status, action, compose_id=None,
         type=type,
         request_id=request_id
     )
-    IABSRequestCallHistory.objects.create(
+    call = IABSRequestCallHistory(
         action_history=iabs_obj,
         caller_id=user_id,
         status=status,
@@ -66,19 +68,46 @@ def create_iabs_action(trip, status, action, compose_id=None,
         request_body=request_body,
         response_body=response_body
     )
+    return iabs_obj, call
+
+
+def save_iabs_actions(actions):
+    """
+    Writes (action history, request call) pairs built by `build_iabs_action`, one INSERT per table.
+    """
+    if not actions:
+        return
+    with transaction.atomic():
+        IABSActionHistory.objects.bulk_create([iabs_obj for iabs_obj, _ in actions])
+        for iabs_obj, call in actions:
+            call.action_history = iabs_obj
+        IABSRequestCallHistory.objects.bulk_create([call for _, call in actions])
+
+
+def create_iabs_action(trip, status, action, compose_id=None,
+                       result=None, user_id=None, iabs_id=None,
+                       request_body=None, response_body=None,
+                       endpoint=None, type=None, request_id=None):
+    """
+    This function creates an IABS action history entry for a given trip.
+    """
+    save_iabs_actions([build_iabs_action(trip, status, action, compose_id, result, user_id, iabs_id,
+                                         request_body, response_body, endpoint, type, request_id)])
 
 
 SENT = 'sent'
 FAILED = 'failed'
 
 
-def create_iabs_trip_order(trip_data, seen, service,
-                           hashmap, errors, compose_id,
-                           reg_series, reg_number, ord_data):
+def submit_iabs_trip_orders(executor, trip_data, service, errors,
+                            reg_series, reg_number, ord_data):
     """
-    Creates IABS orders per unique local_code and records action history.
+    Submits one IABS order per unique local_code to the executor.
     trip_data MUST be a queryset with user->company preloaded.
+    Returns {future: (local_code, trip, order_data)}.
     """
+    futures = {}
+    seen: set[str] = set()  # To track local codes that have already been submitted
     for t in trip_data:
         local_code = getattr(getattr(t.user, "company", None), "local_code", None)
         if not local_code:
@@ -97,33 +126,60 @@ def create_iabs_trip_order(trip_data, seen, service,
             "orderNumber": reg_series,  # number should be numeric part
             "orderSeria": reg_number,  # series should be alpha part
         }
+        futures[executor.submit(service.create_order, order_data)] = (local_code, t, order_data)
+    return futures
+
+
+def record_iabs_trip_order(ord_res, trip, order_data, local_code, actions, errors, compose_id):
+    """
+    Buffers the action history of a created order and returns its IABS order ID (None on failure).
+    """
+    ord_res = ord_res or {}
+    response_body = ord_res.get("responseBody") or {}
+    iabs_order_id = response_body.get("orderId")
 
-        ord_res = service.create_order(order_data) or {}
-        response_body = ord_res.get("responseBody") or {}
-        iabs_order_id = response_body.get("orderId")
-        hashmap[local_code] = iabs_order_id  # may be None; caller guards before trip create
-
-        endpoint = ord_res.get("endpoint")
-        request_id = ord_res.get("request_id")
-        status = SENT if iabs_order_id else FAILED
-        result = "Order created on IABS" if iabs_order_id else "Missing orderId"
-
-        create_iabs_action(
-            t,
-            status=status,
-            result=result,
-            user_id=t.user_id,
-            action="create",
-            compose_id=compose_id,
-            request_body=order_data,
-            response_body=ord_res,
-            endpoint=endpoint,
-            type="order",
-            request_id=request_id,
-        )
-
-        if status == FAILED:
-            errors.append(f"Order creation failed for local code {local_code}: {ord_res}")
+    status = SENT if iabs_order_id else FAILED
+    result = "Order created on IABS" if iabs_order_id else "Missing orderId"
+
+    actions.append(build_iabs_action(
+        trip,
+        status=status,
+        result=result,
+        user_id=trip.user_id,
+        action="create",
+        compose_id=compose_id,
+        request_body=order_data,
+        response_body=ord_res,
+        endpoint=ord_res.get("endpoint"),
+        type="order",
+        request_id=ord_res.get("request_id"),
+    ))
+
+    if status == FAILED:
+        errors.append(f"Order creation failed for local code {local_code}: {ord_res}")
+    return iabs_order_id
+
+
+def build_trip_payload(trip, iabs_order_id, order_type, reg_seria, reg_num):
+    return {
+        "orderId": str(iabs_order_id),
+        "orderType": order_type,
+        "tripType": "1",
+        "empId": trip.get('user_emp_id'),
+        "beginDate": trip.get('start_date'),
+        "endDate": trip.get('end_date'),
+        "education": "N",
+        "regionCode": "",
+        "districtCode": "",
+        "countryCode": "860",
+        "tripLocation": ', '.join(trip.get('locations')),
+        "tripReason": ', '.join(trip.get('goals')),
+        "empSubstitute": "",
+        "interestRate": "",
+        "regNumber": reg_seria,
+        "regSeria": reg_num,
+        "regReason": "Raport"
+    }
 
 
 def get_old_iabs_id(compose_id: int) -> int | None:
@@ -141,8 +197,10 @@ def send_about_trip_creation_iabs(branch_code, ord_num, ord_data, **kwargs):
     """
     This function is a Celery task that sends trip creation data to the IABS system.
     It uses the IABSRequestService to build the required data structure
-    and handles errors during this operation. If an exception occurs,
-    the task will retry up to three times, with a default delay of 60 seconds between retries.
+    and handles errors during this operation. Orders and trips are sent in parallel,
+    up to IABS_POOL_SIZE calls at a time; the trips of an order are sent once the order is created.
+    The action history is written in bulk at the end, and the result includes call latency per endpoint.
+    If an exception occurs, the task will retry up to three times, with a default delay of 60 seconds between retries.
 
     Parameters:
         self: Task instance, automatically passed when the task is bind to itself.
@@ -155,6 +213,7 @@ def send_about_trip_creation_iabs(branch_code, ord_num, ord_data, **kwargs):
                    exception and applies a countdown for the retry.
     """
 
+    actions = []  # action history rows, written in bulk at the end
     try:
         service = IABSRequestService()
         trips = kwargs.get('trips', [])
@@ -169,77 +228,79 @@ def send_about_trip_creation_iabs(branch_code, ord_num, ord_data, **kwargs):
         trip_map = {t.id: t for t in trip_data}
         # Expect split_reg_number to return (series, number)
         reg_seria, reg_num = split_reg_number(ord_num)
-        seen: set[str] = set()  # To track local codes that have already been processed
-        hashmap: dict[str, int | None] = {}  # To store local codes and their corresponding IABS order IDs
         errors: list[str] = []  # To collect errors if any
-        old_iabs_order_id: int | None = None
-
-        if type == "trip_extension":
-            parent_compose_id = kwargs.get("parent_compose_id")
-            old_iabs_order_id = get_old_iabs_id(parent_compose_id)
-            if old_iabs_order_id is None:
-                errors.append(f"No previous IABS order found for compose_id={parent_compose_id}")
-        else:
-            create_iabs_trip_order(trip_data, seen, service, hashmap, errors,
-                                   compose_id, reg_seria, reg_num, ord_data)
-
         order_type = kwargs.get('order_type', '100')  # Default to '100' if not provided
 
-        # Create trips in IABS
+        # Group trips by the local code of the order they belong to
+        trips_by_code = defaultdict(list)
         for trip in trips:
-            trip_instance = trip_map.get(trip['trip_id'])
-            if type == 'trip_extension':
-                iabs_order_id = old_iabs_order_id
+            trips_by_code[trip.get('local_code')].append(trip)
+        trip_futures = {}
+
+        # fetch the token once before the calls run in parallel
+        service.get_token()
+
+        with ThreadPoolExecutor(max_workers=IABS_POOL_SIZE) as executor:
+            def submit_trips(local_code, iabs_order_id):
+                for trip in trips_by_code.pop(local_code, []):
+                    trip_payload = build_trip_payload(trip, iabs_order_id, order_type, reg_seria, reg_num)
+                    future = executor.submit(service.create_trip, trip_payload)
+                    trip_futures[future] = (trip, trip_payload, iabs_order_id)
+
+            if type == "trip_extension":
+                parent_compose_id = kwargs.get("parent_compose_id")
+                old_iabs_order_id = get_old_iabs_id(parent_compose_id)
+                if old_iabs_order_id is None:
+                    errors.append(f"No previous IABS order found for compose_id={parent_compose_id}")
+                for local_code in list(trips_by_code):
+                    submit_trips(local_code, old_iabs_order_id)
             else:
-                iabs_order_id = hashmap.get(trip.get('local_code'))
-
-            trip_payload = {
-                "orderId": str(iabs_order_id),
-                "orderType": order_type,
-                "tripType": "1",
-                "empId": trip.get('user_emp_id'),
-                "beginDate": trip.get('start_date'),
-                "endDate": trip.get('end_date'),
-                "education": "N",
-                "regionCode": "",
-                "districtCode": "",
-                "countryCode": "860",
-                "tripLocation": ', '.join(trip.get('locations')),
-                "tripReason": ', '.join(trip.get('goals')),
-                "empSubstitute": "",
-                "interestRate": "",
-                "regNumber": reg_seria,
-                "regSeria": reg_num,
-                "regReason": "Raport"
-            }
-
-            trip_response = service.create_trip(trip_payload) or {}
-            is_ok = (trip_response.get("code") == 0)
-            status = SENT if is_ok else FAILED
-            # On success: friendly message; on failure: include message/error code
-            result = ("Trip created on IABS"
-                      if is_ok
-                      else (trip_response.get("message") or "IABS trip create failed"))
-
-            endpoint = trip_response.get('endpoint')
-            request_id = trip_response.get('request_id')
-
-            create_iabs_action(trip_instance, status=status, result=result,
-                               user_id=trip['user_id'], iabs_id=iabs_order_id, action='create',
-                               compose_id=compose_id, request_body=trip_payload,
-                               response_body=trip_response, endpoint=endpoint,
-                               type='trip', request_id=request_id)
-
-            if not is_ok:
-                errors.append(
-                    f"Trip creation failed for user {trip['user_id']}: {trip_response}"
-                )
-                logging.error(errors[-1])
+                order_futures = submit_iabs_trip_orders(executor, trip_data, service, errors,
+                                                        reg_seria, reg_num, ord_data)
+                # Trips without an order of their own are sent right away, as before
+                submitted_codes = {local_code for local_code, _, _ in order_futures.values()}
+                for local_code in set(trips_by_code) - submitted_codes:
+                    submit_trips(local_code, None)
+
+                # A trip is sent only after its order has been created in IABS
+                for future in as_completed(order_futures):
+                    local_code, trip_instance, order_data = order_futures[future]
+                    iabs_order_id = record_iabs_trip_order(future.result(), trip_instance, order_data,
+                                                           local_code, actions, errors, compose_id)
+                    submit_trips(local_code, iabs_order_id)
+
+            # Create trips in IABS
+            for future, (trip, trip_payload, iabs_order_id) in trip_futures.items():
+                trip_response = future.result() or {}
+                is_ok = (trip_response.get("code") == 0)
+                status = SENT if is_ok else FAILED
+                # On success: friendly message; on failure: include message/error code
+                result = ("Trip created on IABS"
+                          if is_ok
+                          else (trip_response.get("message") or "IABS trip create failed"))
+
+                endpoint = trip_response.get('endpoint')
+                request_id = trip_response.get('request_id')
+
+                actions.append(build_iabs_action(trip_map.get(trip['trip_id']), status=status, result=result,
+                                                 user_id=trip['user_id'], iabs_id=iabs_order_id, action='create',
+                                                 compose_id=compose_id, request_body=trip_payload,
+                                                 response_body=trip_response, endpoint=endpoint,
+                                                 type='trip', request_id=request_id))
+
+                if not is_ok:
+                    errors.append(
+                        f"Trip creation failed for user {trip['user_id']}: {trip_response}"
+                    )
+                    logging.error(errors[-1])
 
         if errors:
             error_message = "Errors occurred during trip creation:\n" + "\n".join(errors)
-            return error_message
+            return {'result': error_message, 'latency': service.stats.snapshot()}
 
-        return f"Trip creation request sent to IABS for trip {ord_num}"
+        return {'result': f"Trip creation request sent to IABS for trip {ord_num}",
+                'latency': service.stats.snapshot()}
     except Exception as e:
         logging.error(f"Error sending trip to IABS: {e}")
+    finally:
+        save_iabs_actions(actions)
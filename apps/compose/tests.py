@@ -1,3 +1,334 @@
-from django.test import TestCase
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import pytest
+from django.apps import apps
+from django.db import connection, connections, transaction
+
+from apps.company.models import Company
+from apps.compose.models import BusinessTrip, Compose, ComposeRegisterCounter, ComposeVersionModel, \
+    IABSActionHistory, IABSRequestCallHistory, SigningPipeline
+from apps.compose import tools as compose_tools
+from apps.compose.services import GenerateComposeRegisterNumber, IABS_POOL_SIZE
+from apps.compose.tasks import signing
+from apps.compose.tasks import utils as compose_task_utils
+from apps.compose.versioning import VERSION_SNAPSHOT_INTERVAL
+from apps.document.models import File
+from apps.pdf_kit import generate_letter
+from utils.constants import CONSTANTS
+from utils.latency import LatencyStats
+
+STATUSES = CONSTANTS.COMPOSE.SIGNING_STATUSES
+STORAGE = CONSTANTS.COMPOSE.VERSION_STORAGE
+
+
+@pytest.fixture
+def socket_messages(monkeypatch):
+    messages = []
+    monkeypatch.setattr(signing, 'send_to_user_socket', lambda message, *user_ids: messages.append(message))
+    return messages
+
+
+@pytest.fixture
+def pipeline(user):
+    compose = Compose.objects.create(author=user)
+    return SigningPipeline.objects.create(compose=compose, user=user)
+
+
+def _recorded_steps(calls):
+    return {step: (lambda p, step=step: calls.append(step)) for step in ('register', 'render', 'upload', 'notify')}
+
+
+def test_signing_steps_run_once(pipeline, monkeypatch, socket_messages):
+    calls = []
+    monkeypatch.setattr(signing, 'SIGNING_STEPS', _recorded_steps(calls))
+
+    for step in ('register', 'register', 'render', 'upload', 'upload', 'notify'):
+        signing.run_signing_step.apply(args=(pipeline.id, step))
+
+    pipeline.refresh_from_db()
+    assert calls == ['register', 'render', 'upload', 'notify']
+    assert pipeline.status == STATUSES.DONE
+    assert pipeline.completed_steps == ['register', 'render', 'upload', 'notify']
+    assert socket_messages[-1]['status'] == STATUSES.DONE
+
+
+def test_failed_step_is_retried_on_its_own(pipeline, monkeypatch, socket_messages):
+    calls = []
+
+    def _failing_upload(p):
+        raise RuntimeError('storage is unavailable')
+
+    steps = _recorded_steps(calls)
+    monkeypatch.setattr(signing, 'SIGNING_STEPS', {**steps, 'upload': _failing_upload})
+    signing.run_signing_step.apply(args=(pipeline.id, 'register'))
+    signing.run_signing_step.apply(args=(pipeline.id, 'render'))
+    signing.run_signing_step.apply(args=(pipeline.id, 'upload'), retries=signing.run_signing_step.max_retries)
+
+    pipeline.refresh_from_db()
+    assert pipeline.status == STATUSES.FAILED
+    assert pipeline.step == 'upload'
+    assert pipeline.error == 'storage is unavailable'
+
+    monkeypatch.setattr(signing, 'SIGNING_STEPS', steps)
+    monkeypatch.setattr(signing.app.conf, 'task_always_eager', True)
+    signing.start_signing_pipeline(pipeline)
+
+    pipeline.refresh_from_db()
+    assert calls == ['register', 'render', 'upload', 'notify']
+    assert pipeline.status == STATUSES.DONE
+    assert pipeline.error is None
+
+
+def test_register_step_skips_registered_document(pipeline, base_document, monkeypatch):
+    Compose.objects.filter(id=pipeline.compose_id).update(registered_document=base_document)
+    monkeypatch.setattr('apps.compose.tools.register_document_after_signing',
+                        lambda *args: pytest.fail('registered twice'))
+
+    signing.register_step(pipeline)
+
+
+@pytest.fixture
+def side_effects(monkeypatch):
+    effects = []
+    monkeypatch.setattr(compose_tools.action_log, 'apply_async', lambda *args, **kwargs: effects.append('action_log'))
+    return effects
+
+
+def test_registration_side_effects_wait_for_commit(pipeline, base_document, side_effects,
+                                                   django_capture_on_commit_callbacks):
+    compose = Compose.objects.get(id=pipeline.compose_id)
+
+    with django_capture_on_commit_callbacks(execute=True), pytest.raises(RuntimeError):
+        with transaction.atomic():
+            compose_tools.save_files(compose, base_document)
+            raise RuntimeError('creating the assignment failed')
+    assert side_effects == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        compose_tools.save_files(compose, base_document)
+    assert side_effects == ['action_log']
+
+
+def test_failed_upload_is_retried_by_the_upload_step(pipeline, base_document, monkeypatch):
+    Compose.objects.filter(id=pipeline.compose_id).update(registered_document=base_document,
+                                                          document_type_id=CONSTANTS.DOC_TYPE_ID.SERVICE_LETTER)
+    monkeypatch.setitem(compose_tools.RENDER_FUNCTIONS, compose_tools.register_service_letter,
+                        lambda compose: generate_letter.BasePDFConfig().save_pdf(
+                            b'%PDF-1.4', f'{compose.id}.pdf', 'service_letters'))
+    uploads = []
+
+    def _upload(file_obj, module, name):
+        uploads.append(name)
+        if len(uploads) == 1:
+            raise ConnectionError('storage is unavailable')
+        return {'key': f'uploads/{module}/{name}', 'key_etag': name, 'bucket': 'docs', 'etag': 'etag', 'sha256': ''}
+
+    monkeypatch.setattr(generate_letter, 'upload_file', _upload)
+
+    signing.render_step(pipeline)
+    signing.render_step(pipeline)
+    file = File.objects.get()
+    assert Compose.objects.get(id=pipeline.compose_id).file_id == file.id
+    assert file.state == 'pending'
+
+    with pytest.raises(ConnectionError):
+        signing.upload_step(pipeline)
+    file.refresh_from_db()
+    assert file.state == 'failed'
+
+    signing.upload_step(pipeline)
+    signing.upload_step(pipeline)
+    file.refresh_from_db()
+    assert len(uploads) == 2
+    assert (file.state, file.path, file.etag) == ('uploaded', f'uploads/service_letters/{pipeline.compose_id}.pdf', 'etag')
+
+
+def test_register_numbers_continue_per_journal(journal):
+    service = GenerateComposeRegisterNumber(journal_index=journal.index, journal_id=journal.id)
+
+    assert service.generate() == (f'{journal.index}/1', 1)
+    assert service.generate() == (f'{journal.index}/2', 2)
+    assert service.generate_power_of_attorney_number() == ('ISH-00003', 3)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_register_numbers_are_unique_under_concurrent_allocation(journal):
+    allocations = 400
+    service = GenerateComposeRegisterNumber(journal_index=journal.index, journal_id=journal.id)
+
+    def _allocate(i):
+        try:
+            with transaction.atomic():
+                return service.generate()[1]
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        numbers = list(executor.map(_allocate, range(allocations)))
+    elapsed = time.perf_counter() - started
+
+    assert sorted(numbers) == list(range(1, allocations + 1))
+    assert allocations / elapsed > 50
+    assert ComposeRegisterCounter.objects.get(journal=journal).last_number == allocations
+
+
+def test_numbers_are_allocated_only_for_registrations(pipeline, journal, base_document, monkeypatch):
+    Compose.objects.filter(id=pipeline.compose_id).update(journal=journal)
+    registered = []
+    monkeypatch.setattr(compose_tools, 'register_service_letter',
+                        lambda compose_id, register_number, num, **kwargs: registered.append(num))
+
+    # a document type that is not registered after signing
+    signing.register_step(pipeline)
+    assert not ComposeRegisterCounter.objects.filter(journal=journal).exists()
+
+    Compose.objects.filter(id=pipeline.compose_id).update(document_type_id=CONSTANTS.DOC_TYPE_ID.SERVICE_LETTER)
+    signing.register_step(pipeline)
+    assert registered == [1]
+
+    # a pipeline that finds the document registered by a concurrent one
+    Compose.objects.filter(id=pipeline.compose_id).update(registered_document=base_document)
+    signing.register_step(pipeline)
+    assert registered == [1]
+    assert ComposeRegisterCounter.objects.get(journal=journal).last_number == 1
+
+
+class _FakeIABSRequestService:
+    """
+    Answers like IABS after `latency` seconds, records when each call started and ended
+    and the peak number of calls in flight.
+    """
+    latency = 0.05
+
+    def __init__(self):
+        self.stats = LatencyStats()
+        self.calls = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        return 'token'
+
+    def _call(self, endpoint, key, response):
+        started = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+            self.calls.append((endpoint, key, started, time.perf_counter()))
+        self.stats.record(endpoint, time.perf_counter() - started, True)
+        return {'code': 0, 'endpoint': endpoint, 'request_id': key, **response}
+
+    def create_order(self, data):
+        return self._call('/1.0.0/create-order-doc', data['localCode'],
+                          {'responseBody': {'orderId': int(data['localCode'])}})
+
+    def create_trip(self, data):
+        return self._call('/1.0.0/create-trip', data['orderId'], {})
+
+
+def test_trips_are_sent_in_parallel_after_their_order(user, user2, monkeypatch):
+    service = _FakeIABSRequestService()
+    monkeypatch.setattr(compose_task_utils, 'IABSRequestService', lambda: service)
+    employees = [user, user2]
+    for employee, local_code in zip(employees, ('101', '102')):
+        employee.company = Company.objects.create(name=f'Branch {local_code}', local_code=local_code)
+        employee.save()
+    trips = []
+    for i in range(16):
+        employee = employees[i % 2]
+        trip = BusinessTrip.objects.create(user=employee)
+        trips.append({
+            'trip_id': trip.id, 'user_id': employee.id, 'local_code': employee.company.local_code,
+            'user_emp_id': str(i), 'start_date': '2024-01-01', 'end_date': '2024-01-05',
+            'locations': ['Tashkent'], 'goals': ['Audit'],
+        })
+
+    result = compose_task_utils.send_about_trip_creation_iabs('00', '4/123', '2024-01-01', trips=trips)
+
+    order_ended = {key: ended for endpoint, key, _, ended in service.calls if endpoint == '/1.0.0/create-order-doc'}
+    trip_calls = [(key, started) for endpoint, key, started, _ in service.calls if endpoint == '/1.0.0/create-trip']
+    assert len(trip_calls) == 16
+    assert all(started >= order_ended[key] for key, started in trip_calls)
+    # the trips overlap, but never more of them than the IABS connection pool allows
+    assert 1 < service.peak_in_flight <= IABS_POOL_SIZE
+    assert result['latency']['/1.0.0/create-trip']['count'] == 16
+    assert IABSActionHistory.objects.filter(type='trip').count() == 16
+    assert IABSRequestCallHistory.objects.filter(action_history__type='order').count() == 2
+
+
+def _edit_history(count):
+    paragraphs = [f'<p>Paragraph {i} of the <b>decree</b> text.</p>' for i in range(50)]
+    history = []
+    for i in range(count):
+        edited = list(paragraphs)
+        edited[i % 50] = f'<p>Paragraph {i % 50} edited for the {i} time &lt;ok&gt;</p>'
+        history.append((''.join(paragraphs), ''.join(edited)))
+        paragraphs = edited
+    # an edit whose old text is not the previous new text, and empty texts
+    history.append(('<p>concurrent edit</p>', ''))
+    history.append((None, '<p>restored'))
+    return history
+
+
+def test_versions_are_stored_as_snapshots_and_deltas(user):
+    compose = Compose.objects.create(author=user)
+    history = _edit_history(VERSION_SNAPSHOT_INTERVAL + 5)
+
+    for old_text, new_text in history:
+        ComposeVersionModel.create_history(old_text, new_text, compose, user.id)
+
+    versions = list(ComposeVersionModel.objects.filter(object_id=compose.id).order_by('id').defer('data'))
+    assert [v.storage == STORAGE.SNAPSHOT for v in versions] == \
+        [i % VERSION_SNAPSHOT_INTERVAL == 0 for i in range(len(history))]
+    assert all(v.old_text is None and v.new_text is None for v in versions)
+    assert versions[-1].snapshot_id == versions[VERSION_SNAPSHOT_INTERVAL].id
+
+    ComposeVersionModel.load_texts(versions)
+    assert [(v.old_text, v.new_text) for v in versions] == history
+    assert all(v.created_by_id == user.id for v in versions)
+
+
+def test_reconstructing_a_version_reads_its_chain_once(user, django_assert_num_queries):
+    compose = Compose.objects.create(author=user)
+    history = _edit_history(VERSION_SNAPSHOT_INTERVAL * 2)
+    for old_text, new_text in history:
+        ComposeVersionModel.create_history(old_text, new_text, compose, user.id)
+    version = ComposeVersionModel.objects.filter(object_id=compose.id).order_by('id').defer('data')[
+        VERSION_SNAPSHOT_INTERVAL + 3]
+
+    with django_assert_num_queries(1):
+        ComposeVersionModel.load_texts([version])
+
+    assert (version.old_text, version.new_text) == history[VERSION_SNAPSHOT_INTERVAL + 3]
+
+
+def test_migration_compacts_plain_versions(user):
+    compose = Compose.objects.create(author=user)
+    history = _edit_history(VERSION_SNAPSHOT_INTERVAL + 2)
+    ComposeVersionModel.objects.bulk_create([
+        ComposeVersionModel(old_text=old_text, new_text=new_text, history_for=compose)
+        for old_text, new_text in history
+    ])
+    migration = importlib.import_module('apps.compose.migrations.0105_compact_composeversions')
+
+    migration.compact_versions(apps, None)
+    versions = list(ComposeVersionModel.objects.filter(object_id=compose.id).order_by('id'))
+    assert {v.storage for v in versions} == {STORAGE.SNAPSHOT, STORAGE.DELTA}
+    assert [(v.old_text, v.new_text) for v in ComposeVersionModel.load_texts(versions)] == history
+
+    # new edits continue the compacted chain
+    ComposeVersionModel.create_history(history[-1][1], '<p>next</p>', compose, user.id)
+    latest = ComposeVersionModel.objects.filter(object_id=compose.id).order_by('-id').first()
+    assert latest.storage == STORAGE.DELTA
+
+    migration.expand_versions(apps, None)
+    versions = ComposeVersionModel.objects.filter(object_id=compose.id).order_by('id')
+    assert [(v.old_text, v.new_text) for v in versions] == history + [(history[-1][1], '<p>next</p>')]
@@ -1,5 +1,6 @@
 from collections import OrderedDict, defaultdict
 
+from django.db import transaction
 from django.utils import timezone
 
 from apps.compose.models import (
@@ -15,6 +16,7 @@ from apps.compose.services import GenerateComposeRegisterNumber
 from apps.compose.tasks.utils import send_about_trip_creation_iabs
 from apps.conftest import document_sub_type
 from apps.docflow.models import BaseDocument, Reviewer, DocumentFile, Assignment, Assignee
+from apps.document.models import File
 from apps.pdf_kit.generate_letter import (
     GenerateInnerLetterToPdf,
     GenerateApplicationToPDF,
@@ -25,6 +27,7 @@ from apps.pdf_kit.generate_letter import (
     GenerateLocalTripOrderToPdf,
     GeneratePowerOfAttorneyToPdf,
     GenerateTripNoticeV2ToPdf, GenerateActToPdf,
+    upload_pdf,
 )
 from apps.reference.tasks import action_log
 from apps.user.models import User
@@ -139,24 +142,25 @@ def get_receivers(receiver, type):
     return []
 
 
-def save_pdf_and_files(compose, base_document, pdf_file_id, request=None):
+def save_files(compose, base_document):
     """
-    Save the generated PDF and related files to the document.
+    Attach the compose's files to the registered document.
     """
-    if pdf_file_id:
-        DocumentFile.objects.create(document_id=base_document.id, file_id=pdf_file_id)
-
     if compose.files.exists():
         for file in compose.files.all():
             DocumentFile.objects.create(document_id=base_document.id, file_id=file.id)
 
-    # Log the creation of the base document
+    # Log the creation of the base document once it is committed
     user_id = get_current_user_id()
     user_ip = None
     ct_id = get_content_type_id(base_document)
-    action_log.apply_async(
-        (user_id, 'created', '100', ct_id,
-         base_document.id, user_ip, base_document.register_number), countdown=2)
+
+    def _send():
+        action_log.apply_async(
+            (user_id, 'created', '100', ct_id,
+             base_document.id, user_ip, base_document.register_number), countdown=2)
+
+    transaction.on_commit(_send)
 
 
 def modify_compose(compose, **kwargs):
@@ -171,94 +175,91 @@ def modify_compose(compose, **kwargs):
     compose.save()
 
 
-def register_service_letter(compose_id, request):
+def register_service_letter(compose_id, register_number, num, **kwargs):
     signers = Signer.objects.filter(compose_id=compose_id)
 
     if all(signers.values_list('is_signed', flat=True)):
         compose = Compose.objects.get(id=compose_id)
-        register_number, num = GenerateComposeRegisterNumber(
-            journal_index=compose.journal.index,
-            journal_id=compose.journal_id).generate()
         now = timezone.now()
         base_document = create_base_document(compose, now, register_number)
 
         # Send the document for reviewer
         send_for_review(compose.receiver_id, base_document.id)
 
-        receiver_data = get_receivers(compose.receiver, compose.receiver.type)
-        signed_date = signers.last().action_date
-        saved_file_id = GenerateInnerLetterToPdf(
-            check_id=compose.check_id,
-            content=compose.content,
-            signers=get_signers(signers),
-            receivers=receiver_data,
-            executor=normalize_user_name(compose.author.full_name),
-            phone=compose.author.cisco if compose.author.cisco else '00-00',
-            created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-            signed_date=signed_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-            register_number=register_number,
-            register_date=compose.created_date.strftime('%d.%m.%Y'),
-            sender=compose.sender.name,
-            env_id=compose.company.env_id
-        ).generate_pdf()
-
         modify_compose(compose,
                        registered_document_id=base_document.id,
-                       file_id=saved_file_id,
                        register_number=register_number,
                        num=num,
                        register_date=now)
-        save_pdf_and_files(compose, base_document, saved_file_id, request)
+        save_files(compose, base_document)
 
 
-def register_application(compose_id, request, **kwargs):
+def render_service_letter(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    receiver_data = get_receivers(compose.receiver, compose.receiver.type)
+    signed_date = signers.last().action_date
+    return GenerateInnerLetterToPdf(
+        check_id=compose.check_id,
+        content=compose.content,
+        signers=get_signers(signers),
+        receivers=receiver_data,
+        executor=normalize_user_name(compose.author.full_name),
+        phone=compose.author.cisco if compose.author.cisco else '00-00',
+        created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
+        signed_date=signed_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
+        register_number=compose.register_number,
+        register_date=compose.created_date.strftime('%d.%m.%Y'),
+        sender=compose.sender.name,
+        env_id=compose.company.env_id
+    ).generate_pdf()
+
+
+def register_application(compose_id, register_number, num, **kwargs):
     signers = Signer.objects.filter(compose_id=compose_id)
 
     if all(signers.values_list('is_signed', flat=True)):
         compose = Compose.objects.get(id=compose_id)
 
-        # Register the base document
-        register_number, num = GenerateComposeRegisterNumber(
-            journal_index=compose.journal.index,
-            journal_id=compose.journal_id).generate()
         now = timezone.now()
         base_document = create_base_document(compose, now, register_number)
 
         performers = kwargs.get('performers')
         send_for_review(None, base_document.id, performers=performers)
 
-        signers_data = get_signers(signers.exclude(type='basic_signer'))
-        basic_signer = normalize_user_name(compose.curator.full_name)
-        basic_signer_position = compose.curator.position.name
-        user_name = normalize_user_name(compose.author.full_name)
-        user_position = compose.author.position.name
-        user_department = compose.author.top_level_department.name if compose.author.top_level_department else ''
-        signed_date = signers.last().action_date
-
-        saved_file_id = GenerateApplicationToPDF(
-            check_id=compose.check_id,
-            content=compose.content,
-            signers=signers_data,
-            executor=normalize_user_name(compose.author.full_name),
-            phone=compose.author.cisco if compose.author.cisco else '00-00',
-            created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-            signed_date=signed_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-            basic_signer=basic_signer,
-            basic_signer_position=basic_signer_position,
-            user_name=user_name,
-            user_position=user_position,
-            user_department=user_department,
-            env_id=compose.company.env_id,
-            document_sub_type_id=compose.document_sub_type_id
-        ).generate_pdf()
-
         modify_compose(compose,
                        registered_document_id=base_document.id,
-                       file_id=saved_file_id,
                        register_number=register_number,
                        num=num,
                        register_date=now)
-        save_pdf_and_files(compose, base_document, saved_file_id, request)
+        save_files(compose, base_document)
+
+
+def render_application(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    signers_data = get_signers(signers.exclude(type='basic_signer'))
+    basic_signer = normalize_user_name(compose.curator.full_name)
+    basic_signer_position = compose.curator.position.name
+    user_name = normalize_user_name(compose.author.full_name)
+    user_position = compose.author.position.name
+    user_department = compose.author.top_level_department.name if compose.author.top_level_department else ''
+    signed_date = signers.last().action_date
+
+    return GenerateApplicationToPDF(
+        check_id=compose.check_id,
+        content=compose.content,
+        signers=signers_data,
+        executor=normalize_user_name(compose.author.full_name),
+        phone=compose.author.cisco if compose.author.cisco else '00-00',
+        created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
+        signed_date=signed_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
+        basic_signer=basic_signer,
+        basic_signer_position=basic_signer_position,
+        user_name=user_name,
+        user_position=user_position,
+        user_department=user_department,
+        env_id=compose.company.env_id,
+        document_sub_type_id=compose.document_sub_type_id
+    ).generate_pdf()
 
 
 def get_trip_data(compose_id):
@@ -299,32 +300,39 @@ def get_trip_data(compose_id):
     return trip_information
 
 
-def register_trip_notice(compose_id, request):
+def register_trip_notice(compose_id, register_number, num, **kwargs):
     # Fetch the Compose instance
     compose = (Compose.objects.
                select_related('journal', 'author').
                get(id=compose_id))
 
-    # Register the document
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
     base_document = create_base_document(compose, compose.created_date, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    signer = signers.last()
-
-    # Get only the full names of the performers
-    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+    signer = Signer.objects.filter(compose_id=compose_id).last()
 
     # Create a task for the performers
     create_assignment(base_document.id, signer.user_id, signer.performers,
                       signer.resolution_text, resolution_type=signer.resolution_type,
                       deadline=signer.deadline)
 
-    trip_information = get_trip_data(compose_id)
+    modify_compose(compose,
+                   registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num,
+                   register_date=compose.created_date)
+    save_files(compose, base_document)
 
-    saved_file_id = GenerateTripNoticeToPdf(
+
+def render_trip_notice(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    signer = signers.last()
+
+    # Get only the full names of the performers
+    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+
+    trip_information = get_trip_data(compose.id)
+
+    return GenerateTripNoticeToPdf(
         check_id=compose.check_id,
         content=compose.content,
         short_description=compose.short_description,
@@ -333,7 +341,7 @@ def register_trip_notice(compose_id, request):
         phone=compose.author.cisco if compose.author.cisco else '00-00',
         created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
         signed_date=signer.action_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=compose.created_date.strftime('%d.%m.%Y'),
         sender=compose.sender.name,
         trip_info=trip_information,
@@ -343,14 +351,6 @@ def register_trip_notice(compose_id, request):
         env_id=compose.company.env_id
     ).generate_pdf()
 
-    modify_compose(compose,
-                   registered_document_id=base_document.id,
-                   file_id=saved_file_id,
-                   register_number=register_number,
-                   num=num,
-                   register_date=compose.created_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
 
 def get_trip_data_by_group_id(compose_id):
     hashmap = defaultdict(list)
@@ -416,29 +416,43 @@ def booking_segments_view(compose_id):
     return booking_data
 
 
-def register_trip_notice_v2(compose_id, request):
+def register_trip_notice_v2(compose_id, register_number, num, **kwargs):
     # Fetch the Compose instance
     compose = Compose.objects.get(id=compose_id)
 
-    # Register the document
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
     base_document = create_base_document(compose, compose.created_date, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    signer = signers.last()
-
-    # Get only the full names of the performers
-    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+    signer = Signer.objects.filter(compose_id=compose_id).last()
 
     # Create a task for the performers
     create_assignment(base_document.id, signer.user_id, signer.performers,
                       signer.resolution_text, resolution_type=signer.resolution_type,
                       deadline=signer.deadline)
 
-    trip_information = get_trip_data_by_group_id(compose_id)
-    trip_plans = TripPlan.objects.filter(compose_id=compose_id).select_related('compose').prefetch_related('users')
+    modify_compose(compose,
+                   registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num,
+                   register_date=compose.created_date)
+    save_files(compose, base_document)
+
+    # Register decree v2
+    compose_link = ComposeLink.objects.filter(to_compose_id=compose_id).first()
+    if compose_link:
+        decree = Compose.objects.select_related('journal').get(id=compose_link.from_compose_id)
+        register_number, num = allocate_register_number(decree, register_decree)
+        register_decree(decree.id, register_number, num, notice_instance=compose)
+
+
+def render_trip_notice_v2(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    signer = signers.last()
+
+    # Get only the full names of the performers
+    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+
+    trip_information = get_trip_data_by_group_id(compose.id)
+    trip_plans = TripPlan.objects.filter(compose_id=compose.id).select_related('compose').prefetch_related('users')
     # Prepare trip plans list
     trip_plans_data = [
         {
@@ -447,9 +461,9 @@ def register_trip_notice_v2(compose_id, request):
         }
         for plan in trip_plans
     ]
-    # booking = booking_segments_view(compose_id)
+    # booking = booking_segments_view(compose.id)
 
-    saved_file_id = GenerateTripNoticeV2ToPdf(
+    return GenerateTripNoticeV2ToPdf(
         check_id=compose.check_id,
         content=compose.content,
         short_description=compose.short_description,
@@ -458,7 +472,7 @@ def register_trip_notice_v2(compose_id, request):
         phone=compose.author.cisco if compose.author.cisco else '00-00',
         created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
         signed_date=signer.action_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=compose.created_date.strftime('%d.%m.%Y'),
         sender=compose.sender.name,
         trip_info=trip_information,
@@ -471,42 +485,36 @@ def register_trip_notice_v2(compose_id, request):
         # booking=booking
     ).generate_pdf()
 
-    modify_compose(compose,
-                   registered_document_id=base_document.id,
-                   file_id=saved_file_id,
-                   register_number=register_number,
-                   num=num,
-                   register_date=compose.created_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
-    # Generate decree v2
-    compose_link = ComposeLink.objects.filter(to_compose_id=compose_id).first()
-    if compose_link:
-        register_decree(compose_link.from_compose_id, request, notice_instance=compose)
 
-
-def register_notice(compose_id, request):
+def register_notice(compose_id, register_number, num, **kwargs):
     # Fetch the Compose instance
     compose = Compose.objects.get(id=compose_id)
 
-    # Register the document
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
     base_document = create_base_document(compose, compose.created_date, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    signer = signers.last()
-
-    # Get only the full names of the performers
-    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+    signer = Signer.objects.filter(compose_id=compose_id).last()
 
     # Create a task for the performers
     create_assignment(base_document.id, signer.user_id, signer.performers,
                       signer.resolution_text,
                       resolution_type=signer.resolution_type, deadline=signer.deadline)
 
-    saved_file_id = GenerateNoticeToPdf(
+    modify_compose(compose,
+                   registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num,
+                   register_date=compose.created_date)
+    save_files(compose, base_document)
+
+
+def render_notice(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    signer = signers.last()
+
+    # Get only the full names of the performers
+    performers = [normalize_user_name(performer.get('full_name')) for performer in signer.performers]
+
+    return GenerateNoticeToPdf(
         check_id=compose.check_id,
         short_description=compose.short_description,
         content=compose.content,
@@ -515,7 +523,7 @@ def register_notice(compose_id, request):
         phone=compose.author.cisco if compose.author.cisco else '00-00',
         created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
         signed_date=signer.action_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=compose.created_date.strftime('%d.%m.%Y'),
         sender=compose.sender.name,
         performers=', '.join(performers),
@@ -524,55 +532,46 @@ def register_notice(compose_id, request):
         env_id=compose.company.env_id
     ).generate_pdf()
 
+
+def register_hr_order(compose_id, register_number, num, **kwargs):
+    compose = Compose.objects.get(id=compose_id)
+    base_document = create_base_document(compose, compose.register_date, register_number)
+
+    performers = kwargs.get('performers')
+    send_for_review(None, base_document.id, performers=performers)
+
     modify_compose(compose,
                    registered_document_id=base_document.id,
-                   file_id=saved_file_id,
                    register_number=register_number,
                    num=num,
-                   register_date=compose.created_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
+                   register_date=compose.register_date)
+    save_files(compose, base_document)
 
+    if (
+            compose.document_type_id == DOC_TYPE.HR_ORDER and
+            compose.document_sub_type_id == DOC_TYPE.BUSINESS_TRIP_ORDER
+    ):
+        create_trip_verification(compose)
 
-def register_hr_order(compose_id, request, **kwargs):
-    compose = Compose.objects.get(id=compose_id)
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
-    base_document = create_base_document(compose, compose.register_date, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    performers = kwargs.get('performers')
-    send_for_review(None, base_document.id, performers=performers)
+def render_hr_order(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
     basic_signer_data = get_signers(signers.filter(type='basic_signer'))
     negotiator_data = get_signers(signers.filter(type='negotiator'))
-    saved_file_id = GenerateOrderToPdf(
+    return GenerateOrderToPdf(
         check_id=compose.check_id,
         content=compose.content,
         signers=basic_signer_data,
         executor=normalize_user_name(compose.author.full_name),
         phone=compose.author.cisco if compose.author.cisco else '00-00',
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=compose.register_date.strftime('%d.%m.%Y'),
         negotiators=negotiator_data,
         env_id=compose.company.env_id
     ).generate_pdf()
 
-    modify_compose(compose,
-                   registered_document_id=base_document.id,
-                   file_id=saved_file_id,
-                   register_number=register_number,
-                   num=num,
-                   register_date=compose.register_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
-    if (
-            compose.document_type_id == DOC_TYPE.HR_ORDER and
-            compose.document_sub_type_id == DOC_TYPE.BUSINESS_TRIP_ORDER
-    ):
-        create_trip_verification(compose, request)
-
 
-def create_trip_verification(compose, request=None):
+def create_trip_verification(compose):
     from apps.compose.models import BusinessTrip, TripVerification
 
     # Fetch trips by notice_id or order_id
@@ -617,20 +616,14 @@ def create_trip_verification(compose, request=None):
     TripVerification.objects.bulk_create(trip_verifications)
 
 
-def register_decree(compose_id, request, notice_instance=None, **kwargs):
+def register_decree(compose_id, register_number, num, notice_instance=None, **kwargs):
     compose = (Compose.objects.
                select_related('company', 'journal', 'author', 'document_sub_type').
-               prefetch_related('signers').
                get(id=compose_id))
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
     now = timezone.now()
     base_document = create_base_document(compose, now, register_number)
 
     signers = Signer.objects.filter(compose_id=compose_id)
-    basic_signer_data = get_signers(signers.order_by('-action_date'))
-
     compose_instance = notice_instance if notice_instance else compose
 
     # Create an assignment for the performers
@@ -641,33 +634,17 @@ def register_decree(compose_id, request, notice_instance=None, **kwargs):
                       resolution_type=basic_signer.resolution_type,
                       deadline=basic_signer.deadline)
 
+    modify_compose(compose, registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num, register_date=now)
+    save_files(compose, base_document)
+
     # Fetch trip information
     trip_information = get_trip_data(compose_id)
-    trip_v2 = get_trip_data_by_group_id(compose_id)
     register_date = compose.created_date.strftime('%d.%m.%Y')
 
-    saved_file_id = GenerateDecreeToPdf(
-        check_id=compose.check_id,
-        content=compose.content,
-        signers=basic_signer_data,
-        executor=normalize_user_name(compose.author.full_name),
-        phone=compose.author.cisco if compose.author.cisco else '00-00',
-        register_number=register_number,
-        register_date=register_date,
-        trips=trip_information,
-        doc_sub_type=compose.document_sub_type_id,
-        env_id=compose.company.env_id,
-        trip_notice_number=compose.parent.register_number if compose.parent else None,
-        trip_v2=trip_v2,
-    ).generate_pdf()
-
-    modify_compose(compose, registered_document_id=base_document.id,
-                   file_id=saved_file_id, register_number=register_number,
-                   num=num, register_date=now)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
     if is_trip_decree(compose):
-        handle_trip_decree(compose, request, trip_information, register_number, register_date, compose_instance)
+        handle_trip_decree(compose, trip_information, register_number, register_date, compose_instance)
 
     if is_trip_extension_decree(compose):
         handle_trip_extension(compose, trip_information, register_number, register_date, compose_id)
@@ -708,33 +685,57 @@ def register_decree(compose_id, request, notice_instance=None, **kwargs):
     #     )
 
 
-def handle_trip_decree(compose, request, trips, register_number, register_date, compose_instance):
-    create_trip_verification(compose, request)
+def render_decree(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    basic_signer_data = get_signers(signers.order_by('-action_date'))
+
+    return GenerateDecreeToPdf(
+        check_id=compose.check_id,
+        content=compose.content,
+        signers=basic_signer_data,
+        executor=normalize_user_name(compose.author.full_name),
+        phone=compose.author.cisco if compose.author.cisco else '00-00',
+        register_number=compose.register_number,
+        register_date=compose.created_date.strftime('%d.%m.%Y'),
+        trips=get_trip_data(compose.id),
+        doc_sub_type=compose.document_sub_type_id,
+        env_id=compose.company.env_id,
+        trip_notice_number=compose.parent.register_number if compose.parent else None,
+        trip_v2=get_trip_data_by_group_id(compose.id),
+    ).generate_pdf()
+
+
+def handle_trip_decree(compose, trips, register_number, register_date, compose_instance):
+    create_trip_verification(compose)
     user_id = get_current_user_id()
     ct_id = get_content_type_id(compose_instance)
 
-    for trip in trips:
-        phone = trip.get('phone')
-        full_name = trip.get('full_name')
-        start_date = trip.get('start_date')
-        message = (
-            f"Hurmatli xodim! {start_date} dan xizmat safaringiz. "
-            "SalomCBU ilovasini yuklang, safaringizni tasdiqlang: "
-            "iOS https://bit.ly/3YMTOzu Android https://bit.ly/4gNU7BU"
+    # SMS, logs and IABS only for a committed registration
+    def _send():
+        for trip in trips:
+            phone = trip.get('phone')
+            full_name = trip.get('full_name')
+            start_date = trip.get('start_date')
+            message = (
+                f"Hurmatli xodim! {start_date} dan xizmat safaringiz. "
+                "SalomCBU ilovasini yuklang, safaringizni tasdiqlang: "
+                "iOS https://bit.ly/3YMTOzu Android https://bit.ly/4gNU7BU"
+            )
+            is_ok, res = send_sms_to_phone(phone, message)
+            action_log.apply_async(
+                (user_id, 'created', '147' if is_ok else '148', ct_id,
+                 compose_instance.id, None, full_name if is_ok else res), countdown=2)
+
+        send_about_trip_creation_iabs.apply_async(
+            (compose.company.local_code, register_number, register_date),
+            {
+                'trips': trips,
+                'compose_id': compose.id,
+            },
+            countdown=2,
         )
-        is_ok, res = send_sms_to_phone(phone, message)
-        action_log.apply_async(
-            (user_id, 'created', '147' if is_ok else '148', ct_id,
-             compose_instance.id, None, full_name if is_ok else res), countdown=2)
 
-    send_about_trip_creation_iabs.apply_async(
-        (compose.company.local_code, register_number, register_date),
-        {
-            'trips': trips,
-            'compose_id': compose.id,
-        },
-        countdown=2,
-    )
+    transaction.on_commit(_send)
 
 
 def get_parent_compose_id(compose) -> int:
@@ -746,17 +747,21 @@ def get_parent_compose_id(compose) -> int:
 
 def handle_trip_extension(compose, trips, register_number, register_date, compose_id):
     parent_compose_id = get_parent_compose_id(compose)
-    send_about_trip_creation_iabs.apply_async(
-        (compose.company.local_code, register_number, register_date),
-        {
-            'trips': trips,
-            'compose_id': compose_id,
-            'order_type': '102',  # Extend trip decree
-            'type': 'extension',
-            'parent_compose_id': parent_compose_id,
-        },
-        countdown=2,
-    )
+
+    def _send():
+        send_about_trip_creation_iabs.apply_async(
+            (compose.company.local_code, register_number, register_date),
+            {
+                'trips': trips,
+                'compose_id': compose_id,
+                'order_type': '102',  # Extend trip decree
+                'type': 'extension',
+                'parent_compose_id': parent_compose_id,
+            },
+            countdown=2,
+        )
+
+    transaction.on_commit(_send)
 
 
 def is_trip_decree(compose):
@@ -773,68 +778,60 @@ def is_trip_extension_decree(compose):
     )
 
 
-def register_local_trip_order(compose_id, request, **kwargs):
+def register_local_trip_order(compose_id, register_number, num, **kwargs):
     compose = Compose.objects.get(id=compose_id)
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
     now = timezone.now()
     base_document = create_base_document(compose, now, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    negotiators = get_signers(signers.filter(type='signer').order_by('-action_date'))
-
     # Create an assignment for the performers
-    curator_qs = signers.filter(type='basic_signer')
-    curator = get_signers(curator_qs)
-    basic_signer = curator_qs.first()
+    basic_signer = Signer.objects.filter(compose_id=compose_id, type='basic_signer').first()
     create_assignment(base_document.id, basic_signer.user_id, basic_signer.performers,
                       basic_signer.resolution_text,
                       resolution_type=basic_signer.resolution_type, deadline=basic_signer.deadline)
 
+    modify_compose(compose,
+                   registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num,
+                   register_date=now)
+    save_files(compose, base_document)
+
+    if (
+            compose.document_type_id == DOC_TYPE.HR_ORDER and
+            compose.document_sub_type_id == DOC_TYPE.LOCAL_BUSINESS_TRIP_ORDER
+    ):
+        create_trip_verification(compose)
+
+
+def render_local_trip_order(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    negotiators = get_signers(signers.filter(type='signer').order_by('-action_date'))
+    curator = get_signers(signers.filter(type='basic_signer'))
+
     # Fetch trip information
-    trip_information = get_trip_data(compose_id)
+    trip_information = get_trip_data(compose.id)
 
-    saved_file_id = GenerateLocalTripOrderToPdf(
+    return GenerateLocalTripOrderToPdf(
         check_id=compose.check_id,
         content=compose.content,
         signers=negotiators,
         curator=curator,
         executor=normalize_user_name(compose.author.full_name),
         phone=compose.author.cisco if compose.author.cisco else '00-00',
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=compose.created_date.strftime('%d.%m.%Y'),
         trips=trip_information,
         env_id=compose.company.env_id
     ).generate_pdf()
 
-    modify_compose(compose,
-                   registered_document_id=base_document.id,
-                   file_id=saved_file_id,
-                   register_number=register_number,
-                   num=num,
-                   register_date=now)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
-    if (
-            compose.document_type_id == DOC_TYPE.HR_ORDER and
-            compose.document_sub_type_id == DOC_TYPE.LOCAL_BUSINESS_TRIP_ORDER
-    ):
-        create_trip_verification(compose, request)
-
 
-def register_power_of_attorney(compose_id, request):
+def register_power_of_attorney(compose_id, register_number, num, **kwargs):
     # Fetch the Compose instance
     compose = Compose.objects.get(id=compose_id)
 
-    # Register the document
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate_power_of_attorney_number()
     base_document = create_base_document(compose, compose.created_date, register_number)
 
-    signers = Signer.objects.filter(compose_id=compose_id)
-    signer = signers.last()
+    signer = Signer.objects.filter(compose_id=compose_id).last()
 
     # Create a task for the performers
     create_assignment(base_document.id,
@@ -844,6 +841,18 @@ def register_power_of_attorney(compose_id, request):
                       resolution_type=signer.resolution_type,
                       deadline=signer.deadline)
 
+    modify_compose(compose,
+                   registered_document_id=base_document.id,
+                   register_number=register_number,
+                   num=num,
+                   register_date=compose.created_date)
+    save_files(compose, base_document)
+
+
+def render_power_of_attorney(compose):
+    signers = Signer.objects.filter(compose_id=compose.id)
+    signer = signers.last()
+
     old_attorney_date = None
     old_attorney_number = None
     old_attorney_exists = 'not_exists'
@@ -854,14 +863,14 @@ def register_power_of_attorney(compose_id, request):
         old_attorney_date = compose.parent.register_date.strftime('%d.%m.%Y')
         old_attorney_number = compose.parent.register_number
 
-    saved_file_id = GeneratePowerOfAttorneyToPdf(
+    return GeneratePowerOfAttorneyToPdf(
         check_id=compose.check_id,
         signers=get_signers(signers.exclude(type='signer')),
         executor=normalize_user_name(compose.author.full_name),
         phone=compose.author.cisco if compose.author.cisco else '00-00',
         created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
         signed_date=signer.action_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-        register_number=register_number,
+        register_number=compose.register_number,
         curator_name=compose.curator.full_name,
         curator_position=compose.curator.position.name,
         employee_name=compose.user.full_name,
@@ -883,27 +892,34 @@ def register_power_of_attorney(compose_id, request):
         short_description=compose.short_description,
     ).generate_pdf()
 
+
+def register_act(compose_id, register_number, num, **kwargs):
+    # Fetch the Compose instance
+    compose = Compose.objects.get(id=compose_id)
+
+    base_document = create_base_document(compose, compose.created_date, register_number)
+
+    signer = Signer.objects.filter(compose_id=compose_id).last()
+
+    # Create a task for the performers
+    create_assignment(base_document.id,
+                      signer.user_id,
+                      signer.performers,
+                      signer.resolution_text,
+                      resolution_type=signer.resolution_type,
+                      deadline=signer.deadline)
+
     modify_compose(compose,
                    registered_document_id=base_document.id,
-                   file_id=saved_file_id,
                    register_number=register_number,
                    num=num,
                    register_date=compose.created_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
-
-def register_act(compose_id, request=None):
-    # Fetch the Compose instance
-    compose = Compose.objects.get(id=compose_id)
+    save_files(compose, base_document)
 
-    # Register the document
-    register_number, num = GenerateComposeRegisterNumber(
-        journal_index=compose.journal.index,
-        journal_id=compose.journal_id).generate()
-    base_document = create_base_document(compose, compose.created_date, register_number)
 
+def render_act(compose):
     signers = (
-        Signer.objects.filter(compose_id=compose_id)
+        Signer.objects.filter(compose_id=compose.id)
         .select_related("user__position", "user__top_level_department", "user__company__region", )
     )
     all_signers = list(signers)
@@ -928,22 +944,14 @@ def register_act(compose_id, request=None):
 
     signer = signers.last()
 
-    # Create a task for the performers
-    create_assignment(base_document.id,
-                      signer.user_id,
-                      signer.performers,
-                      signer.resolution_text,
-                      resolution_type=signer.resolution_type,
-                      deadline=signer.deadline)
-
-    saved_file_id = GenerateActToPdf(
+    return GenerateActToPdf(
         check_id=compose.check_id,
         signers=filtered_signers,
         executor=normalize_user_name(compose.author.full_name),
         phone=compose.author.cisco if compose.author.cisco else '00-00',
         created_date=compose.created_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
         signed_date=signer.action_date.astimezone().strftime('%d.%m.%Y %H:%M:%S'),
-        register_number=register_number,
+        register_number=compose.register_number,
         register_date=format_uzbek_date(compose.created_date),
         curator_name=normalize_user_name(compose.curator.full_name),
         curator_position=compose.curator.position.name,
@@ -955,14 +963,6 @@ def register_act(compose_id, request=None):
         short_description=compose.short_description,
     ).generate_pdf()
 
-    modify_compose(compose,
-                   registered_document_id=base_document.id,
-                   file_id=saved_file_id,
-                   register_number=register_number,
-                   num=num,
-                   register_date=compose.created_date)
-    save_pdf_and_files(compose, base_document, saved_file_id, request)
-
 
 def are_all_signed_and_approved(compose_id):
     """
@@ -978,41 +978,139 @@ def are_all_signed_and_approved(compose_id):
     return all_signed and all_approved
 
 
-def register_document_after_signing(compose, request, performers=None):
+def get_register_function(compose):
+    """
+    Returns the function that registers the compose's document type, or None if the type is not registered.
+    """
+    doc_type_id = compose.document_type_id
+    doc_sub_type_id = compose.document_sub_type_id
+    DOC_TYPE_ID = CONSTANTS.DOC_TYPE_ID
+
+    if doc_type_id == DOC_TYPE_ID.SERVICE_LETTER:
+        return register_service_letter
+    elif doc_type_id == DOC_TYPE_ID.APPLICATION:
+        return register_application
+    elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id == DOC_TYPE_ID.TRIP_NOTICE:
+        return register_trip_notice
+    elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id in [DOC_TYPE_ID.TRIP_NOTICE_V2,
+                                                                   DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2,
+                                                                   DOC_TYPE_ID.BUSINESS_TRIP_NOTICE_FOREIGN]:
+        return register_trip_notice_v2
+    elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id in DOC_TYPE_ID.NOTICES:
+        return register_notice
+    elif doc_type_id == DOC_TYPE_ID.HR_ORDER and doc_sub_type_id != DOC_TYPE_ID.LOCAL_BUSINESS_TRIP_ORDER:
+        return register_hr_order
+    elif (
+            doc_type_id == DOC_TYPE_ID.DECREE_TYPE and
+            doc_sub_type_id in [DOC_TYPE_ID.TRIP_DECREE_SUB_TYPE,
+                                DOC_TYPE_ID.LOCAL_DECREE_SUB_TYPE,
+                                DOC_TYPE_ID.TRIP_DECREE_V2]
+    ):
+        return register_decree
+    elif doc_type_id == DOC_TYPE_ID.HR_ORDER and doc_sub_type_id == DOC_TYPE_ID.LOCAL_BUSINESS_TRIP_ORDER:
+        return register_local_trip_order
+    elif doc_type_id == DOC_TYPE_ID.LEGAL_SERVICES:
+        return register_power_of_attorney
+    elif doc_sub_type_id == DOC_TYPE_ID.ACT_SERVICE_CONTRACT_WORKS:
+        return register_act
+    return None
+
+
+def allocate_register_number(compose, register_function):
+    """
+    Allocates the next number of the compose's journal, formatted for the document type.
+    The journal's counter row stays locked until the current transaction ends.
+    """
+    generator = GenerateComposeRegisterNumber(journal_index=compose.journal.index, journal_id=compose.journal_id)
+    if register_function is register_power_of_attorney:
+        return generator.generate_power_of_attorney_number()
+    return generator.generate()
+
+
+def register_document_after_signing(compose, performers=None):
     """
     Register any types of documents after all signers have signed the document.
+    A number is allocated only for a document that is actually registered.
+    The PDF is rendered and uploaded afterwards by `render_registered_document`
+    and `upload_registered_document`.
+    """
+    if not are_all_signed_and_approved(compose.id):
+        return
+    register_function = get_register_function(compose)
+    if register_function is None:
+        return
+    register_number, num = allocate_register_number(compose, register_function)
+    register_function(compose.id, register_number, num, performers=performers)
+
+
+RENDER_FUNCTIONS = {
+    register_service_letter: render_service_letter,
+    register_application: render_application,
+    register_trip_notice: render_trip_notice,
+    register_trip_notice_v2: render_trip_notice_v2,
+    register_notice: render_notice,
+    register_hr_order: render_hr_order,
+    register_decree: render_decree,
+    register_local_trip_order: render_local_trip_order,
+    register_power_of_attorney: render_power_of_attorney,
+    register_act: render_act,
+}
+
+
+def get_render_function(compose):
+    """
+    Returns the function that renders the PDF of a registered compose, or None.
+    """
+    # decrees linked to a trip notice are registered with it, whatever their sub type
+    if compose.document_type_id == DOC_TYPE.DECREE_TYPE:
+        return render_decree
+    return RENDER_FUNCTIONS.get(get_register_function(compose))
+
+
+def get_registered_compose_ids(compose):
+    """
+    Ids of the compose and of the decrees registered together with it.
+    """
+    compose_ids = [compose.id]
+    if get_register_function(compose) is register_trip_notice_v2:
+        compose_ids += ComposeLink.objects.filter(to_compose_id=compose.id) \
+            .values_list('from_compose_id', flat=True)
+    return compose_ids
+
+
+def render_registered_document(compose_id):
+    """
+    Renders the PDF of a registered compose and attaches it to the registered document.
+    Does nothing if the compose already has its PDF.
+    """
+    with transaction.atomic():
+        compose = Compose.objects.select_for_update().get(id=compose_id)
+        if not compose.registered_document_id or compose.file_id:
+            return
+        render_function = get_render_function(compose)
+        if render_function is None:
+            return
+        file_id = render_function(compose)
+        Compose.objects.filter(id=compose.id).update(file_id=file_id)
+        DocumentFile.objects.create(document_id=compose.registered_document_id, file_id=file_id)
+
+
+def upload_registered_document(compose_id):
+    """
+    Uploads the PDF of a registered compose unless it is already uploaded.
+    A PDF whose data has expired from the cache is rendered again.
     """
-    compose_id = compose.id
-    if are_all_signed_and_approved(compose_id):
-        doc_type_id = compose.document_type_id
-        doc_sub_type_id = compose.document_sub_type_id
-        DOC_TYPE_ID = CONSTANTS.DOC_TYPE_ID
-
-        if doc_type_id == DOC_TYPE_ID.SERVICE_LETTER:
-            # register the document
-            register_service_letter(compose_id, request)
-        elif doc_type_id == DOC_TYPE_ID.APPLICATION:
-            register_application(compose_id, request, performers=performers)
-        elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id == DOC_TYPE_ID.TRIP_NOTICE:
-            register_trip_notice(compose_id, request)
-        elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id in [DOC_TYPE_ID.TRIP_NOTICE_V2,
-                                                                       DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2,
-                                                                       DOC_TYPE_ID.BUSINESS_TRIP_NOTICE_FOREIGN]:
-            register_trip_notice_v2(compose_id, request)
-        elif doc_type_id == DOC_TYPE_ID.NOTICE and doc_sub_type_id in DOC_TYPE_ID.NOTICES:
-            register_notice(compose_id, request)
-        elif doc_type_id == DOC_TYPE_ID.HR_ORDER and doc_sub_type_id != DOC_TYPE_ID.LOCAL_BUSINESS_TRIP_ORDER:
-            register_hr_order(compose_id, request, performers=performers)
-        elif (
-                doc_type_id == DOC_TYPE_ID.DECREE_TYPE and
-                doc_sub_type_id in [DOC_TYPE_ID.TRIP_DECREE_SUB_TYPE,
-                                    DOC_TYPE_ID.LOCAL_DECREE_SUB_TYPE,
-                                    DOC_TYPE_ID.TRIP_DECREE_V2]
-        ):
-            register_decree(compose_id, request, performers=performers)
-        elif doc_type_id == DOC_TYPE_ID.HR_ORDER and doc_sub_type_id == DOC_TYPE_ID.LOCAL_BUSINESS_TRIP_ORDER:
-            register_local_trip_order(compose_id, request)
-        elif doc_type_id == DOC_TYPE_ID.LEGAL_SERVICES:
-            register_power_of_attorney(compose_id, request)
-        elif doc_sub_type_id == DOC_TYPE_ID.ACT_SERVICE_CONTRACT_WORKS:
-            register_act(compose_id, request)
+    compose = Compose.objects.only('id', 'file_id', 'registered_document_id').get(id=compose_id)
+    file = File.objects.filter(id=compose.file_id, state__in=('pending', 'failed')).first()
+    if file is None or upload_pdf(file):
+        return
+
+    with transaction.atomic():
+        DocumentFile.objects.filter(document_id=compose.registered_document_id, file_id=file.id).delete()
+        Compose.objects.filter(id=compose.id, file_id=file.id).update(file_id=None)
+        file.delete()
+    render_registered_document(compose.id)
+
+    compose.refresh_from_db(fields=['file_id'])
+    if not upload_pdf(File.objects.get(id=compose.file_id)):
+        raise RuntimeError(f'PDF of compose {compose.id} is missing from the cache')
@@ -0,0 +1,106 @@
+"""
+Compact storage of compose text versions (`ComposeVersionModel`).
+
+Every `VERSION_SNAPSHOT_INTERVAL`-th version of a document is stored whole (a snapshot);
+the versions in between store a diff of their texts against the `new_text` of the previous
+version. Both are JSON compressed with zstandard. Texts are diffed as HTML tags, words and
+whitespace, so an edit costs roughly the size of the changed words.
+
+A delta is a list of `[start, end]` slices to copy from the previous text and strings to insert.
+`old_text` of a version is normally the `new_text` of the previous one and is then stored as null.
+"""
+import json
+import os
+import re
+from difflib import SequenceMatcher
+
+import zstandard
+
+# every Nth version of a document is stored whole; reconstruction applies at most N - 1 deltas
+VERSION_SNAPSHOT_INTERVAL = int(os.getenv('COMPOSE_VERSION_SNAPSHOT_INTERVAL', 20))
+VERSION_ZSTD_LEVEL = int(os.getenv('COMPOSE_VERSION_ZSTD_LEVEL', 10))
+
+# tags, words with their trailing whitespace, whitespace and a stray '<'; joined back they give the text
+_TOKEN = re.compile(r'<[^>]*>|[^<\s]+\s*|\s+|<')
+
+
+def _tokens(text):
+    return _TOKEN.findall(text or '')
+
+
+def _compress(value) -> bytes:
+    return zstandard.ZstdCompressor(level=VERSION_ZSTD_LEVEL).compress(
+        json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+    )
+
+
+def _decompress(data):
+    return json.loads(zstandard.ZstdDecompressor().decompress(bytes(data)))
+
+
+def _diff(base_tokens, text):
+    if text is None:
+        return None
+    tokens = _tokens(text)
+
+    # an edit usually touches one place: match the common head and tail before diffing the middle
+    head, limit = 0, min(len(base_tokens), len(tokens))
+    while head < limit and base_tokens[head] == tokens[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and base_tokens[-tail - 1] == tokens[-tail - 1]:
+        tail += 1
+
+    ops = [[0, head]] if head else []
+    matcher = SequenceMatcher(None, base_tokens[head:len(base_tokens) - tail], tokens[head:len(tokens) - tail])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([head + i1, head + i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(''.join(matcher.b[j1:j2]))
+    if tail:
+        ops.append([len(base_tokens) - tail, len(base_tokens)])
+    return ops
+
+
+def _patch(base_tokens, ops):
+    if ops is None:
+        return None
+    return ''.join(op if isinstance(op, str) else ''.join(base_tokens[op[0]:op[1]]) for op in ops)
+
+
+def encode_snapshot(old_text, new_text) -> bytes:
+    return _compress({'old': old_text, 'new': new_text})
+
+
+def encode_delta(base_text, old_text, new_text) -> bytes:
+    base_tokens = _tokens(base_text)
+    return _compress({
+        'old': 0 if old_text == base_text else _diff(base_tokens, old_text),
+        'new': _diff(base_tokens, new_text),
+    })
+
+
+def decode_snapshot(data):
+    value = _decompress(data)
+    return value['old'], value['new']
+
+
+def decode_delta(data, base_text):
+    value = _decompress(data)
+    base_tokens = _tokens(base_text)
+    new_text = _patch(base_tokens, value['new'])
+    old_text = base_text if value['old'] == 0 else _patch(base_tokens, value['old'])
+    return old_text, new_text
+
+
+def decode_chain(chain):
+    """
+    Yields (old_text, new_text) of consecutive versions given their (is_snapshot, data),
+    starting with a snapshot.
+    """
+    base_text = None
+    for is_snapshot, data in chain:
+        old_text, new_text = decode_snapshot(data) if is_snapshot else decode_delta(data, base_text)
+        base_text = new_text
+        yield old_text, new_text
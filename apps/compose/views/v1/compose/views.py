@@ -1,6 +1,7 @@
 import os
 import time
 
+from django.db import transaction
 from django.db.models import Q, F
 from django.http import FileResponse, JsonResponse
 from django.utils import timezone
@@ -21,6 +22,7 @@ from apps.compose.models import (
     ComposeStatus,
     ComposeVersionModel,
     Signer,
+    SigningPipeline,
     Tag,
     ComposeLink,
     IABSActionHistory, IABSRequestCallHistory, BusinessTrip,
@@ -40,13 +42,16 @@ from apps.compose.serializers import (
     ComposeVerifySerializer,
     SignerList2Serializer,
     SignerDetailSerializer,
+    SigningPipelineSerializer,
     IABSActionHistorySerializer,
 )
 from apps.compose.serializers.v1.compose import IABSRequestCallHistorySerializer
 from apps.compose.serializers.v1.compose.iabs_actions import IABSRetryActionSerializer
 from apps.compose.services import DigitalSignatureService, IABSRequestService
 from apps.compose.tasks.delays import create_compose_version
-from apps.compose.tools import register_document_after_signing
+from apps.compose.tasks.signing import start_signing_pipeline
+from apps.compose.tools import register_document_after_signing, get_registered_compose_ids, \
+    render_registered_document, upload_registered_document
 from apps.docflow.models import BaseDocument
 from apps.document.models import MINIO_CLIENT, MINIO_BUCKET_NAME
 from apps.reference.models import DigitalSignInfo
@@ -196,8 +201,9 @@ class ComposeViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=True, url_path='version-history', serializer_class=ComposeVersionSerializer)
     def version_history(self, request, *args, **kwargs):
         instance = self.get_object()
-        queryset = ComposeVersionModel.objects.filter(object_id=instance.id).order_by('created_date')
-        serializer = ComposeVersionSerializer(queryset, many=True)
+        queryset = ComposeVersionModel.objects.filter(object_id=instance.id).order_by('created_date').defer('data')
+        versions = ComposeVersionModel.load_texts(list(queryset))
+        serializer = ComposeVersionSerializer(versions, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(methods=['get'], detail=False, url_path='statuses', serializer_class=ComposeStatusSerializer)
@@ -668,25 +674,71 @@ class SignerViewSet(viewsets.ModelViewSet):
             if result != 'ok':
                 return Response({'success': False, 'message': info}, status=status.HTTP_400_BAD_REQUEST)
 
-        instance.is_signed = True
-        instance.action_date = timezone.now()
-        instance.performers = performers
-        instance.resolution_text = resolution_text
-        instance.resolution_type = resolution_type
-        instance.deadline = deadline
-        instance.certificate_info = info
-        instance.is_all_approved = True
-        instance.save()
+        with transaction.atomic():
+            # signatures of one document are committed one at a time, so the last
+            # of two concurrent signers always sees the other one and starts the pipeline
+            Compose.objects.select_for_update().filter(id=instance.compose_id).first()
+
+            instance.is_signed = True
+            instance.action_date = timezone.now()
+            instance.performers = performers
+            instance.resolution_text = resolution_text
+            instance.resolution_type = resolution_type
+            instance.deadline = deadline
+            instance.certificate_info = info
+            instance.is_all_approved = True
+            instance.save()
 
-        approvers_qs = Approver.objects.filter(
-            compose_id=instance.compose_id,
-            added_by_id=instance.user_id
-        )
+            approvers_qs = Approver.objects.filter(
+                compose_id=instance.compose_id,
+                added_by_id=instance.user_id
+            )
 
-        # Approvers that did NOT approve or disapproved (delete them)
-        approvers_qs.filter(
-            Q(is_approved=False) | Q(is_approved__isnull=True)
-        ).delete()
+            # Approvers that did NOT approve or disapproved (delete them)
+            approvers_qs.filter(
+                Q(is_approved=False) | Q(is_approved__isnull=True)
+            ).delete()
+
+            # create a signer for decree
+            if instance.compose.document_sub_type_id in [CONSTANTS.DOC_TYPE_ID.TRIP_NOTICE_V2,
+                                                         CONSTANTS.DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2,
+                                                         CONSTANTS.DOC_TYPE_ID.BUSINESS_TRIP_NOTICE_FOREIGN]:
+                decree_compose = ComposeLink.objects.filter(to_compose=instance.compose).first()
+                self.sign_decree(decree_compose, instance.user_id,
+                                 info, instance.type, resolution_type,
+                                 resolution_text, deadline, performers)
+
+            if instance.compose.document_sub_type_id == CONSTANTS.DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2:
+
+                # find all business trips whose notice_id == instance.compose.id
+                related_trips = BusinessTrip.objects.filter(notice_id=instance.compose.id)
+
+                for trip in related_trips:
+                    if trip.parent_id:
+                        BusinessTrip.objects.filter(id=trip.parent_id).update(is_active=True)
+
+            # if the document type is not in the excluded list
+            # and the user is not the curator
+            # and the document has a curator
+            # then send the document to the assistant of the curator
+            # otherwise error might occur
+
+            if (
+                    instance.type in ['signer', 'negotiator', 'invited']
+                    and instance.compose.curator_id
+            ):
+                # send the document to the assistant of the curator
+                self.send_to_curator_assistant(instance)
+
+            # register as the base document after all signers have signed the document;
+            # registration, the PDF and the fan-out run in Celery once the signature is committed
+            pipeline = None
+            if self.are_all_signed_and_approved(instance.compose_id):
+                pipeline = SigningPipeline.objects.create(compose_id=instance.compose_id,
+                                                          signer=instance,
+                                                          user_id=instance.user_id,
+                                                          performers=performers)
+                transaction.on_commit(lambda: start_signing_pipeline(pipeline))
 
         # save user action to database
         user_id = get_current_user_id()
@@ -696,41 +748,33 @@ class SignerViewSet(viewsets.ModelViewSet):
             (user_id, 'created', '140', ct_id,
              instance.compose_id, user_ip, comment), countdown=2)
 
-        # create a signer for decree
-        if instance.compose.document_sub_type_id in [CONSTANTS.DOC_TYPE_ID.TRIP_NOTICE_V2,
-                                                     CONSTANTS.DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2,
-                                                     CONSTANTS.DOC_TYPE_ID.BUSINESS_TRIP_NOTICE_FOREIGN]:
-            decree_compose = ComposeLink.objects.filter(to_compose=instance.compose).first()
-            self.sign_decree(decree_compose, instance.user_id,
-                             info, instance.type, resolution_type,
-                             resolution_text, deadline, performers)
-
-        if instance.compose.document_sub_type_id == CONSTANTS.DOC_TYPE_ID.EXTEND_TRIP_NOTICE_V2:
-
-            # find all business trips whose notice_id == instance.compose.id
-            related_trips = BusinessTrip.objects.filter(notice_id=instance.compose.id)
-
-            for trip in related_trips:
-                if trip.parent_id:
-                    BusinessTrip.objects.filter(id=trip.parent_id).update(is_active=True)
-
-        # if the document type is not in the excluded list
-        # and the user is not the curator
-        # and the document has a curator
-        # then send the document to the assistant of the curator
-        # otherwise error might occur
+        data = dict(serializer.data)
+        data['signing_pipeline'] = SigningPipelineSerializer(pipeline).data if pipeline else None
+        return Response(data, status=status.HTTP_200_OK)
 
-        if (
-                instance.type in ['signer', 'negotiator', 'invited']
-                and instance.compose.curator_id
-        ):
-            # send the document to the assistant of the curator
-            self.send_to_curator_assistant(instance)
+    @action(methods=['get'], detail=True, url_name='signing-status', url_path='signing-status')
+    def signing_status(self, request, *args, **kwargs):
+        instance = self.get_object()
+        pipeline = instance.signing_pipelines.order_by('-id').first()
+        if pipeline is None:
+            return Response({'message': 'Signing pipeline not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(SigningPipelineSerializer(pipeline).data, status=status.HTTP_200_OK)
 
-        # register as the base document after all signers have signed the document
-        register_document_after_signing(instance.compose, request, performers)
+    @action(methods=['post'], detail=True, url_name='retry-signing', url_path='retry-signing')
+    def retry_signing(self, request, *args, **kwargs):
+        """
+        Re-runs a failed signing pipeline from the step that failed.
+        """
+        instance = self.get_object()
+        pipeline = instance.signing_pipelines.order_by('-id').first()
+        if pipeline is None:
+            return Response({'message': 'Signing pipeline not found'}, status=status.HTTP_404_NOT_FOUND)
+        if pipeline.status != CONSTANTS.COMPOSE.SIGNING_STATUSES.FAILED:
+            return Response({'message': 'Only a failed signing pipeline can be retried'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        start_signing_pipeline(pipeline)
+        return Response(SigningPipelineSerializer(pipeline).data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'], url_path='add-approvers')
     def add_approvers(self, request):
@@ -873,7 +917,10 @@ class RestoreCompose(views.APIView):
         self.delete_related_documents(compose_id)
         time.sleep(1)
 
-        register_document_after_signing(compose, request, performers)
+        register_document_after_signing(compose, performers)
+        for registered_id in get_registered_compose_ids(compose):
+            render_registered_document(registered_id)
+            upload_registered_document(registered_id)
 
         return Response({'message': 'ok'}, status=status.HTTP_200_OK)
 
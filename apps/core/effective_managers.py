@@ -0,0 +1,87 @@
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.models import BranchManager, DepartmentManager
+from utils.cache_version import bump_version, get_version
+
+EffectiveManager = namedtuple('EffectiveManager', ['id', 'user_id', 'is_primary', 'sort_order'])
+
+EFFECTIVE_MANAGERS_KEY = 'effective_managers:{}:v{}'
+# bumped on every manager edit; the date in the key takes care of valid_from/valid_until boundaries
+EFFECTIVE_MANAGERS_VERSION_KEY = 'effective_managers_version'
+EFFECTIVE_MANAGERS_TIMEOUT = 26 * 60 * 60
+
+SCOPES = {
+    'department': (DepartmentManager, 'department_id'),
+    'branch': (BranchManager, 'branch_id'),
+}
+
+
+def load_effective_managers(day) -> dict:
+    """
+    Reads the managers in effect on `day` for the whole organization, one query per table.
+    Returns {'department': {department_id: [EffectiveManager, ...]}, 'branch': {...}},
+    each list ordered primary first, then by sort_order.
+    """
+    managers = {}
+    for scope, (model, field) in SCOPES.items():
+        rows = (model.objects
+                .filter(is_active=True, **{f'{field}__isnull': False})
+                .filter(Q(valid_from__isnull=True) | Q(valid_from__lte=day),
+                        Q(valid_until__isnull=True) | Q(valid_until__gte=day))
+                .order_by(field, '-is_primary', 'sort_order', 'id')
+                .values_list(field, 'id', 'user_id', 'is_primary', 'sort_order'))
+        by_scope = defaultdict(list)
+        for scope_id, *manager in rows:
+            by_scope[scope_id].append(EffectiveManager(*manager))
+        managers[scope] = dict(by_scope)
+    return managers
+
+
+@lru_cache(maxsize=4)
+def _effective_managers(day, version) -> dict:
+    key = EFFECTIVE_MANAGERS_KEY.format(day.isoformat(), version)
+    managers = cache.get(key)
+    if managers is None:
+        managers = load_effective_managers(day)
+        cache.set(key, managers, EFFECTIVE_MANAGERS_TIMEOUT)
+    return managers
+
+
+def get_effective_managers(scope, ids, day=None) -> dict:
+    """
+    Resolves the managers in effect of many departments or branches (`scope`) at once:
+    {id: [EffectiveManager, ...]}, an empty list for ids without managers.
+    Costs one cache round trip; the map comes from the process, Redis or, once a day
+    and after a manager edit, the database. The lists are copies, the cached map is shared.
+    """
+    day = day or timezone.localdate()
+    managers = _effective_managers(day, get_version(EFFECTIVE_MANAGERS_VERSION_KEY))[scope]
+    return {i: list(managers.get(i, ())) for i in ids}
+
+
+def precompute_effective_managers(day=None) -> int:
+    """
+    Stores the managers in effect on `day` ahead of the first lookup; returns the number of scopes.
+    """
+    day = day or timezone.localdate()
+    managers = load_effective_managers(day)
+    version = get_version(EFFECTIVE_MANAGERS_VERSION_KEY)
+    cache.set(EFFECTIVE_MANAGERS_KEY.format(day.isoformat(), version), managers, EFFECTIVE_MANAGERS_TIMEOUT)
+    return sum(len(by_scope) for by_scope in managers.values())
+
+
+def _bump_effective_managers_version():
+    bump_version(EFFECTIVE_MANAGERS_VERSION_KEY)
+
+
+def invalidate_effective_managers() -> None:
+    """
+    Makes the resolved managers of every day stale once the current transaction commits.
+    """
+    transaction.on_commit(_bump_effective_managers_version)
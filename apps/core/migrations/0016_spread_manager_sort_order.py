@@ -0,0 +1,28 @@
+from django.db import migrations
+
+SPREAD_SQL = """
+    UPDATE {table} AS m SET sort_order = {first} + ranked.position * {step}
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY {scope} ORDER BY sort_order, id) - 1 AS position
+        FROM {table}
+    ) AS ranked
+    WHERE m.id = ranked.id AND m.sort_order <> {first} + ranked.position * {step};
+"""
+
+
+def _spread(first, step):
+    return ''.join(SPREAD_SQL.format(table=table, scope=scope, first=first, step=step)
+                   for table, scope in (('core_departmentmanager', 'department_id'),
+                                        ('core_branchmanager', 'branch_id')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_ingeststate_reason'),
+    ]
+
+    operations = [
+        # spread sort_order to 1024, 2048, ... within a department/branch; reverse compacts to 0..n-1
+        migrations.RunSQL(_spread(1024, 1024), _spread(0, 1)),
+    ]
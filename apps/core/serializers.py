@@ -7,6 +7,7 @@ from apps.core.models import (
     BranchManager,
     DepartmentManager,
 )
+from apps.core.services import SORT_ORDER_GAP
 from utils.exception import get_response_message, ValidationError2
 from utils.serializer import SelectItemField
 
@@ -65,8 +66,8 @@ class DepartmentManagerSerializer(serializers.ModelSerializer):
             max_so = (
                          DepartmentManager.objects
                          .filter(department=validated_data['department'])
-                         .aggregate(m=Max('sort_order'))['m']) or -1
-            validated_data['sort_order'] = max_so + 1
+                         .aggregate(m=Max('sort_order'))['m']) or 0
+            validated_data['sort_order'] = max_so + SORT_ORDER_GAP
 
         obj = super().create(validated_data)
 
@@ -96,8 +97,8 @@ class BranchManagerSerializer(serializers.ModelSerializer):
         # Append to bottom if sort_order is missing
         if 'sort_order' not in validated_data or validated_data.get('sort_order') is None:
             max_so = BranchManager.objects.filter(branch=validated_data['branch']).aggregate(m=Max('sort_order'))[
-                         'm'] or -1
-            validated_data['sort_order'] = max_so + 1
+                         'm'] or 0
+            validated_data['sort_order'] = max_so + SORT_ORDER_GAP
 
         obj = super().create(validated_data)
 
@@ -1,98 +1,164 @@
+import os
+
+from django.db import transaction
 from django.db.models import Q
-from django.utils import timezone
 
+from apps.core.effective_managers import get_effective_managers, invalidate_effective_managers
 from apps.core.models import DepartmentManager, BranchManager
 
+# sort_order keys are spread this far apart, so a move takes a key between its new neighbours
+SORT_ORDER_GAP = int(os.getenv('MANAGER_SORT_ORDER_GAP', 1024))
+# a move that leaves less room than this around the moved row schedules a background rebalance
+SORT_ORDER_MIN_GAP = int(os.getenv('MANAGER_SORT_ORDER_MIN_GAP', 8))
+# attempts to move a row between neighbours that keep changing before the whole scope is locked
+SORT_ORDER_MOVE_ATTEMPTS = 3
+SORT_ORDER_MAX = 2147483647
 
-def _normalize(qs):
-    """Compact sort_order to 0..n-1 (top = 0)."""
-    ids = list(qs.order_by("sort_order", "id").values_list("id", flat=True))
-    if not ids:
-        return
-    objs = {o.id: o for o in qs.filter(id__in=ids)}
-    changed = False
-    for new_so, pk in enumerate(ids):
-        o = objs[pk]
-        if o.sort_order != new_so:
-            o.sort_order = new_so
-            changed = True
+SCOPE_FIELDS = {
+    DepartmentManager: 'department_id',
+    BranchManager: 'branch_id',
+}
+
+
+class _NeighboursChanged(Exception):
+    """The neighbours of a move were reordered between reading and locking them."""
+
+
+def _normalize(qs, move=None):
+    """
+    Spread sort_order to GAP, 2*GAP, ... (top first) under a lock on the whole scope.
+    `move` = (id, index) places that row at the index first.
+    """
+    # lock in id order, like a move locks its rows, so the two never wait on each other in a cycle
+    rows = sorted(qs.select_for_update().order_by("id").values_list("id", "sort_order"), key=lambda r: (r[1], r[0]))
+    if move is not None:
+        ids = [pk for pk, _ in rows]
+        if move[0] in ids:
+            row = rows.pop(ids.index(move[0]))
+            rows.insert(max(0, min(move[1], len(rows))), row)
+    changed = [
+        qs.model(id=pk, sort_order=(i + 1) * SORT_ORDER_GAP)
+        for i, (pk, sort_order) in enumerate(rows) if sort_order != (i + 1) * SORT_ORDER_GAP
+    ]
     if changed:
-        qs.model.objects.bulk_update(objs.values(), ["sort_order"])
+        qs.model.objects.bulk_update(changed, ["sort_order"])
+        invalidate_effective_managers()
+
+
+def _key_between(before, after):
+    """A sort_order strictly between two keys (None = scope edge), or None when there is no room."""
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return after // 2 if after > 0 else None
+    if after is None:
+        return before + SORT_ORDER_GAP if before + SORT_ORDER_GAP <= SORT_ORDER_MAX else None
+    return (before + after) // 2 if after - before >= 2 else None
+
+
+def _schedule_rebalance(obj):
+    from apps.core.tasks import rebalance_manager_order
+
+    field = SCOPE_FIELDS[type(obj)]
+    transaction.on_commit(lambda: rebalance_manager_order.delay(obj._meta.label, field, getattr(obj, field)))
+
+
+def _move_between(scope_qs, obj, target_index):
+    """
+    One attempt to give `obj` a key between its new neighbours. Only `obj` and the two
+    neighbours are locked; returns False when the scope needs a rebalance first.
+    """
+    rows = list(scope_qs.order_by("sort_order", "id").values_list("id", "sort_order"))
+    ids = [pk for pk, _ in rows]
+    if obj.id not in ids:
+        return True
+    i = ids.index(obj.id)
+    target = max(0, min(target_index, len(rows) - 1))
+    if target == i:
+        return True
+
+    current = rows.pop(i)
+    before = rows[target - 1] if target > 0 else None
+    after = rows[target] if target < len(rows) else None
+    key = _key_between(before and before[1], after and after[1])
+    if key is None:
+        return False
+
+    expected = dict([current] + [row for row in (before, after) if row])
+    locked = dict(
+        scope_qs.model.objects.select_for_update()
+        .filter(id__in=expected).order_by("id").values_list("id", "sort_order")
+    )
+    if locked != expected:
+        raise _NeighboursChanged
+
+    # a row inserted or moved between the neighbours after they were read
+    between = scope_qs.exclude(id=obj.id)
+    if before:
+        between = between.filter(Q(sort_order__gt=before[1]) | Q(sort_order=before[1], id__gt=before[0]))
+    if after:
+        between = between.filter(Q(sort_order__lt=after[1]) | Q(sort_order=after[1], id__lt=after[0]))
+    if between.exists():
+        raise _NeighboursChanged
+
+    scope_qs.model.objects.filter(id=obj.id).update(sort_order=key)
+    obj.sort_order = key
+    invalidate_effective_managers()
+    if key - (before[1] if before else 0) < SORT_ORDER_MIN_GAP or (after and after[1] - key < SORT_ORDER_MIN_GAP):
+        _schedule_rebalance(obj)
+    return True
 
 
 def _swap_with_neighbor(scope_qs, obj, direction: str):
     """Swap obj with previous ('up') or next ('down') in ascending order."""
-    scope = scope_qs.select_for_update().order_by("sort_order", "id")
-    rows = list(scope)
-    if not rows:
-        return
-    idx = next((i for i, r in enumerate(rows) if r.id == obj.id), None)
-    if idx is None:
+    ids = list(scope_qs.order_by("sort_order", "id").values_list("id", flat=True))
+    if obj.id not in ids:
         return
+    idx = ids.index(obj.id)
     if direction == "up":
         if idx == 0:  # already top
             return
-        a, b = rows[idx - 1], rows[idx]
+        _move_to(scope_qs, obj, idx - 1)
     else:
-        if idx == len(rows) - 1:  # already bottom
+        if idx == len(ids) - 1:  # already bottom
             return
-        a, b = rows[idx], rows[idx + 1]
-    a.sort_order, b.sort_order = b.sort_order, a.sort_order
-    scope.model.objects.bulk_update([a, b], ["sort_order"])
+        _move_to(scope_qs, obj, idx + 1)
 
 
 def _move_to(scope_qs, obj, target_index: int):
     """
     Move `obj` to `target_index` (0-based, top=0) within `scope_qs`.
-    Recomputes contiguous sort_order for the whole scope atomically.
+    Updates the sort_order of `obj` alone, locking it and its new neighbours; the whole
+    scope is locked and respread only when the neighbours leave no room or keep changing.
     """
-    scope = scope_qs.select_for_update().order_by("sort_order", "id")
-    rows = list(scope)
-    if not rows:
-        return
+    for _ in range(SORT_ORDER_MOVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                if _move_between(scope_qs, obj, target_index):
+                    return
+                break
+        except _NeighboursChanged:
+            continue
 
-    # clamp target
-    n = len(rows)
-    i = next((idx for idx, r in enumerate(rows) if r.id == obj.id), None)
-    if i is None:
-        return
-    target = max(0, min(target_index, n - 1))
-    if target == i:
-        return
+    with transaction.atomic():
+        _normalize(scope_qs, move=(obj.id, target_index))
 
-    # remove + insert
-    row = rows.pop(i)
-    rows.insert(target, row)
 
-    # rewrite contiguous orders
-    changed = False
-    for new_so, r in enumerate(rows):
-        if r.sort_order != new_so:
-            r.sort_order = new_so
-            changed = True
-    if changed:
-        scope.model.objects.bulk_update(rows, ["sort_order"])
+def effective_department_managers(department_id):
+    """Managers of a department in effect today, primary first, then by sort_order."""
+    return get_effective_managers('department', [department_id])[department_id]
 
 
-def effective_department_managers(department_id, role=None):
-    today = timezone.localdate()
-    qs = DepartmentManager.objects.filter(
-        department_id=department_id, is_active=True
-    ).filter(
-        Q(valid_from__isnull=True) | Q(valid_from__lte=today),
-        Q(valid_until__isnull=True) | Q(valid_until__gte=today),
-    )
-    if role:
-        qs = qs.filter(role=role)
-    return qs.order_by("-is_primary", "sort_order")
+def effective_branch_managers(branch_id):
+    """Managers of a branch in effect today, primary first, then by sort_order."""
+    return get_effective_managers('branch', [branch_id])[branch_id]
 
 
-def effective_branch_managers(branch_id):
-    today = timezone.localdate()
-    qs = BranchManager.objects.filter(
-        branch_id=branch_id, is_active=True
-    ).filter(
-        Q(valid_from__isnull=True) | Q(valid_from__lte=today),
-        Q(valid_until__isnull=True) | Q(valid_until__gte=today),
-    )
-    return qs.order_by("-is_primary", "sort_order")
+def effective_managers_of_departments(department_ids, day=None):
+    """{department_id: [EffectiveManager, ...]} for many departments at once."""
+    return get_effective_managers('department', department_ids, day)
+
+
+def effective_managers_of_branches(branch_ids, day=None):
+    """{branch_id: [EffectiveManager, ...]} for many branches at once."""
+    return get_effective_managers('branch', branch_ids, day)
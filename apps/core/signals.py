@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.effective_managers import invalidate_effective_managers
+from apps.core.models import DepartmentManager, BranchManager
+
+
+@receiver([post_save, post_delete], sender=DepartmentManager)
+@receiver([post_save, post_delete], sender=BranchManager)
+def _invalidate_effective_managers_on_manager_change(sender, **kwargs):
+    invalidate_effective_managers()
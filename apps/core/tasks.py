@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+
+from apps.core import effective_managers
+from apps.core.services import _normalize
+
+
+@shared_task(name='apps.core.tasks.rebalance_manager_order')
+def rebalance_manager_order(model_label, scope_field, scope_id):
+    """
+    Respread sort_order of a department's or branch's managers after moves used up the gaps.
+    """
+    model = apps.get_model(model_label)
+    with transaction.atomic():
+        _normalize(model.objects.filter(**{scope_field: scope_id}))
+    return 'ok'
+
+
+@shared_task(name='apps.core.tasks.precompute_effective_managers')
+def precompute_effective_managers():
+    """
+    Resolves today's managers of every department and branch before the first lookup of the day.
+    """
+    return f'Resolved managers of {effective_managers.precompute_effective_managers()} departments and branches'
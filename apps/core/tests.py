@@ -1,3 +1,169 @@
-from django.test import TestCase
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from apps.core import tasks as core_tasks
+from apps.core.effective_managers import EFFECTIVE_MANAGERS_VERSION_KEY
+from apps.core.models import BranchManager, DepartmentManager
+from apps.core.services import SORT_ORDER_GAP, _move_to, _swap_with_neighbor, effective_branch_managers, \
+    effective_department_managers, effective_managers_of_departments
+
+
+@pytest.fixture
+def rebalances(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(core_tasks.rebalance_manager_order, 'delay', lambda *args: scheduled.append(args))
+    return scheduled
+
+
+def _managers(department, count, step=SORT_ORDER_GAP):
+    return DepartmentManager.objects.bulk_create([
+        DepartmentManager(department=department, sort_order=(i + 1) * step) for i in range(count)
+    ])
+
+
+def _order(department):
+    return list(DepartmentManager.objects.filter(department=department)
+                .order_by('sort_order', 'id').values_list('id', flat=True))
+
+
+def _keys(department):
+    return dict(DepartmentManager.objects.filter(department=department).values_list('id', 'sort_order'))
+
+
+def test_move_updates_only_the_moved_row(department, rebalances):
+    managers = _managers(department, 5)
+    scope = DepartmentManager.objects.filter(department=department)
+    before = _keys(department)
+
+    _move_to(scope, managers[4], 1)
+    _swap_with_neighbor(scope, managers[0], 'down')
+
+    after = _keys(department)
+    assert _order(department) == [managers[i].id for i in (4, 0, 1, 2, 3)]
+    assert {pk for pk in before if before[pk] != after[pk]} == {managers[4].id, managers[0].id}
+    assert rebalances == []
+
+
+def test_move_without_room_respreads_the_scope(department, rebalances):
+    managers = _managers(department, 4, step=1)
+    scope = DepartmentManager.objects.filter(department=department)
+
+    _move_to(scope, managers[3], 1)
+
+    assert _order(department) == [managers[i].id for i in (0, 3, 1, 2)]
+    assert sorted(_keys(department).values()) == [SORT_ORDER_GAP * i for i in range(1, 5)]
+
+
+def test_narrow_gap_schedules_a_rebalance(department, rebalances):
+    managers = _managers(department, 3)
+    scope = DepartmentManager.objects.filter(department=department)
+
+    for _ in range(8):
+        _move_to(scope, DepartmentManager.objects.get(id=_order(department)[2]), 1)
+    assert rebalances and rebalances[-1] == ('core.DepartmentManager', 'department_id', department.id)
+
+    order = _order(department)
+    core_tasks.rebalance_manager_order(*rebalances[-1])
+    assert _order(department) == order
+    assert sorted(_keys(department).values()) == [SORT_ORDER_GAP * i for i in range(1, 4)]
+    assert {m.id for m in managers} == set(order)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_reorders_keep_a_consistent_order(department, rebalances):
+    managers = _managers(department, 24)
+    to_top, to_bottom = managers[8:14], managers[14:20]
+    untouched = [m.id for m in managers if m not in to_top and m not in to_bottom]
+    threads = len(to_top) + len(to_bottom)
+    barrier = threading.Barrier(threads)
+
+    def _reorder(i):
+        rng = random.Random(i)
+        scope = DepartmentManager.objects.filter(department_id=department.id)
+        try:
+            for _ in range(10):
+                # random moves race with each other, then every thread moves its row to an edge at once
+                mover = DepartmentManager.objects.get(id=rng.choice(untouched))
+                _move_to(scope, mover, rng.randrange(len(managers)))
+            barrier.wait()
+            if i < len(to_top):
+                _move_to(scope, to_top[i], 0)
+            else:
+                _move_to(scope, to_bottom[i - len(to_top)], len(managers) - 1)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_reorder, range(threads)))
+
+    order = _order(department)
+    keys = _keys(department)
+    assert sorted(order) == sorted(m.id for m in managers)
+    assert len(set(keys.values())) == len(managers)
+    # every move to an edge won: the six rows moved to the top and bottom are there, in some order
+    assert set(order[:len(to_top)]) == {m.id for m in to_top}
+    assert set(order[-len(to_bottom):]) == {m.id for m in to_bottom}
+
+
+def test_effective_managers_follow_validity_windows(department, top_level_department, company, user, user2,
+                                                    django_capture_on_commit_callbacks):
+    today = timezone.localdate()
+    with django_capture_on_commit_callbacks(execute=True):
+        deputy = DepartmentManager.objects.create(department=department, user=user2, sort_order=SORT_ORDER_GAP)
+        leader = DepartmentManager.objects.create(department=department, user=user, is_primary=True,
+                                                  valid_until=today)
+        DepartmentManager.objects.create(department=top_level_department, user=user, valid_from=today + timedelta(1))
+        branch_leader = BranchManager.objects.create(branch=company, user=user, is_primary=True)
+
+    assert [m.id for m in effective_department_managers(department.id)] == [leader.id, deputy.id]
+    assert effective_branch_managers(company.id)[0].user_id == branch_leader.user_id
+    assert effective_managers_of_departments([department.id, top_level_department.id]) == {
+        department.id: effective_department_managers(department.id),
+        top_level_department.id: [],
+    }
+    # the next day leader's link has ended and the top level one has started
+    tomorrow = effective_managers_of_departments([department.id, top_level_department.id], today + timedelta(1))
+    assert [m.id for m in tomorrow[department.id]] == [deputy.id]
+    assert [m.user_id for m in tomorrow[top_level_department.id]] == [user.id]
+
+
+def test_effective_managers_are_cached_and_invalidated(department, user, user2, django_assert_num_queries,
+                                                       django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        manager = DepartmentManager.objects.create(department=department, user=user)
+    effective_department_managers(department.id)
+
+    with django_assert_num_queries(0):
+        assert [m.user_id for m in effective_department_managers(department.id)] == [user.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        manager.is_active = False
+        manager.save()
+    assert effective_department_managers(department.id) == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        DepartmentManager.objects.create(department=department, user=user2)
+    assert [m.user_id for m in effective_department_managers(department.id)] == [user2.id]
+
+
+def test_effective_managers_reload_after_a_lost_version_stamp(department, user, user2,
+                                                              django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        manager = DepartmentManager.objects.create(department=department, user=user)
+    managers = effective_department_managers(department.id)
+    # callers get their own lists
+    managers.clear()
+    assert [m.user_id for m in effective_department_managers(department.id)] == [user.id]
+
+    # the edit's version bump is lost together with the stamp, as after a Redis flush
+    DepartmentManager.objects.filter(id=manager.id).update(user=user2)
+    cache.delete(EFFECTIVE_MANAGERS_VERSION_KEY)
+
+    assert [m.user_id for m in effective_department_managers(department.id)] == [user2.id]
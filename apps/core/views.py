@@ -11,6 +11,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from apps.company.models import Department, Company
+from apps.core.effective_managers import invalidate_effective_managers
 from apps.core.filters import DepartmentManagerFilter
 from apps.core.models import (
     PageRanking,
@@ -27,7 +28,7 @@ from apps.core.serializers import (
     MoveToSerializer,
     ManagersSyncSerializer,
 )
-from apps.core.services import _normalize, _swap_with_neighbor, _move_to
+from apps.core.services import SORT_ORDER_GAP, _normalize, _swap_with_neighbor, _move_to
 from apps.docflow.serializers.docflow import SimpleResponseSerializer
 from utils.constants import CONSTANTS
 from utils.db_connection import django_connection, oracle_connection
@@ -339,7 +340,7 @@ class BranchManagerViewSet(viewsets.ModelViewSet):
         # 2) ensure leader & deputies exist and are updated
         leader_uid = user_ids[0] if user_ids else None
         deputies_uids = user_ids[1:] if user_ids else []
-        deputy_order = {uid: idx for idx, uid in enumerate(deputies_uids)}  # 0..n-1
+        deputy_order = {uid: (idx + 1) * SORT_ORDER_GAP for idx, uid in enumerate(deputies_uids)}
 
         changed = []
         created = 0
@@ -388,8 +389,10 @@ class BranchManagerViewSet(viewsets.ModelViewSet):
         else:
             # no leaders submitted: ensure no row is primary
             scope.update(is_primary=False)
+        # bulk writes above skip model signals
+        invalidate_effective_managers()
 
-        # 4) normalize deputy ordering (0..n-1)
+        # 4) normalize deputy ordering (GAP, 2*GAP, ...)
         _normalize(self._scope_qs(branch_id, is_primary=False))
 
         return Response(
@@ -502,13 +505,14 @@ class BranchManagerViewSet(viewsets.ModelViewSet):
         if set(ids) - scope_ids:
             return Response({"message": "ids contain items outside this branch scope"}, status=400)
 
-        order_map = {pk: i for i, pk in enumerate(ids)}  # top=0
+        order_map = {pk: (i + 1) * SORT_ORDER_GAP for i, pk in enumerate(ids)}  # top first
         objects = list(scope)
         for o in objects:
             new_so = order_map.get(o.id)
             if new_so is not None and o.sort_order != new_so:
                 o.sort_order = new_so
         BranchManager.objects.bulk_update(objects, ["sort_order"])
+        invalidate_effective_managers()
         return Response({"message": "reordered", "count": len(objects)})
 
     # Optional: ensure one primary per branch
@@ -521,6 +525,7 @@ class BranchManagerViewSet(viewsets.ModelViewSet):
         obj = self.get_object()
         scope = self._scope_qs(obj).select_for_update()
         scope.exclude(pk=obj.pk).update(is_primary=False)
+        invalidate_effective_managers()
         if not obj.is_primary:
             obj.is_primary = True
             obj.save(update_fields=["is_primary"])
@@ -693,7 +698,7 @@ class DepartmentManagerViewSet(viewsets.ModelViewSet):
         # desired shape
         leader_uid = user_ids[0] if user_ids else None
         deputies_uids = user_ids[1:] if user_ids else []
-        deputy_order = {uid: idx for idx, uid in enumerate(deputies_uids)}
+        deputy_order = {uid: (idx + 1) * SORT_ORDER_GAP for idx, uid in enumerate(deputies_uids)}
 
         changed = []
         created = 0
@@ -737,6 +742,8 @@ class DepartmentManagerViewSet(viewsets.ModelViewSet):
             scope.exclude(user_id=leader_uid).update(is_primary=False)
         else:
             scope.update(is_primary=False)
+        # bulk writes above skip model signals
+        invalidate_effective_managers()
 
         # normalize deputies
         _normalize(self._scope_qs(dept_id, is_primary=False))
@@ -847,13 +854,14 @@ class DepartmentManagerViewSet(viewsets.ModelViewSet):
         if set(ids) - scope_ids:
             return Response({"message": "ids contain items outside this department scope"}, status=400)
 
-        order_map = {pk: i for i, pk in enumerate(ids)}  # top=0
+        order_map = {pk: (i + 1) * SORT_ORDER_GAP for i, pk in enumerate(ids)}  # top first
         objects = list(scope)
         for o in objects:
             new_so = order_map.get(o.id)
             if new_so is not None and o.sort_order != new_so:
                 o.sort_order = new_so
         DepartmentManager.objects.bulk_update(objects, ["sort_order"])
+        invalidate_effective_managers()
         return Response({"message": "reordered", "count": len(objects)})
 
     @transaction.atomic
@@ -865,6 +873,7 @@ class DepartmentManagerViewSet(viewsets.ModelViewSet):
         obj = self.get_object()
         scope = self._scope_qs(obj).select_for_update()
         scope.exclude(pk=obj.pk).update(is_primary=False)
+        invalidate_effective_managers()
         if not obj.is_primary:
             obj.is_primary = True
             obj.save(update_fields=["is_primary"])
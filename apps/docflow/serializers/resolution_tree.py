@@ -110,3 +110,25 @@ class ResolutionTreeSerializer(serializers.ModelSerializer):
     class Meta:
         model = BaseDocument
         fields = ['id', 'reviewers']
+
+
+class ResolutionTreeNodeSerializer(ResolutionTreeListSerializer):
+    """
+    A single assignment of the tree without its nested assignees and children,
+    used by `apps.docflow.services.resolution_tree` to assemble the tree in memory.
+    """
+    assignees = None
+    children = None
+
+    class Meta(ResolutionTreeListSerializer.Meta):
+        fields = [f for f in ResolutionTreeListSerializer.Meta.fields if f not in ('assignees', 'children')]
+
+
+class ReviewerTreeNodeSerializer(ReviewerTreeSerializer):
+    """
+    A reviewer of the tree without its assignments.
+    """
+    assignments = None
+
+    class Meta(ReviewerTreeSerializer.Meta):
+        fields = [f for f in ReviewerTreeSerializer.Meta.fields if f != 'assignments']
@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.docflow.models import Reviewer, Assignment, Assignee
+from apps.docflow.serializers.resolution_tree import (
+    ResolutionTreeListSerializer,
+    ResolutionTreeNodeSerializer,
+    ResolutionTreePerformerSerializer,
+    ReviewerTreeNodeSerializer,
+    ReviewerTreeSerializer,
+)
+from apps.reference.models import StatusModel
+from apps.user.models import User
+
+RESOLUTION_TREE_CACHE_KEY = 'docflow:resolution_tree:v1:{}'
+RESOLUTION_TREE_TIMEOUT = 60 * 60
+
+
+def _prime_select_cache(reviewers, assignees) -> dict:
+    """
+    Preload every user and status referenced by the tree into the cache used by
+    `SelectItemField`, so serializing the nodes does not query them one by one.
+    """
+    user_ids = {r.user_id for r in reviewers} | {a.user_id for a in assignees}
+    status_ids = {r.status_id for r in reviewers} | {a.status_id for a in assignees}
+    user_ids.discard(None)
+    status_ids.discard(None)
+
+    select_cache = {}
+    for user in User.objects.select_related().filter(id__in=user_ids):
+        select_cache[f'User:{user.pk}'] = user
+    for status in StatusModel.objects.select_related().filter(id__in=status_ids):
+        select_cache[f'StatusModel:{status.pk}'] = status
+    return select_cache
+
+
+def build_resolution_tree(document_id: int) -> dict:
+    """
+    Builds the same payload as `ResolutionTreeSerializer` for a document.
+    Reviewers, assignments and assignees are loaded with one flat query each
+    and the tree is assembled in memory instead of querying every level.
+    """
+    reviewers = list(Reviewer.objects.filter(document_id=document_id)
+                     .prefetch_related('files')
+                     .order_by('id'))
+    assignments = list(Assignment.objects.filter(reviewer__document_id=document_id)
+                       .select_related('created_by')
+                       .order_by('id'))
+    assignees = list(Assignee.objects.filter(assignment__reviewer__document_id=document_id)
+                     .prefetch_related('files')
+                     .order_by('-is_responsible', 'id'))
+
+    context = {'_select_cache': _prime_select_cache(reviewers, assignees)}
+
+    assignees_by_assignment = defaultdict(list)
+    performer_data = ResolutionTreePerformerSerializer(assignees, many=True, context=context).data
+    for assignee, row in zip(assignees, performer_data):
+        assignees_by_assignment[assignee.assignment_id].append(dict(row))
+
+    assignment_fields = ResolutionTreeListSerializer.Meta.fields
+    children_by_parent = defaultdict(list)
+    roots_by_reviewer = defaultdict(list)
+    assignment_data = ResolutionTreeNodeSerializer(assignments, many=True, context=context).data
+    for assignment, row in zip(assignments, assignment_data):
+        row = dict(row, assignees=assignees_by_assignment[assignment.id], children=children_by_parent[assignment.id])
+        node = {field: row[field] for field in assignment_fields}
+        if assignment.parent_id:
+            children_by_parent[assignment.parent_id].append(node)
+        else:
+            roots_by_reviewer[assignment.reviewer_id].append(node)
+
+    reviewer_fields = ReviewerTreeSerializer.Meta.fields
+    reviewer_nodes = []
+    reviewer_data = ReviewerTreeNodeSerializer(reviewers, many=True, context=context).data
+    for reviewer, row in zip(reviewers, reviewer_data):
+        row = dict(row, assignments=roots_by_reviewer[reviewer.id])
+        reviewer_nodes.append({field: row[field] for field in reviewer_fields})
+
+    return {'id': document_id, 'reviewers': reviewer_nodes}
+
+
+def get_resolution_tree(document_id: int) -> dict:
+    key = RESOLUTION_TREE_CACHE_KEY.format(document_id)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_resolution_tree(document_id)
+        cache.set(key, tree, RESOLUTION_TREE_TIMEOUT)
+    return tree
+
+
+def invalidate_resolution_tree(*document_ids) -> None:
+    """
+    Drops the cached tree of the given documents once the current transaction commits.
+    """
+    keys = [RESOLUTION_TREE_CACHE_KEY.format(i) for i in set(document_ids) if i]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from apps.docflow.models import Reviewer, Assignee
+from apps.docflow.models import Reviewer, Assignment, Assignee
 from apps.docflow.services.fan_out import sync_fanout_to_review, sync_fanout_to_assignee
+from apps.docflow.services.resolution_tree import invalidate_resolution_tree
 
 
 @receiver([post_save, post_delete], sender=Reviewer)
@@ -13,3 +14,33 @@ def _sync_inbox_on_reviewer_change(sender, instance, **kwargs):
 @receiver([post_save, post_delete], sender=Assignee)
 def _sync_inbox_on_assignee_change(sender, instance, **kwargs):
     sync_fanout_to_assignee(instance)
+
+
+@receiver([post_save, post_delete], sender=Reviewer)
+def _invalidate_tree_on_reviewer_change(sender, instance, **kwargs):
+    invalidate_resolution_tree(instance.document_id)
+
+
+@receiver([post_save, post_delete], sender=Assignment)
+def _invalidate_tree_on_assignment_change(sender, instance, **kwargs):
+    document_id = Reviewer.objects.filter(id=instance.reviewer_id).values_list('document_id', flat=True).first()
+    invalidate_resolution_tree(document_id)
+
+
+@receiver([post_save, post_delete], sender=Assignee)
+def _invalidate_tree_on_assignee_change(sender, instance, **kwargs):
+    document_id = (Assignment.objects.filter(id=instance.assignment_id)
+                   .values_list('reviewer__document_id', flat=True).first())
+    invalidate_resolution_tree(document_id)
+
+
+@receiver(m2m_changed, sender=Reviewer.files.through)
+def _invalidate_tree_on_reviewer_files_change(sender, instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Reviewer):
+        invalidate_resolution_tree(instance.document_id)
+
+
+@receiver(m2m_changed, sender=Assignee.files.through)
+def _invalidate_tree_on_assignee_files_change(sender, instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Assignee):
+        _invalidate_tree_on_assignee_change(sender, instance)
@@ -0,0 +1,43 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.docflow.models import Assignment, Assignee
+from apps.docflow.serializers import ResolutionTreeSerializer
+from apps.docflow.services.resolution_tree import build_resolution_tree
+
+
+def _grow(reviewer, users, depth):
+    level = [Assignment.objects.create(reviewer=reviewer, content='root')]
+    for _ in range(depth):
+        for assignment in level:
+            for user in users:
+                Assignee.objects.create(assignment=assignment, user=user, is_responsible=user == users[0])
+        level = [Assignment.objects.create(reviewer=reviewer, parent=a, content='child')
+                 for a in level for _ in range(2)]
+
+
+def _count_queries(document_id):
+    with CaptureQueriesContext(connection) as ctx:
+        build_resolution_tree(document_id)
+    return len(ctx.captured_queries)
+
+
+def test_flat_tree_matches_serializer(base_document, reviewer, user, user2):
+    _grow(reviewer, [user, user2], depth=3)
+
+    expected = ResolutionTreeSerializer(base_document).data
+    tree = build_resolution_tree(base_document.id)
+
+    assert json.loads(json.dumps(tree, default=str)) == json.loads(json.dumps(expected, default=str))
+
+
+def test_flat_tree_query_count_is_constant(base_document, reviewer, user, user2):
+    _grow(reviewer, [user], depth=1)
+    shallow = _count_queries(base_document.id)
+
+    _grow(reviewer, [user, user2], depth=4)
+    deep = _count_queries(base_document.id)
+
+    assert shallow == deep
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from apps.docflow.models import Assignment
+
+URL = '/api/v1/resolution/321/verify-or-cancel/'
+
+
+def _verify(api_client, token, ids, is_verified=True):
+    headers = {'Authorization': f'Bearer {token}'}
+    data = {'assignment_ids': ids, 'is_verified': is_verified}
+    with CaptureQueriesContext(connection) as ctx:
+        response = api_client.put(URL, data, headers=headers, format='json')
+    return response, len(ctx.captured_queries)
+
+
+@mock.patch('apps.docflow.views.assignments.bulk_action_log.apply_async')
+def test_verify_is_batched(apply_async, api_client, reviewer, user1_token, error_messages,
+                           django_capture_on_commit_callbacks):
+    small = [Assignment.objects.create(reviewer=reviewer).id for _ in range(2)]
+    large = [Assignment.objects.create(reviewer=reviewer).id for _ in range(20)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response, small_queries = _verify(api_client, user1_token, small)
+    assert response.status_code == status.HTTP_200_OK
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response, large_queries = _verify(api_client, user1_token, large)
+    assert response.status_code == status.HTTP_200_OK
+
+    assert small_queries == large_queries
+    assert apply_async.call_count == 2
+    assert len(apply_async.call_args.args[0][4]) == len(large)
+    assert Assignment.objects.filter(id__in=small + large, is_verified=True).count() == len(small + large)
+
+
+@mock.patch('apps.docflow.views.assignments.bulk_action_log.apply_async')
+def test_verify_rejects_foreign_assignments(apply_async, api_client, reviewer, user2_token, error_messages):
+    ids = [Assignment.objects.create(reviewer=reviewer).id for _ in range(3)]
+
+    response, _ = _verify(api_client, user2_token, ids)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not Assignment.objects.filter(id__in=ids, is_verified=True).exists()
+    apply_async.assert_not_called()
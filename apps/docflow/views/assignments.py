@@ -1,13 +1,15 @@
 from typing import Dict, Tuple
 
-from django.db.models import Q
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from apps.docflow.filters import AssigneeFilters, AssignmentFilters
-from apps.docflow.models import Reviewer, Assignment, Assignee
+from apps.docflow.models import Reviewer, Assignment, Assignee, BaseDocument
 from apps.docflow.serializers import (
     AssignmentSerializer,
     MyAssignmentSerializer,
@@ -17,8 +19,9 @@ from apps.docflow.serializers import (
     PerformerSerializer,
     VerifyOrRejectResolutionSerializer,
 )
+from apps.docflow.services.resolution_tree import invalidate_resolution_tree
 from apps.reference.models import StatusModel
-from apps.reference.tasks import action_log
+from apps.reference.tasks import action_log, bulk_action_log
 from config.middlewares.current_user import get_current_user_id
 from utils.constant_ids import (
     get_completed_base_doc_status_id,
@@ -37,6 +40,13 @@ class ResolutionViewSet(viewsets.GenericViewSet,
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
 
+    # Map incoming UI action -> (description_code, event_action stored in ActionModel.action)
+    ACTION_MAP: Dict[str, Tuple[str, str]] = {
+        "cancel_assignment": ("134", "updated"),
+        "verify_assignment": ("138", "updated"),
+        "delete_assignment": ("133", "deleted"),
+    }
+
     @action(methods=['GET'], detail=True, serializer_class=PerformerSerializer)
     def performers(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -53,13 +63,7 @@ class ResolutionViewSet(viewsets.GenericViewSet,
         document_instance = instance.reviewer.document
         ct_id = get_content_type_id(document_instance)
 
-        # Map incoming UI action -> (description_code, event_action stored in ActionModel.action)
-        ACTION_MAP: Dict[str, Tuple[str, str]] = {
-            "cancel_assignment": ("134", "updated"),
-            "verify_assignment": ("138", "updated"),
-            "delete_assignment": ("133", "deleted"),
-        }
-        mapped = ACTION_MAP.get(action)
+        mapped = self.ACTION_MAP.get(action)
 
         # If action not found, fail silently
         if not mapped:
@@ -71,6 +75,27 @@ class ResolutionViewSet(viewsets.GenericViewSet,
             (user_id, action_type, description_code,
              ct_id, document_instance.id, user_ip, comment), countdown=2)
 
+    def record_activities(self, document_ids: list, action: str, comment=None) -> None:
+        """
+        Batched `record_activity`: one activity log row per document id,
+        written by a single `bulk_action_log` task.
+        """
+        mapped = self.ACTION_MAP.get(action)
+        if not mapped or not document_ids:
+            return
+
+        description_code, action_type = mapped
+        user_id = get_current_user_id()
+        user_ip = get_user_ip(self.request)
+        ct_id = get_content_type_id(BaseDocument)
+
+        def _send():
+            bulk_action_log.apply_async(
+                (user_id, action_type, description_code,
+                 ct_id, document_ids, user_ip, comment), countdown=2)
+
+        transaction.on_commit(_send)
+
     @action(methods=['PUT'], detail=False, url_path='verify-or-cancel',
             serializer_class=VerifyOrRejectResolutionSerializer)
     def verify(self, request, *args, **kwargs):
@@ -92,21 +117,23 @@ class ResolutionViewSet(viewsets.GenericViewSet,
 
         assignment = Assignment.objects.filter(id__in=assignment_ids)
 
-        for instance in assignment:
-            review = instance.reviewer
-            if review.user_id != current_user_id:
-                message = get_response_message(request, 700)
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        # one aggregate query: ownership check + documents for the activity log
+        summary = assignment.aggregate(
+            not_owned=Count('id', filter=~Q(reviewer__user_id=current_user_id)),
+            document_ids=ArrayAgg('reviewer__document_id'),
+        )
+        if summary['not_owned']:
+            message = get_response_message(request, 700)
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
+        invalidate_resolution_tree(*(summary['document_ids'] or []))
         if is_verified:
             assignment.update(is_verified=True, receipt_date=timezone.now())
-            for assignment_instance in assignment:
-                self.record_activity(assignment_instance, 'verify_assignment', comment)
+            self.record_activities(summary['document_ids'] or [], 'verify_assignment', comment)
             return Response({'is_verified': True}, status=status.HTTP_200_OK)
         else:
             assignment.update(is_verified=False)
-            for assignment_instance in assignment:
-                self.record_activity(assignment_instance, 'cancel_assignment', comment)
+            self.record_activities(summary['document_ids'] or [], 'cancel_assignment', comment)
             message = get_response_message(request, 802)
             return Response(message, status=status.HTTP_200_OK)
 
@@ -308,6 +335,7 @@ class MyAssignmentViewSet(viewsets.GenericViewSet,
         else:
             # If the assignment does not have a parent, update the status of the reviewer
             self.update_parent_status(Reviewer, instance.assignment.reviewer.id, on_hold_id)
+        invalidate_resolution_tree(object_id)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from apps.docflow.filters import DocFlowFilters
 from apps.docflow.models import BaseDocument
 from apps.docflow.serializers import BaseDocFlowSerializer, ResolutionTreeSerializer
+from apps.docflow.services.resolution_tree import get_resolution_tree
 from utils.exception import get_response_message
 from utils.utils import build_documents_zip
 
@@ -48,5 +49,4 @@ class DocFlowViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=True, url_path='resolution-tree', serializer_class=ResolutionTreeSerializer)
     def resolution_tree(self, request, *args, **kwargs):
         document = self.get_object()
-        serializer = ResolutionTreeSerializer(document)
-        return Response(serializer.data)
+        return Response(get_resolution_tree(document.id))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0040_payrollperiod_final_approved_at_and_more'),
+    ]
+
+    operations = [
+        # keep only the newest default of employees that have several before enforcing one
+        migrations.RunSQL(
+            """
+            UPDATE hr_employeeschedule SET is_default = false
+            WHERE is_default AND id NOT IN (
+                SELECT MAX(id) FROM hr_employeeschedule WHERE is_default GROUP BY employee_id
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='employeeschedule',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('employee',), name='uniq_employee_default_schedule'),
+        ),
+    ]
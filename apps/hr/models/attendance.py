@@ -198,6 +198,12 @@ class EmployeeSchedule(BaseModel):
                 name="uniq_employee_schedule_pair",
                 fields=["employee", "schedule"],
             ),
+            # At most one default schedule per employee
+            UniqueConstraint(
+                name="uniq_employee_default_schedule",
+                fields=["employee"],
+                condition=Q(is_default=True),
+            ),
         ]
 
 
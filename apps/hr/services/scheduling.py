@@ -1,12 +1,45 @@
 from dataclasses import dataclass
 from typing import Iterable, List, Optional
 
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
 
 from apps.hr.models import EmployeeSchedule, WorkSchedule
 from apps.user.models import User
 
-BULK_CHUNK = 500
+# attempts when a concurrent assignment gave one of the employees another default in between
+BULK_ASSIGN_ATTEMPTS = 2
+
+_TABLE = EmployeeSchedule._meta.db_table
+
+# 1) clear the defaults the employees have on other schedules
+_CLEAR_DEFAULTS_SQL = f"""
+    UPDATE {_TABLE}
+    SET is_default = false, modified_date = now()
+    WHERE employee_id = ANY(%(employee_ids)s) AND is_default AND schedule_id <> %(schedule_id)s
+    RETURNING employee_id
+"""
+
+# 2) make the (employee, schedule) row the default, creating it if missing;
+#    rows that already were the default are left alone and not returned.
+#    xmax = 0 marks a freshly inserted row.
+_UPSERT_DEFAULTS_SQL = f"""
+    INSERT INTO {_TABLE} AS es (created_date, modified_date, created_by_id, modified_by_id, is_active,
+                                employee_id, schedule_id, notes, is_default)
+    SELECT now(), now(), NULL, %(assigned_by_id)s::bigint, true, employee_id, %(schedule_id)s::bigint,
+           %(notes)s::text, true
+    FROM unnest(%(employee_ids)s::bigint[]) AS employee_id
+    ON CONFLICT (employee_id, schedule_id) DO UPDATE
+    SET is_default = true,
+        modified_date = now(),
+        modified_by_id = COALESCE(EXCLUDED.modified_by_id, es.modified_by_id),
+        notes = CASE
+            WHEN %(notes)s = '' THEN es.notes
+            WHEN COALESCE(es.notes, '') = '' THEN %(notes)s
+            ELSE es.notes || E'\\n' || %(notes)s
+        END
+    WHERE NOT es.is_default
+    RETURNING employee_id, xmax = 0 AS created
+"""
 
 
 @dataclass(frozen=True)
@@ -18,9 +51,24 @@ class BulkAssignResult:
     skipped_missing_employees: List[int]
 
 
-def _chunks(seq: List[int], size: int):
-    for i in range(0, len(seq), size):
-        yield seq[i:i + size]
+def _assign_defaults(params):
+    for attempt in range(1, BULK_ASSIGN_ATTEMPTS + 1):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(_CLEAR_DEFAULTS_SQL, params)
+                had_other_default = {row[0] for row in cursor.fetchall()}
+                cursor.execute(_UPSERT_DEFAULTS_SQL, params)
+                changed = cursor.fetchall()
+            break
+        except IntegrityError:
+            # another transaction made a default for one of the employees after our UPDATE read them
+            if attempt == BULK_ASSIGN_ATTEMPTS:
+                raise
+
+    created_rows = sum(1 for _, created in changed if created)
+    switched_from_other = sum(1 for employee_id, created in changed
+                              if not created and employee_id in had_other_default)
+    return created_rows, switched_from_other
 
 
 @transaction.atomic
@@ -35,6 +83,9 @@ def bulk_assign_default_schedule(
     For each employee:
       - Unset any existing default row
       - Set (or create) the row for schedule_id as default=True
+
+    Runs as one UPDATE and one INSERT ... ON CONFLICT for all employees; the partial unique
+    index on (employee) WHERE is_default keeps concurrent assignments from leaving two defaults.
     """
     employee_ids = list(dict.fromkeys(int(e) for e in employee_ids if e is not None))
     if not employee_ids:
@@ -48,76 +99,19 @@ def bulk_assign_default_schedule(
     missing_emps = [e for e in employee_ids if e not in existing_emps]
     target_emps = [e for e in employee_ids if e in existing_emps]
 
-    updated_default = 0
-    created_rows = 0
-    switched_from_other = 0
-
-    for chunk in _chunks(target_emps, BULK_CHUNK):
-        # Lock this employee's rows to avoid races
-        emp_rows = (
-            EmployeeSchedule.objects
-            .select_for_update()
-            .filter(employee_id__in=chunk)
-        )
-
-        # Map: employee -> list of rows
-        rows_by_emp = {}
-        for row in emp_rows.only("id", "employee_id", "schedule_id", "is_default", "notes"):
-            rows_by_emp.setdefault(row.employee_id, []).append(row)
-
-        # We will collect updates and creates
-        to_update = []
-        to_create = []
-
-        for eid in chunk:
-            rows = rows_by_emp.get(eid, [])
-            had_any_default = any(r.is_default for r in rows)
-
-            # Unset any default rows
-            for r in rows:
-                if r.is_default:
-                    r.is_default = False
-                    to_update.append(r)
-
-            # Find or create the row for this schedule
-            target_row = next((r for r in rows if r.schedule_id == schedule_id), None)
-            if target_row:
-                if not target_row.is_default:
-                    target_row.is_default = True
-                    # Merge notes if provided
-                    if notes:
-                        target_row.notes = (target_row.notes + "\n" if target_row.notes else "") + notes
-                    if assigned_by_id is not None:
-                        target_row.modified_by_id = assigned_by_id
-                    to_update.append(target_row)
-                    switched_from_other += 1 if had_any_default else 0
-                    updated_default += 1
-                else:
-                    # already default on this schedule (rare, due to earlier unset)
-                    updated_default += 1
-            else:
-                to_create.append(
-                    EmployeeSchedule(
-                        employee_id=eid,
-                        schedule_id=schedule_id,
-                        is_default=True,
-                        modified_by_id=assigned_by_id,
-                        notes=notes or "",
-                    )
-                )
-                created_rows += 1
-                updated_default += 1
-
-        if to_update:
-            EmployeeSchedule.objects.bulk_update(
-                to_update, ["is_default", "modified_by", "notes", "modified_date"]
-            )
-        if to_create:
-            EmployeeSchedule.objects.bulk_create(to_create, batch_size=BULK_CHUNK)
+    params = {
+        "schedule_id": schedule_id,
+        "employee_ids": target_emps,
+        "assigned_by_id": assigned_by_id,
+        "notes": notes or "",
+    }
+    created_rows = switched_from_other = 0
+    if target_emps:
+        created_rows, switched_from_other = _assign_defaults(params)
 
     return BulkAssignResult(
         schedule_id=schedule_id,
-        updated_default_count=updated_default,
+        updated_default_count=len(target_emps),
         created_rows=created_rows,
         switched_from_other=switched_from_other,
         skipped_missing_employees=missing_emps,
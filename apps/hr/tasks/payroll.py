@@ -9,39 +9,29 @@ from apps.core.models import SQLQuery
 from apps.core.services import effective_branch_managers, effective_department_managers
 from apps.hr.models import Payroll, PayrollSubCategory, AttendanceExceptionApproval, AttendanceException
 from apps.hr.services.payroll_generator import upsert_cells_for_date
+from apps.user.services import OrgResolver
 from utils.db_connection import oracle_connection, db_column_name
 
 subcat_cache = {}
 
 
-def get_dept_ids(code, company=None):
-    try:
-        # Prefetch parent and parent's parent in a single query
-        department = (Department.objects
-                      .select_related('parent', 'parent__parent')
-                      .get(code=code, company_id=company.id))
-
-        sub_sub_dept_id = department.id
-        sub_dept_id = department.parent.id if department.parent else None
-        top_level_dept_id = department.parent.parent.id if department.parent and department.parent.parent else (
-                sub_dept_id or sub_sub_dept_id
-        )
-
-        return top_level_dept_id, sub_dept_id, sub_sub_dept_id
-
-    except Department.MultipleObjectsReturned:
-        print("[WARN] Multiple departments found for code:", code)
+def get_dept_ids(code, company, resolver):
+    """(top_level, sub, sub_sub) department ids of a payroll row, resolved from memory."""
+    if company is None:
         return None, None, None
+    try:
+        top_level_dept_id, sub_dept_id, sub_sub_dept_id = resolver.dept_ids(code, company.id)
+        if sub_sub_dept_id is not None:
+            return top_level_dept_id, sub_dept_id, sub_sub_dept_id
 
-    except Department.DoesNotExist:
         print(f"[WARN] Department not found for code: {code}")
-        try:
-            print(f"[INFO] Attempting to find top level department for company: {company.name}")
-            top_level = Department.objects.get(code=company.local_code, company_id=company.id)
-            return top_level.id, None, None
-        except Department.DoesNotExist:
-            print(f"[WARN] Top level department not found for local_code: {company.local_code}")
-            return None, None, None
+        top_level_dept_id = resolver.department_id(company.local_code, company.id)
+    except Department.MultipleObjectsReturned as e:
+        print(f"[WARN] {e}")
+        return None, None, None
+    if top_level_dept_id is None:
+        print(f"[WARN] Top level department not found for local_code: {company.local_code}")
+    return top_level_dept_id, None, None
 
 
 def get_company_id(local_code):
@@ -129,10 +119,11 @@ def fetch_payroll_data():
     count = 0
     skipped = 0
     payroll_data = []
+    resolver = OrgResolver()
 
     for row in rows:
         company = get_company_id(row[field_map['LOCAL_CODE']])
-        top_level_dept_id, sub_dept_id, sub_sub_dept_id = get_dept_ids(row[field_map['DEP']], company)
+        top_level_dept_id, sub_dept_id, sub_sub_dept_id = get_dept_ids(row[field_map['DEP']], company, resolver)
         pay_type_id = get_payroll_sub_category_id(row[field_map['PAY_TYPE']])
 
         if not all([company.id, pay_type_id]):
@@ -172,9 +163,10 @@ def create_attendance_exc_approval(exception_id: int, org_id: int, org_typ: str)
     """
 
     if org_typ == 'branch':
-        manager = effective_branch_managers(branch_id=org_id).first()
+        managers = effective_branch_managers(branch_id=org_id)
     else:
-        manager = effective_department_managers(department_id=org_id).first()
+        managers = effective_department_managers(department_id=org_id)
+    manager = managers[0] if managers else None
 
     if not manager or not manager.user_id:
         # Fallback: optionally route to HR queue head, or skip creating an approval
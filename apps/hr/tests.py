@@ -1,3 +1,47 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+import pytest
+from django.db import IntegrityError, transaction
+
+from apps.hr.models import EmployeeSchedule, WorkSchedule
+from apps.hr.services.scheduling import bulk_assign_default_schedule
+
+
+def _schedule(name):
+    return WorkSchedule.objects.create(name=name, start_time=datetime.time(9), end_time=datetime.time(18))
+
+
+def test_bulk_assign_default_schedule_counts(user, user2, admin_user):
+    day, night = _schedule('Day'), _schedule('Night')
+    # user: default elsewhere and a row on night; user2: default elsewhere only; admin: already on night
+    EmployeeSchedule.objects.create(employee=user, schedule=day, is_default=True)
+    EmployeeSchedule.objects.create(employee=user, schedule=night, notes='old')
+    EmployeeSchedule.objects.create(employee=user2, schedule=day, is_default=True)
+    EmployeeSchedule.objects.create(employee=admin_user, schedule=night, is_default=True)
+
+    result = bulk_assign_default_schedule(schedule_id=night.id, employee_ids=[user.id, user2.id, admin_user.id, 0],
+                                          assigned_by_id=admin_user.id, notes='shift change')
+
+    assert result.updated_default_count == 3
+    assert result.created_rows == 1
+    assert result.switched_from_other == 1
+    assert result.skipped_missing_employees == [0]
+    assert dict(EmployeeSchedule.objects.filter(is_default=True).values_list('employee_id', 'schedule_id')) == {
+        user.id: night.id, user2.id: night.id, admin_user.id: night.id,
+    }
+    switched = EmployeeSchedule.objects.get(employee=user, schedule=night)
+    assert switched.notes == 'old\nshift change'
+    assert switched.modified_by_id == admin_user.id
+
+
+def test_bulk_assign_unknown_schedule():
+    with pytest.raises(ValueError):
+        bulk_assign_default_schedule(schedule_id=0, employee_ids=[1])
+
+
+def test_employee_has_a_single_default_schedule(user):
+    day, night = _schedule('Day'), _schedule('Night')
+    EmployeeSchedule.objects.create(employee=user, schedule=day, is_default=True)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        EmployeeSchedule.objects.create(employee=user, schedule=night, is_default=True)
@@ -299,24 +299,23 @@ class EmployeeScheduleViewSet(viewsets.ModelViewSet):
     filterset_class = EmployeeScheduleFilter
     search_fields = ["employee__first_name", "employee__last_name", "employee__table_number", "schedule__name"]
 
-    def perform_create(self, serializer):
-        obj = serializer.save()
-        if obj.is_default:
-            # THIS is where your set_default must be used
-            EmployeeSchedule.objects.set_default(
+    def _save_with_default(self, serializer):
+        # Only one default per employee is allowed, so the row becomes the default
+        # through set_default, after the employee's current default is unset
+        is_default = serializer.validated_data.get("is_default", False)
+        obj = serializer.save(is_default=False) if is_default else serializer.save()
+        if is_default:
+            serializer.instance = EmployeeSchedule.objects.set_default(
                 employee_id=obj.employee_id,
                 schedule_id=obj.schedule_id,
                 notes=obj.notes or "",
             )
 
+    def perform_create(self, serializer):
+        self._save_with_default(serializer)
+
     def perform_update(self, serializer):
-        obj = serializer.save()
-        if obj.is_default:
-            EmployeeSchedule.objects.set_default(
-                employee_id=obj.employee_id,
-                schedule_id=obj.schedule_id,
-                notes=obj.notes or "",
-            )
+        self._save_with_default(serializer)
 
     @action(detail=False,
             methods=['post'],
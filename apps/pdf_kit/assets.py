@@ -0,0 +1,79 @@
+import base64
+import os
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from django.db import transaction
+from django.template.loader import get_template
+
+from apps.company.models import EnvModel
+from utils.cache_version import bump_version, get_version
+
+# distinct QR payloads kept per process; a document is rendered a few times while it is signed
+PDF_QR_CACHE_SIZE = int(os.getenv('PDF_QR_CACHE_SIZE', 1024))
+ENV_ASSETS_VERSION_KEY = 'pdf_env_assets_version'
+
+EnvAssets = namedtuple('EnvAssets', ('name_uz', 'name_ru', 'company_logo', 'logo_size'))
+
+_env_assets = {}
+_env_assets_lock = threading.Lock()
+
+
+@lru_cache(maxsize=PDF_QR_CACHE_SIZE)
+def qrcode_base64(payload: str) -> str:
+    """
+    Returns the QR code of `payload` as a base64-encoded PNG.
+    """
+    qr = qrcode.QRCode(version=1,
+                       error_correction=qrcode.constants.ERROR_CORRECT_M,
+                       box_size=10,
+                       border=4)
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    stream = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(stream, "PNG")
+    return base64.b64encode(stream.getvalue()).decode('utf-8')
+
+
+def verification_qrcode_base64(check_id) -> str:
+    return qrcode_base64(f"{os.getenv('DOC_VERIFICATION_URL')}home?check={check_id}")
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(template_name: str):
+    """
+    Resolves and compiles a template once per process.
+    """
+    return get_template(template_name)
+
+
+def get_env_assets(code) -> EnvAssets:
+    """
+    Returns the company names and logo of an environment from a process-level cache.
+    Entries are tagged with the shared version stamp, so saving any `EnvModel`
+    makes every process reload them on its next render.
+    """
+    # the version is read before the row, so a concurrent save can only leave an entry already stale
+    version = get_version(ENV_ASSETS_VERSION_KEY)
+    entry = _env_assets.get(code)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    env = EnvModel.objects.only(*EnvAssets._fields).get(code=code)
+    assets = EnvAssets(env.name_uz, env.name_ru, env.company_logo, env.logo_size)
+    with _env_assets_lock:
+        _env_assets[code] = (version, assets)
+    return assets
+
+
+def invalidate_env_assets() -> None:
+    """
+    Makes the cached environment assets of all processes stale once the current transaction commits.
+    """
+    with _env_assets_lock:
+        _env_assets.clear()
+    transaction.on_commit(lambda: bump_version(ENV_ASSETS_VERSION_KEY))
@@ -1,170 +1,95 @@
-import base64
+import hashlib
 import os
-from io import BytesIO
 
-import pdfkit
-import qrcode
+from django.core.cache import cache
 from django.core.files.base import ContentFile
-from django.template.loader import get_template
 from django.utils import timezone
 
-from apps.company.models import EnvModel
 from apps.document.helpers import upload_file
 from apps.document.models import File
+from apps.pdf_kit.assets import get_compiled_template, get_env_assets, verification_qrcode_base64
+from apps.pdf_kit.renderer import WKHTMLTOPDF_OPTIONS, render_html_to_pdf
 from utils.constants import CONSTANTS
 
+# a rendered PDF waits in the cache until it is uploaded; after that it has to be rendered again
+PENDING_PDF_KEY = 'pending_pdf:{}'
+PENDING_PDF_TIMEOUT = int(os.getenv('PENDING_PDF_TIMEOUT', 7 * 24 * 60 * 60))
 
-class BasePDFConfig:
-    def generate_qrcode_base64(self, check_id):
-        VERIFY_URL = os.getenv('DOC_VERIFICATION_URL')
-        input_string = f"{VERIFY_URL}home?check={check_id}"
-        # Create a QR code instance
-        qr = qrcode.QRCode(version=1,
-                           error_correction=qrcode.constants.ERROR_CORRECT_M,
-                           box_size=10,
-                           border=4)
-
-        # Add the input string to the QR code
-        qr.add_data(input_string)
-        qr.make(fit=True)
-
-        # Create an image from the QR code
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-
-        # Create an in-memory stream
-        stream = BytesIO()
 
-        # Save the image to the stream in PNG format
-        qr_image.save(stream, "PNG")
-
-        # Rewind the stream to the beginning
-        stream.seek(0)
-
-        # Read the stream content as bytes
-        image_bytes = stream.read()
-
-        # Encode the image bytes as base64
-        encoded_string = base64.b64encode(image_bytes).decode('utf-8')
+class BasePDFConfig:
+    SIGNERS_TEMPLATE = 'components/signers.html'
+    RECEIVERS_TEMPLATE = 'components/receivers.html'
+    NEW_RECEIVERS_TEMPLATE = 'components/new_receivers.html'
 
-        return encoded_string
+    def generate_qrcode_base64(self, check_id):
+        return verification_qrcode_base64(check_id)
 
     def get_logo_and_name(self, env_id):
-        env = EnvModel.objects.get(code=env_id)
-        return env.name_uz, env.name_ru, env.company_logo, env.logo_size
+        return get_env_assets(env_id)
 
     def get_signers(self, signer_data, check_id=None):
-        signer_info = ''
-
-        b64 = self.generate_qrcode_base64(check_id)
-
-        for signer in signer_data:
-            is_signed = signer.get('is_signed')
-            if is_signed is True:
-                signer_info += f"""                
-                    <table style="width: 100%; padding: 0 24px; margin-bottom: 8px; margin-top: 24px">
-                        <tr>
-                            <td style="font-size: 14px; font-weight: bolder; width: 50%;">
-                                {signer.get('position')}
-                            </td>
-                            <td style="width: 25%;">
-                                <div style="width: 70px; height: 70px;">
-                                    <img style="width: 70px; height: 70px; border: none;" src="data:image/png;base64, {b64}" alt="qr-code"/>
-                                </div>
-                            </td>
-                            <td style="font-size: 14px; font-weight: bolder; width: 25%;">
-                                {signer.get('name')}
-                            </td>
-                        </tr>
-                    </table>
-                """
-            else:
-                signer_info += f"""
-                    <table class="w-full" style="padding: 0 24px; margin-bottom: 8px;">
-                            <tr>
-                                <td class="text-14 font-semibold" style="width: 50%;">
-                                    {signer.get('position')}
-                                </td>
-                                <td style="width: 25%;">
-                                    <span></span>
-                                </td>
-                                <td class="text-14 font-semibold" style="width: 25%;">
-                                    {signer.get('name')}
-                                </td>
-                            </tr>
-                    </table>
-                """
-
-        return signer_info
+        context = {'signers': signer_data}
+        if any(signer.get('is_signed') is True for signer in signer_data):
+            context['qr_code'] = self.generate_qrcode_base64(check_id)
+        return get_compiled_template(self.SIGNERS_TEMPLATE).render(context)
 
     def get_receivers(self, receivers, type=None):
-        receivers_info = ''
-        if type == 'new_receivers':
-            for receiver in receivers:
-                receivers_info += f"""<tr>
-                    <td style="width: 60%"></td>
-                    <td style="text-align: end; font-weight: 600; padding-bottom: 4px; width: 40%" class="small-1">
-                    {receiver['correspondent_name']}
-                    </td>
-                </tr>"""
-        else:
-            for receiver in receivers:
-                receivers_info += f"""<tr>
-            <td style="width: 30%;"></td>
-            <td style="width: 70%; vertical-align: top; text-align: end">
-                <div class="text-14 font-semibold" style="margin-bottom: 4px">{receiver.get('name')}</div>
-            </td></tr>"""
-        return receivers_info
+        template_name = self.NEW_RECEIVERS_TEMPLATE if type == 'new_receivers' else self.RECEIVERS_TEMPLATE
+        return get_compiled_template(template_name).render({'receivers': receivers})
 
     def render_pdf(self, template_name: str, context: dict) -> bytes:
         """
         Render pdf from html template
         """
-        template = get_template(template_name)
+        template = get_compiled_template(template_name)
         html_content = template.render(context)
-        options = {
-            'dpi': 365,
-            'page-size': 'A4',
-            'encoding': "UTF-8",
-            'zoom': '1.3',
-            'custom-header': [('Accept-Encoding', 'gzip')],
-            'no-outline': None,
-        }
-        return pdfkit.from_string(html_content, False, options=options)
+        return render_html_to_pdf(html_content, WKHTMLTOPDF_OPTIONS)
 
     def save_pdf(self, pdf_data: bytes, filename: str, module: str) -> int:
         """
-        Save pdf data to the database
+        Save pdf data to the database as a pending file. The data is kept in the cache
+        until `upload_pdf` stores it in MinIO.
         """
-        size_bytes = len(pdf_data)
-        year = timezone.now().year
-
-        # Upload
-        response = upload_file(ContentFile(pdf_data), module, filename)
-        object_key = response.get("key")
-        key_etag = response.get("key_etag")
-        sha256_hex = response.get("sha256")
-        etag = response.get("etag")
-        version_id = response.get("version_id")
-        bucket_name = response.get("bucket")
-
         file_instance = File.objects.create(
-            key=key_etag,
             name=filename,
             extension='pdf',
-            size=size_bytes,
+            size=len(pdf_data),
             module=module,
-            year=year,
+            year=timezone.now().year,
             content_type='application/pdf',
-            path=object_key,
-            bucket=bucket_name,
-            sha256=sha256_hex,
-            etag=etag,
-            state="uploaded",
-            version_id=version_id
+            sha256=hashlib.sha256(pdf_data).hexdigest(),
+            state="pending",
         )
+        cache.set(PENDING_PDF_KEY.format(file_instance.id), pdf_data, PENDING_PDF_TIMEOUT)
         return file_instance.id
 
 
+def upload_pdf(file) -> bool:
+    """
+    Uploads a pending or failed PDF file saved by `save_pdf`. Returns False if its data
+    is no longer in the cache; a failed upload marks the file failed and raises.
+    """
+    pdf_data = cache.get(PENDING_PDF_KEY.format(file.id))
+    if pdf_data is None:
+        return False
+    try:
+        response = upload_file(ContentFile(pdf_data), file.module, file.name)
+    except Exception:
+        File.objects.filter(id=file.id).update(state="failed")
+        raise
+    File.objects.filter(id=file.id).update(
+        key=response.get("key_etag"),
+        path=response.get("key"),
+        bucket=response.get("bucket"),
+        sha256=response.get("sha256"),
+        etag=response.get("etag"),
+        version_id=response.get("version_id"),
+        state="uploaded",
+    )
+    cache.delete(PENDING_PDF_KEY.format(file.id))
+    return True
+
+
 class GenerateInnerLetterToPdf(BasePDFConfig):
     TEMPLATE_NAME = 'letters/service.html'
 
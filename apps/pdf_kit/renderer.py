@@ -0,0 +1,155 @@
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from io import BytesIO
+
+import pdfkit
+from xhtml2pdf import pisa
+
+# wkhtmltopdf (default) or xhtml2pdf, a pure-Python renderer for hosts without the binary
+PDF_RENDER_BACKEND = os.getenv('PDF_RENDER_BACKEND', 'wkhtmltopdf')
+# concurrent renders per process; further requests wait in a queue of PDF_RENDER_QUEUE_SIZE
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 4))
+PDF_RENDER_QUEUE_SIZE = int(os.getenv('PDF_RENDER_QUEUE_SIZE', 32))
+# seconds one render may take; the wkhtmltopdf process is killed after that
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', 60))
+# address space limit of a wkhtmltopdf process, 0 disables it
+PDF_RENDER_MAX_MEMORY_MB = int(os.getenv('PDF_RENDER_MAX_MEMORY_MB', 2048))
+
+WKHTMLTOPDF_OPTIONS = {
+    'dpi': 365,
+    'page-size': 'A4',
+    'encoding': "UTF-8",
+    'zoom': '1.3',
+    'custom-header': [('Accept-Encoding', 'gzip')],
+    'no-outline': None,
+}
+
+
+class PDFRenderError(Exception):
+    pass
+
+
+class PDFRenderTimeout(PDFRenderError):
+    pass
+
+
+class PDFRenderQueueFull(PDFRenderError):
+    pass
+
+
+def _with_memory_limit(command: list) -> list:
+    # `ulimit` in a wrapper shell instead of preexec_fn, which is unsafe to use from threads
+    if not PDF_RENDER_MAX_MEMORY_MB:
+        return command
+    return ['sh', '-c', f'ulimit -v {PDF_RENDER_MAX_MEMORY_MB * 1024} && exec "$@"', 'sh'] + command
+
+
+def render_with_wkhtmltopdf(html: str, options: dict, timeout: float) -> bytes:
+    """
+    Same command line as `pdfkit.from_string`, but run with a timeout and a memory cap.
+    """
+    kit = pdfkit.PDFKit(html, 'string', options=options)
+    try:
+        result = subprocess.run(
+            _with_memory_limit(kit.command()),
+            input=html.encode('utf-8'),
+            capture_output=True,
+            timeout=timeout,
+            env=kit.environ,
+        )
+    except subprocess.TimeoutExpired:
+        raise PDFRenderTimeout(f'wkhtmltopdf did not finish in {timeout} s')
+
+    try:
+        kit.handle_error(result.returncode, result.stderr.decode('utf-8', errors='replace'))
+    except IOError as e:
+        raise PDFRenderError(str(e))
+    if not result.stdout:
+        raise PDFRenderError('wkhtmltopdf returned an empty document')
+    return result.stdout
+
+
+def render_with_xhtml2pdf(html: str, options: dict, timeout: float) -> bytes:
+    """
+    Renders in-process: the wkhtmltopdf options do not apply and the render cannot be interrupted.
+    """
+    stream = BytesIO()
+    status = pisa.CreatePDF(html, dest=stream, encoding='utf-8')
+    if status.err:
+        raise PDFRenderError(f'xhtml2pdf failed with {status.err} errors')
+    return stream.getvalue()
+
+
+BACKENDS = {
+    'wkhtmltopdf': render_with_wkhtmltopdf,
+    'xhtml2pdf': render_with_xhtml2pdf,
+}
+
+
+class PDFRenderer:
+    """
+    Bounded rendering service shared by the views and Celery tasks of one process.
+
+    Renders run on `workers` threads, each driving one renderer process at a time,
+    so a burst of signings queues here instead of starting an unbounded number of
+    wkhtmltopdf processes. At most `queue_size` renders wait; beyond that
+    `PDFRenderQueueFull` is raised immediately.
+    """
+
+    def __init__(self, backend=PDF_RENDER_BACKEND, workers=PDF_RENDER_WORKERS,
+                 queue_size=PDF_RENDER_QUEUE_SIZE, timeout=PDF_RENDER_TIMEOUT):
+        self.render_func = BACKENDS[backend]
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-render')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, html: str, options: dict = None):
+        if not self._slots.acquire(blocking=False):
+            raise PDFRenderQueueFull('Too many PDF renders in progress')
+        try:
+            future = self._executor.submit(self.render_func, html, options or WKHTMLTOPDF_OPTIONS, self.timeout)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def render(self, html: str, options: dict = None, wait: float = None) -> bytes:
+        """
+        Renders and waits for the result; `wait` bounds queueing plus rendering time.
+        """
+        future = self.submit(html, options)
+        try:
+            return future.result(timeout=wait or self.timeout * 2)
+        except TimeoutError:
+            future.cancel()
+            raise PDFRenderTimeout('PDF render did not finish in time')
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer = None
+_renderer_pid = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> PDFRenderer:
+    """
+    Returns the renderer of the current process. Worker threads do not survive a fork,
+    so forked processes (gunicorn, Celery prefork) get their own renderer.
+    """
+    global _renderer, _renderer_pid
+    pid = os.getpid()
+    if _renderer is None or _renderer_pid != pid:
+        with _renderer_lock:
+            if _renderer is None or _renderer_pid != pid:
+                _renderer = PDFRenderer()
+                _renderer_pid = pid
+    return _renderer
+
+
+def render_html_to_pdf(html: str, options: dict = None) -> bytes:
+    return get_renderer().render(html, options)
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from apps.company.models import EnvModel
+from apps.pdf_kit import renderer
+from apps.pdf_kit.assets import get_env_assets
+from apps.pdf_kit.generate_letter import BasePDFConfig
+from apps.pdf_kit.renderer import PDFRenderError, PDFRenderer, PDFRenderQueueFull, PDFRenderTimeout
+
+
+@pytest.fixture
+def blocked_backend(monkeypatch):
+    """
+    The xhtml2pdf backend, with renders that wait until the test releases them.
+    """
+    release = threading.Event()
+
+    def _render(html, options, timeout):
+        release.wait(5)
+        return renderer.render_with_xhtml2pdf(html, options, timeout)
+
+    monkeypatch.setitem(renderer.BACKENDS, 'blocked', _render)
+    yield release
+    release.set()
+
+
+def test_renders_beyond_the_queue_are_rejected(blocked_backend):
+    pdf_renderer = PDFRenderer(backend='blocked', workers=1, queue_size=1)
+    running = pdf_renderer.submit('<p>1</p>')
+    queued = pdf_renderer.submit('<p>2</p>')
+
+    with pytest.raises(PDFRenderQueueFull):
+        pdf_renderer.submit('<p>3</p>')
+
+    blocked_backend.set()
+    assert all(future.result(5).startswith(b'%PDF') for future in (running, queued))
+    # both slots are free again once the renders are done
+    pdf_renderer._executor.shutdown(wait=True)
+    assert pdf_renderer._slots.acquire(blocking=False) and pdf_renderer._slots.acquire(blocking=False)
+
+
+def test_render_waits_a_bounded_time(blocked_backend):
+    pdf_renderer = PDFRenderer(backend='blocked', workers=1, queue_size=1)
+
+    with pytest.raises(PDFRenderTimeout):
+        pdf_renderer.render('<p>1</p>', wait=0.1)
+    pdf_renderer.shutdown()
+
+
+def test_renders_with_the_pure_python_backend():
+    config = BasePDFConfig()
+    html = '<html><body>{}{}</body></html>'.format(
+        config.get_signers([{'is_signed': True, 'position': 'Director', 'name': 'A. Karimov'}], 'check-id'),
+        config.get_receivers([{'name': 'Receiver'}]),
+    )
+    pdf_renderer = PDFRenderer(backend='xhtml2pdf', workers=2, queue_size=2)
+
+    pdfs = [future.result(30) for future in [pdf_renderer.submit(html) for _ in range(3)]]
+
+    assert all(pdf.startswith(b'%PDF') for pdf in pdfs)
+    pdf_renderer.shutdown()
+
+
+def test_backend_errors_reach_the_caller(monkeypatch):
+    def _render(html, options, timeout):
+        raise PDFRenderError('broken template')
+
+    monkeypatch.setitem(renderer.BACKENDS, 'broken', _render)
+    pdf_renderer = PDFRenderer(backend='broken', workers=1, queue_size=1)
+
+    with pytest.raises(PDFRenderError, match='broken template'):
+        pdf_renderer.render('<p>1</p>')
+    pdf_renderer.shutdown()
+
+
+class _SlowKit:
+    """
+    Stands in for pdfkit.PDFKit with a command that outlives the render timeout.
+    """
+    environ = None
+
+    def __init__(self, html, type_, options=None):
+        pass
+
+    def command(self):
+        return ['sleep', '5']
+
+
+def test_wkhtmltopdf_process_is_killed_after_the_timeout(monkeypatch):
+    monkeypatch.setattr(renderer.pdfkit, 'PDFKit', _SlowKit)
+
+    with pytest.raises(PDFRenderTimeout):
+        renderer.render_with_wkhtmltopdf('<p>1</p>', {}, timeout=0.2)
+
+
+def test_env_assets_are_cached(django_assert_num_queries):
+    EnvModel.objects.create(code='test-env', name_uz='Bank', name_ru='Банк', company_logo='bG9nbw==')
+    get_env_assets('test-env')
+
+    with django_assert_num_queries(0):
+        assets = get_env_assets('test-env')
+
+    assert assets.name_uz == 'Bank'
+    assert assets.company_logo == 'bG9nbw=='
+
+
+def test_env_assets_are_invalidated_on_save(django_capture_on_commit_callbacks):
+    env = EnvModel.objects.create(code='test-env', name_uz='Bank')
+    get_env_assets('test-env')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        env.name_uz = 'New Bank'
+        env.save()
+
+    assert get_env_assets('test-env').name_uz == 'New Bank'
+
+
+def test_signers_fragment():
+    signers = [
+        {'is_signed': True, 'position': 'Director', 'name': 'A. Karimov'},
+        {'is_signed': False, 'position': 'Deputy', 'name': 'B. Aliyev'},
+    ]
+    config = BasePDFConfig()
+
+    html = config.get_signers(signers, 'check-id')
+
+    assert html.count('<table') == 2
+    assert html.count(config.generate_qrcode_base64('check-id')) == 1
+    assert 'Director' in html and 'B. Aliyev' in html
+    assert 'qr-code' not in config.get_signers(signers[1:], 'check-id')
+
+
+def test_receivers_fragment():
+    config = BasePDFConfig()
+
+    assert 'Receiver' in config.get_receivers([{'name': 'Receiver'}])
+    assert 'Bank' in config.get_receivers([{'correspondent_name': 'Bank'}], 'new_receivers')
@@ -7,10 +7,10 @@ from django.db.models import When, Value, Case, F, FloatField, DateField
 from django.db.models.functions import Cast
 from django.utils import timezone
 
+from apps.company.models import Department
 from apps.user.models import User
 from apps.user.services import (
-    get_dept_ids,
-    get_condition_id,
+    OrgResolver,
     format_date,
     make_inactive_signers,
     existing_users_by_emp,
@@ -25,11 +25,12 @@ def _process_emp_dept_batch(
         sql: str,
         field_map_cache: Dict[str, int],
         batch: List[Tuple[int, str, int]],
+        resolver: OrgResolver,
 ) -> Tuple[int, int]:
     """
     For a batch of (user_pk, emp_id, company_id):
       - query Oracle for each emp_id,
-      - resolve department IDs via get_dept_ids,
+      - resolve department IDs from the sync's OrgResolver,
       - bulk update all changed users in a single UPDATE.
     Returns (success_count, fail_count).
     """
@@ -59,10 +60,14 @@ def _process_emp_dept_batch(
             department_code = row[dept_idx]
 
             # Map external department_code -> (top_level_dept_id, sub_sub_dept_id) in our Django DB
-            top_level_dept_id, sub_sub_dept_id = get_dept_ids(department_code, company_id)
+            top_level_dept_id, _, sub_sub_dept_id = resolver.dept_ids(department_code, company_id)
             updates[pk] = (sub_sub_dept_id, top_level_dept_id)
             success += 1
 
+        except Department.MultipleObjectsReturned as e:
+            logging.error("Skipping emp_id=%s (user_id=%s): %s", emp_id, pk, e)
+            fail += 1
+
         except Exception as e:
             logging.error("Oracle lookup failed for emp_id=%s (user_id=%s): %s", emp_id, pk, e, exc_info=True)
             fail += 1
@@ -179,7 +184,7 @@ def _suffix(value: Optional[str], ts: int) -> Optional[str]:
 
 
 def _process_user_condition_batch(
-        cursor, sql: str, field_map_cache: Dict[str, int], batch: List[Tuple]
+        cursor, sql: str, field_map_cache: Dict[str, int], batch: List[Tuple], resolver: OrgResolver
 ) -> Tuple[int, int]:
     """
     For a batch of (user_pk, emp_id), query Oracle and apply a single bulk update.
@@ -216,7 +221,7 @@ def _process_user_condition_batch(
             last_update = row[last_idx]
 
             # Map condition code to status_id
-            new_status_id = get_condition_id(cond_code)
+            new_status_id = resolver.condition_id(cond_code)
             if new_status_id is None:
                 logging.warning("Unknown condition code %r for emp_id=%s (user_id=%s)", cond_code, emp_id, pk)
                 fail += 1
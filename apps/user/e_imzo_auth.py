@@ -8,6 +8,7 @@ from django.utils.crypto import get_random_string
 from apps.user.models import User
 from apps.user.services import send_otp_user
 from utils.constants import CONSTANTS
+from utils.e_imzo import get_e_imzo_client
 from utils.exception import get_response_message, ValidationError2
 from utils.tools import get_user_ip
 
@@ -31,11 +32,8 @@ class AuthWithEDS:
         return header
 
     def attache_timestamp(self):
-        url = os.getenv('TIMESTAMP_URL')
         try:
-            response = requests.post(url, data=self.pkcs7, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+            return get_e_imzo_client().attach_timestamp(self.pkcs7, self.headers)
         except requests.exceptions.RequestException as e:
             message = get_response_message(self.request, 625)
             message['message'] = message['message'].format(e=e)
@@ -44,12 +42,8 @@ class AuthWithEDS:
     def verify_attached_pkcs7(self):
         ts = self.attache_timestamp()
         pkcs7 = ts.get('pkcs7b64')
-        url = os.getenv('VERIFY_ATTACHED')
-
         try:
-            response = requests.post(url, headers=self.headers, data=pkcs7)
-            response.raise_for_status()
-            return response.json()
+            return get_e_imzo_client().verify_attached(pkcs7, self.headers)
         except requests.exceptions.RequestException as e:
             message = get_response_message(self.request, 625)
             message['message'] = message['message'].format(e=e)
@@ -1,10 +1,14 @@
 import os
+import threading
 
 import ldap
 from django.core.exceptions import ValidationError
 from ldap.filter import escape_filter_chars
 
+from apps.user.ldap_pool import LDAPConnectionPool, LDAPUnavailable, LDAP_BIND_POOL_SIZE, LDAP_POOL_SIZE, \
+    LDAP_FAILURE_THRESHOLD, LDAP_RESET_TIMEOUT
 from apps.user.models import User
+from utils.circuit_breaker import CircuitBreaker
 from utils.exception import get_response_message, ValidationError2
 
 
@@ -30,86 +34,122 @@ from utils.exception import get_response_message, ValidationError2
 #     return None
 
 
+# one breaker per process: when AD is down both pools fail fast together
+_breaker = CircuitBreaker(LDAP_FAILURE_THRESHOLD, LDAP_RESET_TIMEOUT)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(name, **kwargs) -> LDAPConnectionPool:
+    # keyed by pid so that forked workers never share a parent's sockets
+    key = (os.getpid(), name)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = LDAPConnectionPool(
+                    os.getenv("LDAP_HOST", "ldap://10.130.20.101"),
+                    breaker=_breaker,
+                    start_tls=os.getenv("LDAP_STARTTLS", "0") == "1",
+                    **kwargs
+                )
+    return pool
+
+
+def get_bind_pool() -> LDAPConnectionPool:
+    return _get_pool('bind', size=LDAP_BIND_POOL_SIZE)
+
+
+def get_search_pool():
+    """
+    Connections bound as the LDAP_LOGIN service account, or None if it is not configured.
+    """
+    if not os.getenv('LDAP_LOGIN'):
+        return None
+    return _get_pool('search', size=LDAP_POOL_SIZE,
+                     bind_dn=os.getenv('LDAP_LOGIN'), password=os.getenv('LDAP_PASSWORD'))
+
+
+def reset_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+    _breaker.success()
+
+
+def _search_pinfl(conn, base_dn, username):
+    # ---- Search current user entry to read tab number ----
+    requested_attrs = ["postalCode"]
+
+    # Find by either UPN or sAMAccountName
+    sam = username.split('@', 1)[0]
+    f_upn = escape_filter_chars(username)
+    f_sam = escape_filter_chars(sam)
+
+    filter_str = f"(|(userPrincipalName={f_upn})(sAMAccountName={f_sam}))"
+
+    results = conn.search_s(
+        base_dn,
+        ldap.SCOPE_SUBTREE,
+        filterstr=filter_str,
+        attrlist=requested_attrs
+    )
+
+    if not results:
+        # Auth succeeded but user not found in directory subtree (OU scoping?)
+        raise ValidationError2("Authenticated, but directory entry not found (check LDAP_BASE_DN / OU scope).")
+
+    # Take the first matching entry
+    _dn, attrs = results[0]
+
+    # python-ldap returns bytes; decode first non-empty attribute in our priority list
+    for attr in requested_attrs:
+        val = attrs.get(attr)
+        if val:
+            # val is a list of byte strings; pick first
+            pinfl = (val[0].decode("utf-8", "ignore") if isinstance(val[0], bytes) else str(val[0])).strip()
+            if pinfl:
+                return pinfl
+    return None
+
+
 def authenticate(username: str, password: str, request):
     LDAP_HOST = os.getenv("LDAP_HOST", "ldap://10.130.20.101")  # e.g., "ldaps://ad.corp.example.com:636" or "ldap://..."
     BASE_DN = os.getenv("LDAP_BASE_DN", "OU=Bosh ofis,DC=cbu,DC=uz")  # e.g., "DC=corp,DC=example,DC=com"
-    USE_STARTTLS = os.getenv("LDAP_STARTTLS", "0") == "1"
 
     if not LDAP_HOST or not BASE_DN:
         raise ValidationError("LDAP is not configured (LDAP_HOST / LDAP_BASE_DN missing).")
 
-    conn = None
+    search_pool = get_search_pool()
     try:
-        # Connect
-        conn = ldap.initialize(LDAP_HOST)
-        conn.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
-        conn.set_option(ldap.OPT_REFERRALS, 0)  # AD: avoid chasing referrals
-        if LDAP_HOST.lower().startswith("ldap://") and USE_STARTTLS:
-            conn.start_tls_s()
-
-        # Bind using UPN (user@domain)
-        try:
+        # Bind using UPN (user@domain) on a pooled connection
+        with get_bind_pool().connection() as conn:
             conn.simple_bind_s(username, password)
-        except ldap.INVALID_CREDENTIALS:
-            # 701 – your code's message map
-            message = get_response_message(request, 701)
-            raise ValidationError2(message)
-        except (ldap.SERVER_DOWN, ldap.LDAPError):
-            message = get_response_message(request, 777)
-            raise ValidationError2(message)
-
-        # ---- Search current user entry to read tab number ----
-        # Try multiple attributes; prefer env-defined TAB_ATTR first.
-        requested_attrs = ["postalCode"]
-
-        # Find by either UPN or sAMAccountName
-        # Use ldap.filter.escape_filter_chars if you allow special chars (sam is from input)
-        sam = username.split('@', 1)[0]
-        f_upn = escape_filter_chars(username)
-        f_sam = escape_filter_chars(sam)
-
-        filter_str = f"(|(userPrincipalName={f_upn})(sAMAccountName={f_sam}))"
-
-        results = conn.search_s(
-            BASE_DN,
-            ldap.SCOPE_SUBTREE,
-            filterstr=filter_str,
-            attrlist=requested_attrs
-        )
-
-        if not results:
-            # Auth succeeded but user not found in directory subtree (OU scoping?)
-            raise ValidationError2("Authenticated, but directory entry not found (check LDAP_BASE_DN / OU scope).")
-
-        # Take the first matching entry
-        _dn, attrs = results[0]
-
-        # python-ldap returns bytes; decode first non-empty attribute in our priority list
-        pinfl = None
-        for attr in requested_attrs:
-            val = attrs.get(attr)
-            if val:
-                # val is a list of byte strings; pick first
-                pinfl = (val[0].decode("utf-8", "ignore") if isinstance(val[0], bytes) else str(val[0])).strip()
-                if pinfl:
-                    break
-
-        if not pinfl:
-            raise ValidationError2("Your directory entry has no tab number attribute set.")
-
-        # ---- Find local Django user by tab number and return it ----
-        # Adjust field name: assuming `User` has `tab_number` field
-        user = User.objects.filter(pinfl=pinfl, is_user_active=True).first()
-        if not user:
-            # You can choose to auto-provision here if desired.
-            # For now, mirror your old behavior:
-            raise ValidationError2("Local user with this tab number not found or inactive.")
-
-        return user
-
-    finally:
-        if conn is not None:
-            try:
-                conn.unbind_s()
-            except Exception:
-                pass
+            if search_pool is None:
+                # no service account: read the entry as the user that has just bound
+                pinfl = _search_pinfl(conn, BASE_DN, username)
+
+        if search_pool is not None:
+            with search_pool.connection() as conn:
+                pinfl = _search_pinfl(conn, BASE_DN, username)
+    except ldap.INVALID_CREDENTIALS:
+        # 701 – your code's message map
+        message = get_response_message(request, 701)
+        raise ValidationError2(message)
+    except (LDAPUnavailable, ldap.LDAPError):
+        message = get_response_message(request, 777)
+        raise ValidationError2(message)
+
+    if not pinfl:
+        raise ValidationError2("Your directory entry has no tab number attribute set.")
+
+    # ---- Find local Django user by tab number and return it ----
+    user = User.objects.filter(pinfl=pinfl, is_user_active=True).first()
+    if not user:
+        # You can choose to auto-provision here if desired.
+        # For now, mirror your old behavior:
+        raise ValidationError2("Local user with this tab number not found or inactive.")
+
+    return user
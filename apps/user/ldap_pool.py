@@ -0,0 +1,148 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import ldap
+
+# service-account connections for directory lookups, kept open between logins
+LDAP_POOL_SIZE = int(os.getenv('LDAP_POOL_SIZE', 4))
+# connections used to verify user credentials; bounds the binds in flight per process
+LDAP_BIND_POOL_SIZE = int(os.getenv('LDAP_BIND_POOL_SIZE', 8))
+# seconds a login waits for a free connection before giving up
+LDAP_POOL_WAIT = float(os.getenv('LDAP_POOL_WAIT', 5))
+# network and per-operation timeout in seconds
+LDAP_TIMEOUT = float(os.getenv('LDAP_TIMEOUT', 5))
+# an idle connection is checked with WhoAmI before reuse; any connection is replaced after the max age
+LDAP_HEALTH_CHECK_INTERVAL = float(os.getenv('LDAP_HEALTH_CHECK_INTERVAL', 30))
+LDAP_MAX_CONNECTION_AGE = float(os.getenv('LDAP_MAX_CONNECTION_AGE', 600))
+# consecutive connection failures that open the circuit, and seconds until a trial request
+LDAP_FAILURE_THRESHOLD = int(os.getenv('LDAP_FAILURE_THRESHOLD', 5))
+LDAP_RESET_TIMEOUT = float(os.getenv('LDAP_RESET_TIMEOUT', 30))
+
+
+class LDAPUnavailable(Exception):
+    """
+    The directory is down or every connection is busy; raised instead of waiting on AD.
+    """
+
+
+class _PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.used_at = time.monotonic()
+
+
+class LDAPConnectionPool:
+    """
+    Bounded pool of connections to one LDAP server.
+
+    With `bind_dn` the connections are bound once as that account and reused for searches;
+    without it they are used for credential binds, each bind replacing the identity of the
+    previous one, so logins reuse TCP/TLS sessions instead of opening one each.
+    Connection-level errors are reported to the shared `breaker` and surface as `LDAPUnavailable`.
+    """
+
+    def __init__(self, uri, size, breaker, bind_dn=None, password=None, start_tls=False,
+                 timeout=LDAP_TIMEOUT, wait=LDAP_POOL_WAIT):
+        self.uri = uri
+        self.bind_dn = bind_dn
+        self.password = password
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.wait = wait
+        self.breaker = breaker
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> _PooledConnection:
+        conn = ldap.initialize(self.uri)
+        try:
+            conn.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
+            conn.set_option(ldap.OPT_REFERRALS, 0)  # AD: avoid chasing referrals
+            conn.set_option(ldap.OPT_NETWORK_TIMEOUT, self.timeout)
+            conn.set_option(ldap.OPT_TIMEOUT, self.timeout)
+            if self.start_tls and self.uri.lower().startswith('ldap://'):
+                conn.start_tls_s()
+            if self.bind_dn:
+                conn.simple_bind_s(self.bind_dn, self.password)
+        except ldap.LDAPError:
+            self._close(_PooledConnection(conn))
+            raise
+        return _PooledConnection(conn)
+
+    def _is_healthy(self, pooled) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at > LDAP_MAX_CONNECTION_AGE:
+            return False
+        if now - pooled.used_at > LDAP_HEALTH_CHECK_INTERVAL:
+            try:
+                pooled.conn.whoami_s()
+            except ldap.LDAPError:
+                return False
+        return True
+
+    @staticmethod
+    def _close(pooled):
+        try:
+            pooled.conn.unbind_s()
+        except Exception:
+            pass
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_healthy(pooled):
+                return pooled
+            self._close(pooled)
+
+    @contextmanager
+    def connection(self):
+        if not self.breaker.allow():
+            raise LDAPUnavailable('LDAP circuit is open')
+
+        # every call the breaker let through reports an outcome, so a half-open trial always ends
+        reported = False
+        acquired = False
+        pooled = None
+        try:
+            if not self._slots.acquire(timeout=self.wait):
+                raise LDAPUnavailable('No free LDAP connection')
+            acquired = True
+            try:
+                pooled = self._checkout()
+                yield pooled.conn
+            except ldap.LDAPError as e:
+                # while connecting any LDAP error is the server's; afterwards only a lost connection is
+                if pooled is not None and not isinstance(e, (ldap.SERVER_DOWN, ldap.TIMEOUT)):
+                    raise
+                self.breaker.failure()
+                reported = True
+                if pooled is not None:
+                    self._close(pooled)
+                    pooled = None
+                logging.warning(f"LDAP connection to {self.uri} failed: {e}")
+                raise LDAPUnavailable(str(e)) from e
+        finally:
+            # the server answered, so the connection stays usable, e.g. after INVALID_CREDENTIALS
+            if pooled is not None:
+                self.breaker.success()
+                pooled.used_at = time.monotonic()
+                self._idle.put(pooled)
+            elif not reported:
+                # no connection was made, e.g. every slot was busy: the outcome is unknown
+                self.breaker.abandon()
+            if acquired:
+                self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
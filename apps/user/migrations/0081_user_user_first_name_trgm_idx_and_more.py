@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:02
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0080_remove_user_work_schedule'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='user_first_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='user_last_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0081_user_user_first_name_trgm_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='password_update_time',
+            field=models.IntegerField(blank=True, help_text='Unix time of the last password change; tokens issued before it are rejected', null=True),
+        ),
+    ]
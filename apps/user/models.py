@@ -1,13 +1,13 @@
 import random
-from datetime import datetime
+import time
 
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
-from django.utils import timezone
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.user.tokens import issue_tokens
 from base_model.models import BaseModel
 from config.redis_client import redis_client
 from utils.constants import COLORS, CONSTANTS
@@ -111,6 +111,8 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     status = models.ForeignKey(UserStatus, on_delete=models.SET_NULL, null=True, blank=True)
     is_user_active = models.BooleanField(default=True)
     is_registered = models.BooleanField(default=False)
+    password_update_time = models.IntegerField(null=True, blank=True,
+                                               help_text='Unix time of the last password change; tokens issued before it are rejected')
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     first_name = models.CharField(max_length=50, null=True)
@@ -171,33 +173,18 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     class Meta:
         indexes = [
             models.Index(fields=['username', 'email', 'pinfl', 'tin', 'table_number', 'unique_number', 'phone']),
+            GinIndex(fields=['first_name'], opclasses=['gin_trgm_ops'], name='user_first_name_trgm_idx'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='user_last_name_trgm_idx'),
         ]
 
     def has_permission(self, method, url_name):
-        # Check if the user's role has the permission
-        if self.roles.exists():
-            for role in self.roles.all():
-                if role.permissions.filter(method=method, url_name=url_name).exists():
-                    return True
-
-        # Check if the user has any specific permission directly assigned
-        if self.permissions.filter(method=method, url_name=url_name).exists():
-            return True
-        return False
+        # roles and directly assigned permissions, compiled into one cached set
+        from apps.user.permission_set import has_permission
+        return has_permission(self.id, method, url_name)
 
     @property
     def tokens(self):
-        refresh = RefreshToken.for_user(self)
-        ts = refresh.access_token.payload['exp']
-        dt = datetime.fromtimestamp(ts)
-        data = {
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-            'expires_in': str(dt),
-        }
-        self.last_login = timezone.now()
-        self.save()
-        return data
+        return issue_tokens(self)
 
     @property
     def mobile_number(self):
@@ -220,6 +207,10 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
         is_online = redis_client.exists(f'user_{self.id}')
         return bool(is_online)
 
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.password_update_time = int(time.time())
+
     def before_save(self):
         if self.color is None:
             self.color = COLORS[random.randrange(0, len(COLORS))]
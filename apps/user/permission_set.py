@@ -0,0 +1,65 @@
+import os
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from apps.user.models import ProjectPermission
+from apps.user.principal import PRINCIPAL_VERSION_KEY
+from utils.cache_version import bump_version, get_versions
+
+PERMISSION_SET_KEY = 'user_permission_set:{}:v{}.{}'
+# bumped when a permission or the permissions of a role change, which affects many users at once;
+# changes of a single user's roles or direct permissions bump that user's principal version instead
+PERMISSION_SET_VERSION_KEY = 'user_permission_set_version'
+PERMISSION_SET_TIMEOUT = 60 * 60
+# compiled sets kept per process, keyed by user and version, so stale ones are never looked up again
+PERMISSION_SET_LOCAL_SIZE = int(os.getenv('PERMISSION_SET_LOCAL_SIZE', 4096))
+
+
+def load_permission_set(user_id) -> frozenset:
+    """
+    Reads the (method, url_name) pairs a user gets from their roles and direct permissions in one query.
+    """
+    pairs = (ProjectPermission.objects
+             .filter(Q(rolemodel__user__id=user_id) | Q(user__id=user_id))
+             .order_by()
+             .values_list('method', 'url_name')
+             .distinct())
+    return frozenset(pairs)
+
+
+@lru_cache(maxsize=PERMISSION_SET_LOCAL_SIZE)
+def _compiled_permission_set(user_id, global_version, user_version) -> frozenset:
+    key = PERMISSION_SET_KEY.format(user_id, global_version, user_version)
+    permission_set = cache.get(key)
+    if permission_set is None:
+        permission_set = load_permission_set(user_id)
+        cache.set(key, permission_set, PERMISSION_SET_TIMEOUT)
+    return permission_set
+
+
+def get_permission_set(user_id) -> frozenset:
+    """
+    Returns the compiled permission set of a user. Costs one cache round trip for the
+    version stamps; the set itself comes from the process, Redis or, after a change, the database.
+    """
+    user_version_key = PRINCIPAL_VERSION_KEY.format(user_id)
+    versions = get_versions(PERMISSION_SET_VERSION_KEY, user_version_key)
+    return _compiled_permission_set(user_id, versions[PERMISSION_SET_VERSION_KEY], versions[user_version_key])
+
+
+def has_permission(user_id, method, url_name) -> bool:
+    return (method, url_name) in get_permission_set(user_id)
+
+
+def _bump_permission_set_version():
+    bump_version(PERMISSION_SET_VERSION_KEY)
+
+
+def invalidate_permission_sets() -> None:
+    """
+    Makes the permission sets of all users stale once the current transaction commits.
+    """
+    transaction.on_commit(_bump_permission_set_version)
@@ -0,0 +1,116 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from apps.user.models import User
+from utils.cache_version import bump_version, get_version
+
+PRINCIPAL_KEY = 'user_principal:{}:v{}'
+PRINCIPAL_VERSION_KEY = 'user_principal_version:{}'
+PRINCIPAL_TIMEOUT = 15 * 60
+
+PRINCIPAL_FIELDS = (
+    'id',
+    'username',
+    'is_active',
+    'is_user_active',
+    'is_registered',
+    'password_update_time',
+    'is_superuser',
+    'is_staff',
+    'company_id',
+    'top_level_department_id',
+    'department_id',
+)
+
+
+class UserPrincipal:
+    """
+    Small, cacheable stand-in for an authenticated `User` used by the auth middlewares.
+    It carries only the fields the request path needs; any other attribute
+    (full_name, dict(), roles, ...) loads the full user row once, on first access.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, data: dict):
+        self._data = data
+        self._user = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        data = self.__dict__.get('_data', {})
+        if name in data:
+            return data[name]
+        return getattr(self.user, name)
+
+    @property
+    def pk(self):
+        return self._data['id']
+
+    @property
+    def user(self) -> User:
+        if self._user is None:
+            self._user = User.objects.get(id=self._data['id'])
+        return self._user
+
+    def __str__(self):
+        return str(self.user)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+def _version(user_id) -> int:
+    return get_version(PRINCIPAL_VERSION_KEY.format(user_id))
+
+
+def load_principal_data(user_id):
+    """
+    Reads the principal fields and role ids of a user with a single query.
+    """
+    data = (User.objects.filter(id=user_id)
+            .annotate(role_ids=ArrayAgg('roles__id', filter=Q(roles__isnull=False), distinct=True))
+            .values(*PRINCIPAL_FIELDS, 'role_ids')
+            .first())
+    if data is not None:
+        data['role_ids'] = tuple(data['role_ids'] or ())
+    return data
+
+
+def get_user_principal(user_id):
+    """
+    Returns the cached `UserPrincipal` of a user, or None if the user does not exist.
+    The cache key carries the user's principal version, so a concurrent reader
+    can never store stale data under the key of a newer version.
+    """
+    if not user_id:
+        return None
+
+    key = PRINCIPAL_KEY.format(user_id, _version(user_id))
+    data = cache.get(key)
+    if data is None:
+        data = load_principal_data(user_id)
+        if data is None:
+            return None
+        cache.set(key, data, PRINCIPAL_TIMEOUT)
+    return UserPrincipal(data)
+
+
+def _bump_versions(user_ids):
+    for user_id in user_ids:
+        bump_version(PRINCIPAL_VERSION_KEY.format(user_id))
+
+
+def invalidate_user_principal(*user_ids) -> None:
+    """
+    Makes the cached principals of the given users stale once the current transaction commits.
+    """
+    user_ids = {i for i in user_ids if i}
+    if user_ids:
+        transaction.on_commit(lambda: _bump_versions(user_ids))
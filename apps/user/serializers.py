@@ -26,6 +26,7 @@ from apps.user.models import (
     BirthdayComment,
     UserDevice, UserFavourite,
 )
+from apps.user.tokens import issue_tokens
 from apps.wchat.models import ChatMember
 from base_model.serializers import ContentTypeMixin
 from config.middlewares.current_user import get_current_user_id
@@ -131,9 +132,7 @@ class LoginSerializer(serializers.ModelSerializer):
     tokens = serializers.SerializerMethodField(read_only=True)
 
     def get_tokens(self, obj):
-        username = obj.get('username')
-        tokens = User.objects.get(username=username).tokens
-        return tokens
+        return issue_tokens(obj['user'])
 
     class Meta:
         model = User
@@ -154,6 +153,8 @@ class LoginSerializer(serializers.ModelSerializer):
             message = get_response_message(request, 703)
             raise ValidationError2(message)
 
+        # the authenticated user issues the tokens, no second lookup by username
+        attrs['user'] = user
         return attrs
 
 
@@ -1,5 +1,6 @@
 import uuid
-from typing import Optional, Set, Dict, Literal, Iterable, Sequence
+from functools import cached_property
+from typing import Optional, Set, Dict, List, Literal, Iterable, Sequence, Tuple
 
 from apps.company.models import Department
 from apps.user.models import (
@@ -80,6 +81,79 @@ def get_dept_ids(code, company_id=None):
         return None, None
 
 
+class OrgResolver:
+    """
+    Resolves department codes and user condition codes of an HR sync from memory.
+
+    Departments are loaded once as (code, company_id) → id and id → parent_id, user statuses
+    as code → id, each with a single query on first use. Build one per sync run and pass it
+    to the per-row helpers instead of calling `get_dept_ids` / `get_condition_id` per employee.
+    Unknown codes resolve to None; a department code used twice in a company raises
+    `Department.MultipleObjectsReturned`, as `get_dept_ids` does, so the sync skips that row.
+    """
+    AMBIGUOUS = -1
+
+    @cached_property
+    def _department_maps(self) -> Tuple[Dict[tuple, int], Dict[int, Optional[int]]]:
+        departments: Dict[tuple, int] = {}
+        parents: Dict[int, Optional[int]] = {}
+        for pk, code, company_id, parent_id in (Department.objects
+                                                .values_list('id', 'code', 'company_id', 'parent_id')
+                                                .order_by('id')):
+            key = (code, company_id)
+            departments[key] = self.AMBIGUOUS if key in departments else pk
+            parents[pk] = parent_id
+        return departments, parents
+
+    @cached_property
+    def _statuses(self) -> Dict[str, int]:
+        statuses: Dict[str, int] = {}
+        for code, pk in UserStatus.objects.filter(code__isnull=False).values_list('code', 'id').order_by('id'):
+            statuses.setdefault(code, pk)
+        return statuses
+
+    def department_id(self, code, company_id) -> Optional[int]:
+        department_id = self._department_maps[0].get((code, company_id))
+        if department_id == self.AMBIGUOUS:
+            raise Department.MultipleObjectsReturned(
+                f'Department code {code!r} is used more than once in company {company_id}')
+        return department_id
+
+    def parent_id(self, department_id) -> Optional[int]:
+        return self._department_maps[1].get(department_id)
+
+    def chain(self, department_id) -> List[int]:
+        """Ids from the top-level department down to `department_id`."""
+        chain = []
+        while department_id is not None and department_id not in chain:
+            chain.append(department_id)
+            department_id = self.parent_id(department_id)
+        return chain[::-1]
+
+    def top_level_department_id(self, code, company_id) -> Optional[int]:
+        chain = self.chain(self.department_id(code, company_id))
+        return chain[0] if chain else None
+
+    def dept_ids(self, code, company_id) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """
+        (top_level, sub, sub_sub) ids of a department, counted like `get_dept_ids`:
+        the department itself, its parent and its grandparent (or the highest of them).
+        """
+        sub_sub = self.department_id(code, company_id)
+        if sub_sub is None:
+            return None, None, None
+        sub = self.parent_id(sub_sub)
+        top = self.parent_id(sub) if sub is not None else None
+        return top or sub or sub_sub, sub, sub_sub
+
+    def resolve_departments(self, keys: Iterable[tuple]) -> Dict[tuple, Tuple[Optional[int], ...]]:
+        """Batch form of `dept_ids`: {(code, company_id): (top_level, sub, sub_sub)}; raises like it."""
+        return {key: self.dept_ids(*key) for key in set(keys)}
+
+    def condition_id(self, code) -> Optional[int]:
+        return self._statuses.get(code)
+
+
 def replace_encoded_chars(text):
     for encoded, char in ENCODED_CHARS_MAP.items():
         text = text.replace(encoded, char)
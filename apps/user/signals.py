@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.user.models import User, RoleModel, ProjectPermission
+from apps.user.permission_set import invalidate_permission_sets
+from apps.user.principal import invalidate_user_principal
+
+
+@receiver([post_save, post_delete], sender=User)
+def _invalidate_principal_on_user_change(sender, instance, **kwargs):
+    invalidate_user_principal(instance.id)
+
+
+@receiver(post_save, sender=RoleModel)
+def _invalidate_principal_on_role_change(sender, instance, **kwargs):
+    invalidate_user_principal(*User.objects.filter(roles=instance).values_list('id', flat=True))
+
+
+def _invalidate_users_on_m2m_change(field, instance, action, reverse, pk_set):
+    if action == 'pre_clear':
+        # pk_set is not provided on clear, so collect the affected users before they are unlinked
+        if reverse:
+            invalidate_user_principal(*User.objects.filter(**{field: instance}).values_list('id', flat=True))
+        else:
+            invalidate_user_principal(instance.id)
+    elif action in ('post_add', 'post_remove'):
+        if reverse:
+            invalidate_user_principal(*(pk_set or ()))
+        else:
+            invalidate_user_principal(instance.id)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def _invalidate_principal_on_user_roles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    _invalidate_users_on_m2m_change('roles', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=User.permissions.through)
+def _invalidate_principal_on_user_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    _invalidate_users_on_m2m_change('permissions', instance, action, reverse, pk_set)
+
+
+@receiver([post_save, post_delete], sender=ProjectPermission)
+@receiver(post_delete, sender=RoleModel)
+def _invalidate_permission_sets_on_permission_change(sender, **kwargs):
+    invalidate_permission_sets()
+
+
+@receiver(m2m_changed, sender=RoleModel.permissions.through)
+def _invalidate_permission_sets_on_role_permissions_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_permission_sets()
@@ -29,7 +29,7 @@ from apps.user.services import (
     existing_users_by_emp,
     format_date,
     get_condition_id,
-    get_dept_ids,
+    OrgResolver,
     normalize_login,
     normalize_phone,
     parse_sick_leave_row,
@@ -559,14 +559,14 @@ def _resolve_fk_maps(rows: Sequence[EmpRow]) -> Tuple[Dict[int, int], Dict[str,
 
 def _build_user_for_create(r: EmpRow, pos_id_by_post: Dict[int, int],
                            company_id_by_local: Dict[str, int],
-                           username: Optional[str]) -> "User":
+                           username: Optional[str], resolver: OrgResolver) -> "User":
     return User(
         table_number=r.tab_num,
         last_name=r.last_name,
         first_name=r.first_name,
         father_name=r.middle_name,
         birth_date=r.birth_date,
-        status_id=get_condition_id(r.condition),
+        status_id=resolver.condition_id(r.condition),
         position_id=pos_id_by_post.get(r.post_id),
         company_id=company_id_by_local.get(r.local_code),
         begin_work_date=r.date_begin,
@@ -586,13 +586,13 @@ def _build_user_for_create(r: EmpRow, pos_id_by_post: Dict[int, int],
 
 
 def _apply_updates(u: "User", r: EmpRow, pos_id_by_post: Dict[int, int],
-                   company_id_by_local: Dict[str, int]) -> None:
+                   company_id_by_local: Dict[str, int], resolver: OrgResolver) -> None:
     u.table_number = r.tab_num
     u.last_name = r.last_name
     u.first_name = r.first_name
     u.father_name = r.middle_name
     u.birth_date = r.birth_date
-    u.status_id = get_condition_id(r.condition)
+    u.status_id = resolver.condition_id(r.condition)
     u.position_id = pos_id_by_post.get(r.post_id)
     u.company_id = company_id_by_local.get(r.local_code)
     u.begin_work_date = r.date_begin
@@ -619,18 +619,19 @@ def update_or_create_users():
 
     created = updated = failed = processed = 0
     chunk: List[EmpRow] = []
+    resolver = OrgResolver()
     try:
         for r in _stream_oracle_rows():
             chunk.append(r)
             if len(chunk) >= ORACLE_FETCH_CHUNK:
-                c, u, f = _flush_chunk(chunk)
+                c, u, f = _flush_chunk(chunk, resolver)
                 created += c
                 updated += u
                 failed += f
                 processed += len(chunk)
                 chunk.clear()
         if chunk:
-            c, u, f = _flush_chunk(chunk)
+            c, u, f = _flush_chunk(chunk, resolver)
             created += c
             updated += u
             failed += f
@@ -644,7 +645,7 @@ def update_or_create_users():
     return msg
 
 
-def _flush_chunk(rows: Sequence[EmpRow]) -> Tuple[int, int, int]:
+def _flush_chunk(rows: Sequence[EmpRow], resolver: OrgResolver) -> Tuple[int, int, int]:
     """
     Stage → map FKs → build creates/updates → bulk write.
     Returns (created, updated, failed) for this chunk.
@@ -666,12 +667,12 @@ def _flush_chunk(rows: Sequence[EmpRow]) -> Tuple[int, int, int]:
         try:
             if r.emp_id in users_by_emp:
                 u = users_by_emp[r.emp_id]
-                _apply_updates(u, r, pos_map, comp_map)
+                _apply_updates(u, r, pos_map, comp_map, resolver)
                 to_update.append(u)
             else:
                 base = r.phone or f"user_{r.emp_id}"
                 username = _unique_username(base, used_usernames, fallback=f"user_{r.emp_id}")
-                to_create.append(_build_user_for_create(r, pos_map, comp_map, username))
+                to_create.append(_build_user_for_create(r, pos_map, comp_map, username, resolver))
         except Exception as build_err:
             logging.error("Build user failed (emp_id=%s): %s", r.emp_id, build_err, exc_info=True)
             return (0, 0, 1)
@@ -796,6 +797,7 @@ def update_employee_department(emp_id=None):
     rows = cursor.fetchall()
     field_map = db_column_name(cursor)
     status_ids = user_search_status_ids()
+    resolver = OrgResolver()
 
     if rows:
         for row in rows:
@@ -804,7 +806,7 @@ def update_employee_department(emp_id=None):
 
             try:
                 user = User.objects.get(iabs_emp_id=emp_id, status_id__in=status_ids)
-                top_level_dept_id, sub_sub_dept_id = get_dept_ids(department_code, user.company_id)
+                top_level_dept_id, _, sub_sub_dept_id = resolver.dept_ids(department_code, user.company_id)
                 user.department_id = sub_sub_dept_id
                 user.top_level_department_id = top_level_dept_id
                 user.save()
@@ -816,6 +818,10 @@ def update_employee_department(emp_id=None):
             except User.DoesNotExist:
                 fail_count += 1
 
+            except Department.MultipleObjectsReturned as e:
+                logging.error(f'Skipping emp_id={emp_id}: {e}')
+                fail_count += 1
+
     cursor.close()
     conn.close()
 
@@ -861,19 +867,20 @@ def update_employees_department():
             return f'Error connecting to Oracle database {e}'
 
         field_map_cache: Dict[str, int] = {}
+        resolver = OrgResolver()
         batch: List[Tuple[int, str, int]] = []
 
         for pk, emp_id, company_id in qs.iterator(chunk_size=BATCH_SIZE):
             batch.append((pk, emp_id, company_id))
             if len(batch) >= BATCH_SIZE:
-                s, f = _process_emp_dept_batch(cursor, sql, field_map_cache, batch)
+                s, f = _process_emp_dept_batch(cursor, sql, field_map_cache, batch, resolver)
                 success_count += s
                 fail_count += f
                 batch.clear()
 
         # Flush any remaining users in the last batch
         if batch:
-            s, f = _process_emp_dept_batch(cursor, sql, field_map_cache, batch)
+            s, f = _process_emp_dept_batch(cursor, sql, field_map_cache, batch, resolver)
             success_count += s
             fail_count += f
             batch.clear()
@@ -919,19 +926,20 @@ def update_user_condition():
 
         # Cache of column name → index in the Oracle result set
         field_map_cache: Dict[str, int] = {}
+        resolver = OrgResolver()
         batch: List[Tuple] = []
 
         for pk, emp_id, pinfl, phone, username in qs.iterator(chunk_size=BATCH_SIZE):
             batch.append((pk, emp_id, pinfl, phone, username))
             if len(batch) >= BATCH_SIZE:
-                s, f = _process_user_condition_batch(cursor, sql, field_map_cache, batch)
+                s, f = _process_user_condition_batch(cursor, sql, field_map_cache, batch, resolver)
                 resigned += s
                 fail += f
                 batch.clear()
 
         # Flush any remaining users in the last batch
         if batch:
-            s, f = _process_user_condition_batch(cursor, sql, field_map_cache, batch)
+            s, f = _process_user_condition_batch(cursor, sql, field_map_cache, batch, resolver)
             resigned += s
             fail += f
             batch.clear()
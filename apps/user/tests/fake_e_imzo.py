@@ -0,0 +1,96 @@
+"""
+Local stand-in for the E-IMZO timestamp and verification services, for tests and benchmarks.
+
+`/timestamp` echoes the posted PKCS#7 as `pkcs7b64`; `/verify` answers with a signer
+certificate whose subject carries `pinfl`. Responses use HTTP/1.1 keep-alive, can be delayed
+with `latency`, and `fail_next` makes the next N requests answer 503.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeEImzoServer:
+
+    def __init__(self, pinfl='12345678901234', latency=0.0):
+        self.pinfl = pinfl
+        self.latency = latency
+        self.fail_next = 0
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._port = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                status, payload = fake._answer(self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            allow_reuse_address = True
+            request_queue_size = 128
+
+        self._server = Server(('127.0.0.1', self._port), Handler)
+        self._port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _answer(self, path, body):
+        with self._lock:
+            self.requests += 1
+            failing = self.fail_next > 0
+            self.fail_next -= 1 if failing else 0
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            return 503, {'message': 'Service Unavailable'}
+        if path == '/timestamp':
+            return 200, {'status': 1, 'pkcs7b64': body}
+        if path == '/verify':
+            return 200, {
+                'status': 1,
+                'pkcs7Info': {
+                    'signers': [{
+                        'signingTime': '2024-01-01 10:00:00',
+                        'certificate': [{
+                            'subjectName': f'CN=JOHN DOE,UID=123456789,1.2.860.3.16.1.2={self.pinfl}',
+                            'serialNumber': '7777aaaa',
+                            'validFrom': '2023-01-01',
+                            'validTo': '2025-01-01',
+                        }],
+                    }],
+                },
+            }
+        return 404, {'message': 'Not Found'}
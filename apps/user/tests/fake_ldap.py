@@ -0,0 +1,201 @@
+"""
+Minimal in-process LDAP server for exercising `apps.user.ldap_pool` without Active Directory.
+
+It speaks LDAPv3 over plain TCP and understands simple binds, equality/OR searches,
+WhoAmI (used by the pool's health check) and unbind. Every operation can be delayed
+with `latency`, and `stop()`/`start()` simulate the directory going down and coming back.
+"""
+import socket
+import socketserver
+import threading
+import time
+
+from ldap3.protocol import rfc4511
+from pyasn1.codec.ber import encoder
+
+SUCCESS = 0
+INVALID_CREDENTIALS = 49
+
+# BER tags of the requests the server understands
+BIND_REQUEST = 0x60
+UNBIND_REQUEST = 0x42
+SEARCH_REQUEST = 0x63
+EXTENDED_REQUEST = 0x77
+FILTER_AND = 0xa0
+FILTER_OR = 0xa1
+FILTER_EQUALITY = 0xa3
+
+
+def _read_tlv(data, pos=0):
+    """
+    Returns (tag, value, end) of the BER element at `pos`, or None if `data` is incomplete.
+    """
+    if len(data) < pos + 2:
+        return None
+    tag, length, pos = data[pos], data[pos + 1], pos + 2
+    if length & 0x80:
+        size = length & 0x7f
+        if len(data) < pos + size:
+            return None
+        length, pos = int.from_bytes(data[pos:pos + size], 'big'), pos + size
+    if len(data) < pos + length:
+        return None
+    return tag, data[pos:pos + length], pos + length
+
+
+def _children(value):
+    pos, children = 0, []
+    while pos < len(value):
+        tag, child, pos = _read_tlv(value, pos)
+        children.append((tag, child))
+    return children
+
+
+class FakeLDAPServer:
+
+    def __init__(self, users=None, service_account=('cn=service', 'service'), latency=0.0):
+        # {userPrincipalName: {'password': ..., 'postalCode': ...}}
+        self.users = users or {}
+        self.service_account = service_account
+        self.latency = latency
+        self.connections = 0
+        self.binds = 0
+        self.searches = 0
+        self._lock = threading.Lock()
+        self._sockets = set()
+        self._server = None
+        self._thread = None
+        self._port = 0
+
+    @property
+    def uri(self):
+        return f'ldap://127.0.0.1:{self._port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                fake._count('connections')
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake._sockets.add(self.request)
+                try:
+                    fake._serve(self.request)
+                finally:
+                    with fake._lock:
+                        fake._sockets.discard(self.request)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            # load tests open many connections at once
+            request_queue_size = 128
+
+        self._server = Server(('127.0.0.1', self._port), Handler)
+        self._server.daemon_threads = True
+        self._port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops listening and drops open connections, like a directory going down.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            sockets, self._sockets = self._sockets, set()
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _serve(self, sock):
+        buffer = b''
+        while self._server is not None:
+            try:
+                chunk = sock.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            while (element := _read_tlv(buffer)) is not None:
+                _, message, end = element
+                buffer = buffer[end:]
+                if self.latency:
+                    time.sleep(self.latency)
+                if not self._reply(sock, message):
+                    return
+
+    def _reply(self, sock, message):
+        (_, message_id), (operation, body) = _children(message)[:2]
+        message_id = int.from_bytes(message_id, 'big')
+
+        if operation == UNBIND_REQUEST:
+            return False
+        if operation == BIND_REQUEST:
+            self._count('binds')
+            _, (_, name), (_, password) = _children(body)[:3]
+            code = self._bind(name.decode(), password.decode())
+            self._send(sock, message_id, 'bindResponse', self._result(rfc4511.BindResponse(), code))
+        elif operation == SEARCH_REQUEST:
+            self._count('searches')
+            values = self._filter_values(*_children(body)[6])
+            for upn, user in self.users.items():
+                if upn in values or upn.split('@', 1)[0] in values:
+                    self._send(sock, message_id, 'searchResEntry', self._entry(upn, user))
+            self._send(sock, message_id, 'searchResDone', self._result(rfc4511.SearchResultDone(), SUCCESS))
+        elif operation == EXTENDED_REQUEST:
+            self._send(sock, message_id, 'extendedResp', self._result(rfc4511.ExtendedResponse(), SUCCESS))
+        return True
+
+    def _bind(self, name, password):
+        if (name, password) == self.service_account:
+            return SUCCESS
+        user = self.users.get(name)
+        if user is not None and user['password'] == password:
+            return SUCCESS
+        return INVALID_CREDENTIALS
+
+    def _filter_values(self, tag, value):
+        if tag in (FILTER_AND, FILTER_OR):
+            values = set()
+            for child in _children(value):
+                values |= self._filter_values(*child)
+            return values
+        if tag == FILTER_EQUALITY:
+            return {_children(value)[1][1].decode()}
+        return set()
+
+    @staticmethod
+    def _result(response, code):
+        response['resultCode'] = code
+        response['matchedDN'] = ''
+        response['diagnosticMessage'] = ''
+        return response
+
+    @staticmethod
+    def _entry(upn, user):
+        entry = rfc4511.SearchResultEntry()
+        entry['object'] = f'CN={upn}'
+        attribute = rfc4511.PartialAttribute()
+        attribute['type'] = 'postalCode'
+        attribute['vals'].append(user['postalCode'])
+        entry['attributes'].append(attribute)
+        return entry
+
+    @staticmethod
+    def _send(sock, message_id, name, response):
+        message = rfc4511.LDAPMessage()
+        message['messageID'] = message_id
+        message['protocolOp'][name] = response
+        sock.sendall(encoder.encode(message))
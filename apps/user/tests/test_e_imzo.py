@@ -0,0 +1,75 @@
+import time
+
+import pytest
+import requests
+from django.test import RequestFactory
+
+from apps.user import e_imzo_auth
+from apps.user.e_imzo_auth import AuthWithEDS
+from apps.user.tests.fake_e_imzo import FakeEImzoServer
+from utils.circuit_breaker import CircuitBreaker
+from utils.e_imzo import EImzoClient, SignatureServiceUnavailable, get_e_imzo_client, reset_e_imzo_client
+from utils.exception import ValidationError2
+
+
+@pytest.fixture
+def fake_e_imzo(monkeypatch):
+    server = FakeEImzoServer().start()
+    monkeypatch.setenv('TIMESTAMP_URL', f'{server.url}/timestamp')
+    monkeypatch.setenv('VERIFY_ATTACHED', f'{server.url}/verify')
+    reset_e_imzo_client()
+    yield server
+    reset_e_imzo_client()
+    server.stop()
+
+
+def test_calls_reuse_one_connection(fake_e_imzo):
+    request = RequestFactory().post('/')
+
+    for _ in range(20):
+        data = AuthWithEDS('pkcs7', request).verify_attached_pkcs7()
+
+    assert data['status'] == 1
+    assert fake_e_imzo.requests == 40
+    assert fake_e_imzo.connections == 1
+    stats = get_e_imzo_client().stats.snapshot()
+    assert stats['timestamp']['count'] == stats['verify']['count'] == 20
+    assert stats['verify']['errors'] == 0
+
+
+def test_unavailable_service_is_retried(fake_e_imzo):
+    fake_e_imzo.fail_next = 2
+
+    data = get_e_imzo_client().attach_timestamp('pkcs7', {})
+
+    assert data['pkcs7b64'] == 'pkcs7'
+    assert fake_e_imzo.requests == 3
+
+
+def test_read_timeout(fake_e_imzo):
+    fake_e_imzo.latency = 0.5
+    client = EImzoClient(read_timeout=0.1)
+
+    started = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.attach_timestamp('pkcs7', {})
+    assert time.perf_counter() - started < 0.4
+
+
+def test_breaker_fails_fast_while_service_is_down(fake_e_imzo, monkeypatch):
+    monkeypatch.setattr(e_imzo_auth, 'get_response_message', lambda request, code: {'code': code, 'message': '{e}'})
+    client = EImzoClient(retries=0, breaker=CircuitBreaker(threshold=2, reset_timeout=60))
+    monkeypatch.setattr(e_imzo_auth, 'get_e_imzo_client', lambda: client)
+    fake_e_imzo.stop()
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.attach_timestamp('pkcs7', {})
+    assert client.breaker.is_open
+
+    with pytest.raises(SignatureServiceUnavailable):
+        client.attach_timestamp('pkcs7', {})
+    with pytest.raises(ValidationError2) as e:
+        AuthWithEDS('pkcs7', RequestFactory().post('/')).attache_timestamp()
+    assert e.value.detail['code'] == 625
+    assert client.stats.snapshot()['timestamp']['errors'] == 2
@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connections
+
+from apps.user import ldap_auth
+from apps.user.ldap_pool import LDAPConnectionPool, LDAPUnavailable
+from apps.user.tests.fake_ldap import FakeLDAPServer
+from utils.circuit_breaker import CircuitBreaker
+from utils.exception import ValidationError2
+
+PINFL = '12345678901234'
+
+
+@pytest.fixture
+def fake_ldap(monkeypatch):
+    server = FakeLDAPServer(users={
+        'john@cbu.uz': {'password': 'secret', 'postalCode': PINFL},
+    }).start()
+    monkeypatch.setenv('LDAP_HOST', server.uri)
+    monkeypatch.setenv('LDAP_LOGIN', server.service_account[0])
+    monkeypatch.setenv('LDAP_PASSWORD', server.service_account[1])
+    ldap_auth.reset_pools()
+    yield server
+    ldap_auth.reset_pools()
+    server.stop()
+
+
+@pytest.fixture
+def ldap_user(user):
+    user.pinfl = PINFL
+    user.is_user_active = True
+    user.save()
+    return user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logins_reuse_pooled_connections(fake_ldap, ldap_user):
+    def _login(i):
+        try:
+            return ldap_auth.authenticate('john@cbu.uz', 'secret', None)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        users = list(executor.map(_login, range(100)))
+
+    assert {user.id for user in users} == {ldap_user.id}
+    assert fake_ldap.searches == 100
+    # bounded by the pool sizes, not by the number of logins
+    assert fake_ldap.connections <= ldap_auth.LDAP_BIND_POOL_SIZE + ldap_auth.LDAP_POOL_SIZE
+
+
+def test_invalid_credentials_keep_the_connection(fake_ldap, monkeypatch):
+    monkeypatch.setattr(ldap_auth, 'get_response_message', lambda request, code: {'code': code})
+
+    for _ in range(3):
+        with pytest.raises(ValidationError2) as e:
+            ldap_auth.authenticate('john@cbu.uz', 'wrong', None)
+        assert e.value.detail['code'] == 701
+
+    assert fake_ldap.connections == 1
+    assert not ldap_auth._breaker.is_open
+
+
+def test_breaker_fails_fast_while_directory_is_down():
+    server = FakeLDAPServer().start()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.2)
+    pool = LDAPConnectionPool(server.uri, size=2, breaker=breaker, bind_dn='cn=service', password='service',
+                              timeout=1)
+    with pool.connection() as conn:
+        conn.whoami_s()
+
+    server.stop()
+    for _ in range(2):
+        with pytest.raises(LDAPUnavailable):
+            with pool.connection() as conn:
+                conn.whoami_s()
+    assert breaker.is_open
+
+    started = time.perf_counter()
+    with pytest.raises(LDAPUnavailable):
+        with pool.connection():
+            pass
+    assert time.perf_counter() - started < 0.05
+
+    server.start()
+    time.sleep(0.25)
+    with pool.connection() as conn:
+        conn.whoami_s()
+    assert not breaker.is_open
+
+    pool.close()
+    server.stop()
+
+
+def test_breaker_lets_a_single_trial_through():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.failure()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.failure()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.allow()
+    assert not breaker.is_open
+
+
+def test_trial_that_waits_for_a_slot_in_vain_lets_the_next_call_try():
+    server = FakeLDAPServer().start()
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    pool = LDAPConnectionPool(server.uri, size=1, breaker=breaker, bind_dn='cn=service', password='service',
+                              timeout=1, wait=0.05)
+    breaker.failure()
+
+    pool._slots.acquire()
+    with pytest.raises(LDAPUnavailable, match='No free LDAP connection'):
+        with pool.connection():
+            pass
+    pool._slots.release()
+
+    with pool.connection() as conn:
+        conn.whoami_s()
+    assert not breaker.is_open
+
+    pool.close()
+    server.stop()
+
+
+def test_failed_service_bind_counts_as_a_failure():
+    server = FakeLDAPServer().start()
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    pool = LDAPConnectionPool(server.uri, size=1, breaker=breaker, bind_dn='cn=service', password='wrong',
+                              timeout=1)
+
+    with pytest.raises(LDAPUnavailable):
+        with pool.connection():
+            pass
+    assert breaker.is_open
+    # the trial has reported, so another one is let through
+    assert breaker.allow()
+
+    pool.close()
+    server.stop()
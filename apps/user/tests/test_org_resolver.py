@@ -0,0 +1,83 @@
+import pytest
+
+from apps.company.models import Department
+from apps.user.batch_process import _process_emp_dept_batch
+from apps.user.models import UserStatus
+from apps.user.services import OrgResolver, get_dept_ids
+
+
+def _tree(company):
+    top = Department.objects.create(name='Top', code='100', company=company)
+    sub = Department.objects.create(name='Sub', code='110', company=company, parent=top)
+    sub_sub = Department.objects.create(name='Sub sub', code='111', company=company, parent=sub)
+    return top, sub, sub_sub
+
+
+def test_resolver_matches_per_row_lookups(company):
+    top, sub, sub_sub = _tree(company)
+    resolver = OrgResolver()
+
+    assert resolver.dept_ids('111', company.id) == (top.id, sub.id, sub_sub.id)
+    assert resolver.dept_ids('110', company.id) == (top.id, top.id, sub.id)
+    assert resolver.dept_ids('100', company.id) == (top.id, None, top.id)
+    assert resolver.dept_ids('999', company.id) == (None, None, None)
+    for code in ('100', '110', '111'):
+        top_level_id, _, dept_id = resolver.dept_ids(code, company.id)
+        assert (top_level_id, dept_id) == get_dept_ids(code, company.id)
+    assert resolver.top_level_department_id('111', company.id) == top.id
+    assert resolver.chain(sub_sub.id) == [top.id, sub.id, sub_sub.id]
+
+
+def test_resolver_loads_each_map_once(company, user_status, django_assert_num_queries):
+    top, sub, sub_sub = _tree(company)
+    UserStatus.objects.create(name='Vacation', code='O')
+    resolver = OrgResolver()
+
+    with django_assert_num_queries(2):
+        resolved = resolver.resolve_departments([(code, company.id) for code in ('100', '111', '111', '404')] * 100)
+        conditions = [resolver.condition_id(code) for code in ('O', 'X') * 100]
+
+    assert resolved == {
+        ('100', company.id): (top.id, None, top.id),
+        ('111', company.id): (top.id, sub.id, sub_sub.id),
+        ('404', company.id): (None, None, None),
+    }
+    assert set(conditions) == {UserStatus.objects.get(code='O').id, None}
+
+
+class _OracleCursor:
+    """
+    Answers the department sync's per-employee query from {emp_id: department_code}.
+    """
+    description = [('EMP_ID',), ('DEPARTMENT_CODE',)]
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.row = None
+
+    def execute(self, sql, params):
+        self.row = (params[0], self.codes[params[0]])
+
+    def fetchone(self):
+        return self.row
+
+
+def test_duplicated_department_code_is_skipped_by_the_sync(company, user, user2):
+    top, sub, sub_sub = _tree(company)
+    Department.objects.create(name='Copy', code='111', company=company, parent=sub)
+    Department.objects.create(name='Other', code='120', company=company, parent=top)
+    user.department, user.top_level_department = top, top
+    user.save()
+    resolver = OrgResolver()
+
+    with pytest.raises(Department.MultipleObjectsReturned):
+        resolver.dept_ids('111', company.id)
+
+    cursor = _OracleCursor({'1': '111', '2': '120'})
+    batch = [(user.id, '1', company.id), (user2.id, '2', company.id)]
+    assert _process_emp_dept_batch(cursor, 'sql', {}, batch, resolver) == (1, 1)
+
+    user.refresh_from_db()
+    user2.refresh_from_db()
+    assert (user.department_id, user.top_level_department_id) == (top.id, top.id)
+    assert user2.department.code == '120'
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+
+from apps.user.models import ProjectPermission, RoleModel
+from apps.user.permission_set import PERMISSION_SET_VERSION_KEY, get_permission_set
+from apps.user.principal import PRINCIPAL_VERSION_KEY
+
+
+def _permission(method, url_name):
+    return ProjectPermission.objects.create(name=url_name, method=method, url_name=url_name)
+
+
+def test_permission_set_combines_roles_and_direct_permissions(user, django_capture_on_commit_callbacks):
+    role = RoleModel.objects.create(name='Role')
+    role.permissions.add(_permission('GET', 'compose-list'))
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.add(role)
+        user.permissions.add(_permission('POST', 'compose-list'))
+
+    assert get_permission_set(user.id) == {('GET', 'compose-list'), ('POST', 'compose-list')}
+    assert user.has_permission('GET', 'compose-list')
+    assert not user.has_permission('DELETE', 'compose-list')
+
+
+def test_permission_set_is_cached(user, django_assert_num_queries):
+    get_permission_set(user.id)
+
+    with django_assert_num_queries(0):
+        assert user.has_permission('GET', 'compose-list') is False
+
+
+def test_permission_set_is_invalidated_on_role_permission_change(user, django_capture_on_commit_callbacks):
+    role = RoleModel.objects.create(name='Role')
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.add(role)
+    assert not user.has_permission('GET', 'signers-list')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        role.permissions.add(_permission('GET', 'signers-list'))
+
+    assert user.has_permission('GET', 'signers-list')
+
+
+def test_permission_set_is_invalidated_on_user_role_change(user, django_capture_on_commit_callbacks):
+    role = RoleModel.objects.create(name='Role')
+    role.permissions.add(_permission('GET', 'signers-list'))
+    assert not user.has_permission('GET', 'signers-list')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.add(role)
+    assert user.has_permission('GET', 'signers-list')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.remove(role)
+    assert not user.has_permission('GET', 'signers-list')
+
+
+def test_permission_set_is_reloaded_after_version_stamps_are_lost(user, django_capture_on_commit_callbacks):
+    role = RoleModel.objects.create(name='Role')
+    role.permissions.add(_permission('GET', 'signers-list'))
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.add(role)
+    assert user.has_permission('GET', 'signers-list')
+
+    # the revocation's version bump is lost together with the stamps, as after a Redis flush
+    role.permissions.clear()
+    cache.delete_many([PERMISSION_SET_VERSION_KEY, PRINCIPAL_VERSION_KEY.format(user.id)])
+
+    assert not user.has_permission('GET', 'signers-list')
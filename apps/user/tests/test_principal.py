@@ -0,0 +1,81 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.user.models import RoleModel
+from apps.user.principal import get_user_principal
+from config.middlewares.request_with_token import JWTAuthenticationMiddleware
+
+
+def test_principal_fields(user):
+    principal = get_user_principal(user.id)
+
+    assert principal.id == user.id
+    assert principal.username == user.username
+    assert principal.is_authenticated
+    assert principal.role_ids == ()
+    # fields outside the principal are loaded from the user row
+    assert principal.full_name == user.full_name
+
+
+def test_principal_is_invalidated_on_role_change(user, django_capture_on_commit_callbacks):
+    get_user_principal(user.id)
+    role = RoleModel.objects.create(name='Role')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.roles.add(role)
+
+    assert get_user_principal(user.id).role_ids == (role.id,)
+
+
+def test_principal_is_invalidated_on_user_save(user, django_capture_on_commit_callbacks):
+    get_user_principal(user.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+
+    assert get_user_principal(user.id).is_active is False
+
+
+def test_unknown_user_has_no_principal():
+    assert get_user_principal(0) is None
+
+
+def _token_request(user):
+    return RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+
+def test_middleware_resolves_the_token_without_queries(user, django_assert_num_queries):
+    request = _token_request(user)
+    middleware = JWTAuthenticationMiddleware(lambda r: HttpResponse())
+    get_user_principal(user.id)
+
+    with django_assert_num_queries(0):
+        middleware(request)
+
+    assert request.user.id == user.id
+    assert request.user.is_registered
+
+
+def test_middleware_rejects_disabled_users(user, django_capture_on_commit_callbacks):
+    request = _token_request(user)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_user_active = False
+        user.save()
+
+    with pytest.raises(AuthenticationFailed, match='disabled'):
+        JWTAuthenticationMiddleware(None).authenticate(request)
+
+
+def test_middleware_rejects_tokens_issued_before_a_password_change(user, django_capture_on_commit_callbacks):
+    request = _token_request(user)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.set_password('changed')
+        user.password_update_time += 1
+        user.save()
+
+    with pytest.raises(AuthenticationFailed, match='Password has been changed'):
+        JWTAuthenticationMiddleware(None).authenticate(request)
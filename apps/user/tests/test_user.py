@@ -1,5 +1,9 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from apps.user.models import User
+
 
 def test_user_registered_or_not(api_client, user, error_messages):
     url = '/api/v1/login/'
@@ -55,6 +59,25 @@ def test_user_with_valid_credentials(api_client, user):
     assert response.status_code == status.HTTP_200_OK
 
 
+def test_login_stamps_only_last_login(api_client, user):
+    user.is_registered = True
+    user.save()
+    data = {
+        'username': 'test',
+        'password': 'test2023'
+    }
+    with CaptureQueriesContext(connection) as ctx:
+        response = api_client.post('/api/v1/login/', data, format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {'access', 'refresh', 'expires_in'} <= set(response.data)
+    writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+    assert len(writes) == 1
+    assert writes[0].startswith(f'UPDATE "{User._meta.db_table}" SET "last_login" = ')
+    user.refresh_from_db()
+    assert user.last_login is not None
+
+
 # def test_create_user(api_client, admin_token, company, top_level_department, position, error_messages):
 #     url = '/api/v1/users/'
 #     data = {
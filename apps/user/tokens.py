@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def issue_tokens(user) -> dict:
+    """
+    Signs a refresh/access pair for an authenticated user and stamps `last_login`.
+    Only the `last_login` column is written, with a single UPDATE: no full row save,
+    no `before_save` and no User post_save signals on the login path.
+    """
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    data = {
+        'access': str(access),
+        'refresh': str(refresh),
+        'expires_in': str(datetime.fromtimestamp(access.payload['exp'])),
+    }
+    user.last_login = timezone.now()
+    type(user)._default_manager.filter(pk=user.pk).update(last_login=user.last_login)
+    return data
@@ -18,8 +18,8 @@ class CalendarModelAdmin(admin.ModelAdmin):
 
 @admin.register(CalendarParticipant)
 class CalendarParticipantAdmin(admin.ModelAdmin):
-    list_display = ('user', 'calendar', 'is_informed', 'is_accepted', 'created_by', 'created_date')
-    list_filter = ('is_informed', 'is_accepted', 'created_date')
+    list_display = ('user', 'calendar', 'is_informed', 'is_accepted', 'sms_status', 'created_by', 'created_date')
+    list_filter = ('is_informed', 'is_accepted', 'sms_status', 'created_date')
     date_hierarchy = 'created_date'
     autocomplete_fields = ('user',)
     search_fields = ('calendar__title', 'user__first_name', 'user__last_name')
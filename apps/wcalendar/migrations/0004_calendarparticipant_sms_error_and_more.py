@@ -0,0 +1,28 @@
+# Generated by Django 4.2.2 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wcalendar', '0003_calendarmodel_status_alter_calendarmodel_organizer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarparticipant',
+            name='sms_error',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarparticipant',
+            name='sms_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarparticipant',
+            name='sms_status',
+            field=models.CharField(blank=True, choices=[('pending', 'pending'), ('sent', 'sent'), ('failed', 'failed')], default=None, max_length=20, null=True),
+        ),
+    ]
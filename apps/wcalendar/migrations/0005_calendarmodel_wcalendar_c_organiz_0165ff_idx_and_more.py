@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-19 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wcalendar', '0004_calendarparticipant_sms_error_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarmodel',
+            index=models.Index(fields=['organizer', 'start_date'], name='wcalendar_c_organiz_0165ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarmodel',
+            index=models.Index(fields=['created_by', 'start_date'], name='wcalendar_c_created_81c81a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarparticipant',
+            index=models.Index(fields=['user', 'calendar'], name='wcalendar_c_user_id_2bcf06_idx'),
+        ),
+    ]
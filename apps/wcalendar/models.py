@@ -32,6 +32,12 @@ class CalendarModel(BaseModel):
         default=CONSTANTS.CALENDAR_STATUS.DEFAULT
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['organizer', 'start_date']),
+            models.Index(fields=['created_by', 'start_date']),
+        ]
+
     def __str__(self):
         return '{}'.format(self.title)
 
@@ -41,6 +47,20 @@ class CalendarParticipant(BaseModel):
     user = models.ForeignKey("user.User", on_delete=models.SET_NULL, null=True, blank=True)
     is_informed = models.BooleanField(default=False)
     is_accepted = models.BooleanField(null=True, blank=True)
+    sms_status = models.CharField(
+        max_length=20,
+        null=True,
+        blank=True,
+        choices=CONSTANTS.SMS_STATUS.CHOICES,
+        default=CONSTANTS.SMS_STATUS.DEFAULT
+    )
+    sms_sent_at = models.DateTimeField(null=True, blank=True)
+    sms_error = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'calendar']),
+        ]
 
     def __str__(self):
         return '{}'.format(self.user.full_name)
@@ -1,11 +1,14 @@
+from django.db import transaction
 from rest_framework import serializers
 
 from apps.document.models import File
 from apps.document.serializers import FileSerializer
 from apps.wcalendar.models import CalendarModel, CalendarParticipant
+from apps.wcalendar.services import create_participants, sync_participants, WINDOW_PERIODS
+from apps.wcalendar.tasks import notify_calendar_participants_by_sms
+from utils.constants import CONSTANTS
 from utils.exception import get_response_message, ValidationError2
 from utils.serializer import SelectItemField, serialize_m2m
-from utils.tools import send_sms_to_phone
 
 
 class CalendarParticipantSerializer(serializers.ModelSerializer):
@@ -18,7 +21,8 @@ class CalendarParticipantSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CalendarParticipant
-        fields = ['id', 'user', 'is_informed', 'is_accepted']
+        fields = ['id', 'user', 'is_informed', 'is_accepted', 'sms_status']
+        read_only_fields = ['sms_status']
 
 
 class CalendarModelSerializer(serializers.ModelSerializer):
@@ -75,13 +79,15 @@ class CalendarModelSerializer(serializers.ModelSerializer):
 
         return attrs
 
-    def notify_participants_by_sms(self, phones: list, text: str):
+    def notify_participants_by_sms(self, calendar, participant_ids: list):
         """
-        Notify participants by sms about the event
+        Notify participants by sms about the event in a background task
         """
-        for phone in phones:
-            # send sms
-            send_sms_to_phone(phone, text)
+
+        def _send():
+            notify_calendar_participants_by_sms.delay(calendar.id, participant_ids)
+
+        transaction.on_commit(_send)
 
     def create(self, validated_data):
         participants = validated_data.pop('participants', [])
@@ -90,18 +96,10 @@ class CalendarModelSerializer(serializers.ModelSerializer):
         calendar = CalendarModel.objects.create(**validated_data)
 
         serialize_m2m('create', File, 'attachments', attachments, calendar)
-        user_phones = []
-
-        for participant in participants:
-            CalendarParticipant.objects.create(calendar=calendar, **participant)
-            user_phones.append(participant['user'].phone)
+        created = create_participants(calendar, participants, notify_by)
 
-        start_date = calendar.start_date.strftime('%d-%m-%Y %H:%M')
-        end_date = calendar.end_date.strftime('%d-%m-%Y %H:%M') if calendar.end_date else "Noma'lum"
-
-        if notify_by == 'sms':
-            text = f"Salom! Sizda {start_date} sanasida {calendar.source} orqali tadbiringiz bor. Tugash vaqti: {end_date}"
-            self.notify_participants_by_sms(user_phones, text)
+        if notify_by == CONSTANTS.NOTIFY_BY.SMS and created:
+            self.notify_participants_by_sms(calendar, [p.id for p in created])
 
         return calendar
 
@@ -118,18 +116,9 @@ class CalendarModelSerializer(serializers.ModelSerializer):
         return calendar
 
     def update_participants(self, participants: list):
-        participant_items = dict((i.id, i) for i in self.instance.participants.all())
-
-        for item in participants:
-            if 'id' in item:
-                # if exists id pop from the dict and update
-                participant_by_item = participant_items.pop(item['id'])
-                participant_by_item.is_informed = item.get('is_informed', False)
-                participant_by_item.is_accepted = item.get('is_accepted', None)
-                participant_by_item.save()
-            else:
-                CalendarParticipant.objects.create(calendar=self.instance, **item)
-
-        if len(participant_items) > 0:
-            for item in participant_items.values():
-                item.delete()
+        sync_participants(self.instance, participants)
+
+
+class CalendarWindowSerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=WINDOW_PERIODS, default='month')
+    date = serializers.DateField(required=False)
@@ -0,0 +1,130 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.wcalendar.models import CalendarModel, CalendarParticipant
+from config.middlewares.current_user import get_current_user_id
+from utils.constants import CONSTANTS
+
+PARTICIPANT_BATCH_SIZE = 500
+WINDOW_PERIODS = ('day', 'week', 'month')
+
+
+def visible_calendars(user_id, queryset=None):
+    """
+    Calendars the user organizes, created or participates in.
+    Participation is checked with a correlated EXISTS on (user, calendar)
+    instead of a join, so no DISTINCT is needed over the joined rows.
+    """
+    queryset = CalendarModel.objects.all() if queryset is None else queryset
+    is_participant = CalendarParticipant.objects.filter(calendar_id=OuterRef('pk'), user_id=user_id)
+    return queryset.filter(Q(organizer_id=user_id) | Q(created_by_id=user_id) | Exists(is_participant))
+
+
+def get_window_bounds(period: str, day: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Returns the [start, end) datetimes of the day/week/month containing `day`
+    in the current timezone. Weeks start on Monday.
+    """
+    if period == 'day':
+        start = day
+        end = day + datetime.timedelta(days=1)
+    elif period == 'week':
+        start = day - datetime.timedelta(days=day.weekday())
+        end = start + datetime.timedelta(days=7)
+    elif period == 'month':
+        start = day.replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f'Unknown period: {period}')
+
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.datetime.combine(start, datetime.time.min), tz),
+            timezone.make_aware(datetime.datetime.combine(end, datetime.time.min), tz))
+
+
+def filter_by_window(queryset, window_start, window_end):
+    """
+    Calendars that overlap [window_start, window_end). Events without
+    an end date are treated as instant events at their start date.
+    """
+    return queryset.filter(
+        Q(end_date__gte=window_start) | Q(end_date__isnull=True, start_date__gte=window_start),
+        start_date__lt=window_end,
+    )
+
+
+def build_event_sms_text(calendar) -> str:
+    start_date = timezone.localtime(calendar.start_date).strftime('%d-%m-%Y %H:%M')
+    end_date = timezone.localtime(calendar.end_date).strftime('%d-%m-%Y %H:%M') if calendar.end_date else "Noma'lum"
+    return f"Salom! Sizda {start_date} sanasida {calendar.source} orqali tadbiringiz bor. Tugash vaqti: {end_date}"
+
+
+def _new_participant(calendar, item: dict, user_id, sms_status) -> CalendarParticipant:
+    item = {k: v for k, v in item.items() if k != 'id'}
+    return CalendarParticipant(
+        calendar=calendar,
+        created_by_id=user_id,
+        modified_by_id=user_id,
+        sms_status=sms_status,
+        **item
+    )
+
+
+def create_participants(calendar, participants: list, notify_by=None) -> list[CalendarParticipant]:
+    """
+    Insert all participants of a calendar event with a single bulk INSERT.
+    When the event is notified by sms the rows start in the `pending` sms state.
+    """
+    if not participants:
+        return []
+
+    user_id = get_current_user_id()
+    sms_status = CONSTANTS.SMS_STATUS.PENDING if notify_by == CONSTANTS.NOTIFY_BY.SMS else None
+    objs = [_new_participant(calendar, item, user_id, sms_status) for item in participants]
+    return CalendarParticipant.objects.bulk_create(objs, batch_size=PARTICIPANT_BATCH_SIZE)
+
+
+def sync_participants(calendar, participants: list, notify_by=None) -> list[CalendarParticipant]:
+    """
+    Make the participants of a calendar match the given payload:
+    items with an `id` are updated with one bulk UPDATE, items without an `id`
+    are inserted with one bulk INSERT and the remaining rows are removed
+    with a single DELETE ... WHERE id IN (...).
+
+    Returns the newly created participants.
+    """
+    existing = {p.id: p for p in CalendarParticipant.objects.filter(calendar=calendar)}
+    user_id = get_current_user_id()
+    now = timezone.now()
+    sms_status = CONSTANTS.SMS_STATUS.PENDING if notify_by == CONSTANTS.NOTIFY_BY.SMS else None
+
+    to_update, to_create = [], []
+    for item in participants:
+        participant = existing.pop(item['id'], None) if item.get('id') else None
+        if participant is None:
+            to_create.append(_new_participant(calendar, item, user_id, sms_status))
+            continue
+
+        participant.is_informed = item.get('is_informed', False)
+        participant.is_accepted = item.get('is_accepted', None)
+        participant.modified_by_id = user_id
+        participant.modified_date = now
+        to_update.append(participant)
+
+    with transaction.atomic():
+        if to_update:
+            CalendarParticipant.objects.bulk_update(
+                to_update,
+                ['is_informed', 'is_accepted', 'modified_by', 'modified_date'],
+                batch_size=PARTICIPANT_BATCH_SIZE
+            )
+        created = []
+        if to_create:
+            created = CalendarParticipant.objects.bulk_create(to_create, batch_size=PARTICIPANT_BATCH_SIZE)
+        if existing:
+            CalendarParticipant.objects.filter(id__in=list(existing.keys())).delete()
+
+    return created
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils import timezone
+
+from apps.wcalendar.models import CalendarModel, CalendarParticipant
+from apps.wcalendar.services import build_event_sms_text
+from config.celery import app
+from utils.constants import CONSTANTS
+from utils.tools import send_sms_to_phone
+
+SMS_BATCH_SIZE = 100
+SMS_MAX_WORKERS = 8
+SMS_PER_SECOND = int(os.getenv('SMS_PER_SECOND', 50))
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces out calls to at most `per_second` per second.
+    """
+
+    def __init__(self, per_second: int):
+        self.interval = 1.0 / per_second if per_second else 0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+@app.task(max_retries=1, name='notify_calendar_participants_by_sms')
+def notify_calendar_participants_by_sms(calendar_id, participant_ids=None):
+    """
+    Splits the pending sms recipients of a calendar event into batches
+    and schedules one `send_calendar_sms_batch` task per batch.
+    """
+    calendar = CalendarModel.objects.filter(id=calendar_id).only('start_date', 'end_date', 'source').first()
+    if not calendar:
+        return 0
+
+    qs = CalendarParticipant.objects.filter(calendar_id=calendar_id, sms_status=CONSTANTS.SMS_STATUS.PENDING)
+    if participant_ids is not None:
+        qs = qs.filter(id__in=participant_ids)
+    ids = list(qs.order_by('id').values_list('id', flat=True))
+
+    text = build_event_sms_text(calendar)
+    for i in range(0, len(ids), SMS_BATCH_SIZE):
+        send_calendar_sms_batch.delay(ids[i:i + SMS_BATCH_SIZE], text)
+
+    return len(ids)
+
+
+@app.task(max_retries=1, name='send_calendar_sms_batch')
+def send_calendar_sms_batch(participant_ids: list, text: str):
+    """
+    Sends the sms to a batch of participants concurrently (bounded by
+    SMS_MAX_WORKERS and SMS_PER_SECOND) and stores the delivery status
+    of every recipient with a single bulk UPDATE.
+    """
+    participants = list(
+        CalendarParticipant.objects
+        .filter(id__in=participant_ids, sms_status=CONSTANTS.SMS_STATUS.PENDING)
+        .select_related('user')
+        .only('id', 'user', 'sms_status', 'sms_sent_at', 'sms_error', 'user__phone')
+    )
+    limiter = RateLimiter(SMS_PER_SECOND)
+
+    def _send(participant):
+        phone = participant.user.phone if participant.user else None
+        if not phone:
+            return participant, False, 'Phone number is missing'
+        limiter.wait()
+        try:
+            is_ok, res = send_sms_to_phone(phone, text)
+        except Exception as e:
+            is_ok, res = False, str(e)
+        return participant, is_ok, None if is_ok else str(res)
+
+    with ThreadPoolExecutor(max_workers=SMS_MAX_WORKERS) as executor:
+        results = list(executor.map(_send, participants))
+
+    now = timezone.now()
+    sent = 0
+    for participant, is_ok, error in results:
+        if is_ok:
+            sent += 1
+            participant.sms_status = CONSTANTS.SMS_STATUS.SENT
+            participant.sms_sent_at = now
+            participant.sms_error = None
+        else:
+            participant.sms_status = CONSTANTS.SMS_STATUS.FAILED
+            participant.sms_error = (error or '')[:255]
+
+    CalendarParticipant.objects.bulk_update(participants, ['sms_status', 'sms_sent_at', 'sms_error'])
+
+    failed = len(participants) - sent
+    if failed:
+        logging.info(f"Calendar sms batch: {sent} sent, {failed} failed")
+    return {'sent': sent, 'failed': failed}
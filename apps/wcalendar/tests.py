@@ -1,3 +1,79 @@
-from django.test import TestCase
+import datetime
+import json
 
-# Create your tests here.
+from django.db import connection
+from django.utils import timezone
+
+from apps.wcalendar.models import CalendarModel, CalendarParticipant
+from apps.wcalendar.services import visible_calendars, get_window_bounds, filter_by_window
+
+
+def _node_types(plan):
+    yield plan['Node Type']
+    for child in plan.get('Plans', []):
+        yield from _node_types(child)
+
+
+def _index_columns(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [c['columns'] for c in constraints.values() if c['index']]
+
+
+def _calendars(user, user2):
+    now = timezone.now()
+    organized = CalendarModel.objects.create(title='organized', organizer=user, start_date=now)
+    invited = CalendarModel.objects.create(title='invited', organizer=user2, start_date=now)
+    hidden = CalendarModel.objects.create(title='hidden', organizer=user2, start_date=now)
+    CalendarParticipant.objects.create(calendar=invited, user=user)
+    CalendarParticipant.objects.create(calendar=organized, user=user2)
+    CalendarParticipant.objects.create(calendar=hidden, user=user2)
+    return organized, invited, hidden
+
+
+def test_visible_calendars(user, user2):
+    organized, invited, hidden = _calendars(user, user2)
+
+    ids = list(visible_calendars(user.id).values_list('id', flat=True))
+
+    assert sorted(ids) == sorted([organized.id, invited.id])
+
+
+def test_visible_calendars_query_plan(user, user2):
+    _calendars(user, user2)
+    queryset = visible_calendars(user.id).order_by('created_date')
+
+    sql = str(queryset.query).upper()
+    assert 'DISTINCT' not in sql
+    assert 'EXISTS' in sql
+
+    plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+    nodes = set(_node_types(plan))
+    assert 'Unique' not in nodes
+    assert 'HashAggregate' not in nodes
+
+
+def test_visibility_indexes():
+    assert ['user_id', 'calendar_id'] in _index_columns(CalendarParticipant._meta.db_table)
+    assert ['organizer_id', 'start_date'] in _index_columns(CalendarModel._meta.db_table)
+
+
+def test_window_bounds():
+    start, end = get_window_bounds('month', datetime.date(2024, 2, 10))
+    assert (start.date(), end.date()) == (datetime.date(2024, 2, 1), datetime.date(2024, 3, 1))
+
+    start, end = get_window_bounds('week', datetime.date(2024, 2, 10))
+    assert (start.date(), end.date()) == (datetime.date(2024, 2, 5), datetime.date(2024, 2, 12))
+
+
+def test_filter_by_window(user):
+    start, end = get_window_bounds('month', datetime.date(2024, 2, 10))
+    inside = CalendarModel.objects.create(organizer=user, start_date=start + datetime.timedelta(days=3))
+    spanning = CalendarModel.objects.create(organizer=user, start_date=start - datetime.timedelta(days=3),
+                                            end_date=start + datetime.timedelta(days=1))
+    CalendarModel.objects.create(organizer=user, start_date=end)
+    CalendarModel.objects.create(organizer=user, start_date=start - datetime.timedelta(days=1))
+
+    ids = filter_by_window(CalendarModel.objects.all(), start, end).values_list('id', flat=True)
+
+    assert sorted(ids) == sorted([inside.id, spanning.id])
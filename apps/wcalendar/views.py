@@ -1,9 +1,12 @@
-from django.db.models import Q
+from django.utils import timezone
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from apps.wcalendar.filters import CalendarModelFilter
 from apps.wcalendar.models import CalendarModel
-from apps.wcalendar.serializers import CalendarModelSerializer
+from apps.wcalendar.serializers import CalendarModelSerializer, CalendarWindowSerializer
+from apps.wcalendar.services import visible_calendars, get_window_bounds, filter_by_window
 from config.middlewares.current_user import get_current_user_id
 
 
@@ -15,5 +18,24 @@ class CalendarModelViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
         user_id = get_current_user_id()
-        can_see = Q(organizer_id=user_id) | Q(participants__user_id=user_id) | Q(created_by_id=user_id)
-        return queryset.filter(can_see).distinct().order_by('created_date')
+        return visible_calendars(user_id, queryset).order_by('created_date')
+
+    @action(detail=False, methods=['get'], url_path='window')
+    def window(self, request):
+        """
+        GET /calendar/window/?period=month&date=2024-10-01
+        Returns every visible event overlapping the day/week/month
+        that contains `date` (today by default), ordered by start date.
+        """
+        params = CalendarWindowSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        period = params.validated_data['period']
+        day = params.validated_data.get('date') or timezone.localdate()
+        window_start, window_end = get_window_bounds(period, day)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = (filter_by_window(queryset, window_start, window_end)
+                    .prefetch_related('participants__user', 'attachments')
+                    .order_by('start_date', 'id'))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
@@ -6,6 +6,7 @@ from apps.wchat.models import (
     ChatMessage,
     ChatMessageReaction,
     ChatMessageFile,
+    ChatFileCount,
     MessageReceiver,
 )
 
@@ -105,3 +106,10 @@ class MessageReceiverAdmin(admin.ModelAdmin):
     list_filter = ['read', 'delivered']
     date_hierarchy = 'delivered'
     readonly_fields = ['receiver', 'message', 'delivered', 'read', 're_read']
+
+
+@admin.register(ChatFileCount)
+class ChatFileCountAdmin(admin.ModelAdmin):
+    list_display = ['chat', 'type', 'count']
+    readonly_fields = ['chat', 'type', 'count']
+    list_filter = ['type']
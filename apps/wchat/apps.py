@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WchatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.wchat'
+
+    def ready(self):
+        import apps.wchat.signals
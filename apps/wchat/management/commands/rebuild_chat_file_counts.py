@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.wchat.services import rebuild_file_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-(chat, file type) message counters from wchat_chatmessage."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chat", type=int, action="append", dest="chats",
+                            help="Chat id to rebuild; repeat for several. Defaults to all chats.")
+
+    def handle(self, *args, **opts):
+        rows = rebuild_file_counts(opts.get("chats"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} chat file counters."))
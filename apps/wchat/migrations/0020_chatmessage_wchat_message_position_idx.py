@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wchat', '0019_remove_chatmessagefile_duration_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['chat', 'created_date', 'id'], name='wchat_message_position_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0081_user_user_first_name_trgm_idx_and_more'),
+        ('wchat', '0020_chatmessage_wchat_message_position_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='wchat_chat_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('text', config='simple'), condition=models.Q(('deleted', False)), name='wchat_message_text_fts_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.2 on 2026-10-19 07:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wchat', '0021_chat_wchat_chat_title_trgm_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatFileCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('text', 'Text'), ('file', 'File'), ('image', 'Image'), ('video', 'Video'), ('audio', 'Audio'), ('link', 'Link'), ('voice', 'Voice')], max_length=30)),
+                ('count', models.IntegerField(default=0)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='file_counts', to='wchat.chat')),
+            ],
+            options={
+                'unique_together': {('chat', 'type')},
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO wchat_chatfilecount (chat_id, type, count)
+                SELECT chat_id, type, count(*)
+                FROM wchat_chatmessage
+                WHERE deleted = FALSE
+                  AND chat_id IS NOT NULL
+                  AND type IN ('file', 'image', 'video', 'audio', 'link', 'voice')
+                GROUP BY chat_id, type
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
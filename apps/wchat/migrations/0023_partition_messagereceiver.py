@@ -0,0 +1,84 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+PARTITIONS = 16
+
+INDEXES_SQL = """
+CREATE INDEX wchat_messagereceiver_message_id_idx ON wchat_messagereceiver (message_id);
+CREATE INDEX wchat_messagereceiver_receiver_id_idx ON wchat_messagereceiver (receiver_id);
+CREATE INDEX wchat_messagereceiver_created_by_id_idx ON wchat_messagereceiver (created_by_id);
+CREATE INDEX wchat_messagereceiver_modified_by_id_idx ON wchat_messagereceiver (modified_by_id);
+
+ALTER TABLE wchat_messagereceiver
+    ADD CONSTRAINT wchat_messagereceiver_message_id_fk FOREIGN KEY (message_id)
+        REFERENCES wchat_chatmessage (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT wchat_messagereceiver_receiver_id_fk FOREIGN KEY (receiver_id)
+        REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT wchat_messagereceiver_created_by_id_fk FOREIGN KEY (created_by_id)
+        REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT wchat_messagereceiver_modified_by_id_fk FOREIGN KEY (modified_by_id)
+        REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+# The partition key has to be part of every unique constraint, so the primary key becomes
+# (id, message_id); (receiver_id, message_id) already contains it.
+PARTITION_SQL = """
+ALTER TABLE wchat_messagereceiver RENAME TO wchat_messagereceiver_unpartitioned;
+
+CREATE SEQUENCE wchat_messagereceiver_pid_seq;
+CREATE TABLE wchat_messagereceiver (
+    LIKE wchat_messagereceiver_unpartitioned INCLUDING DEFAULTS,
+    CONSTRAINT wchat_messagereceiver_part_pkey PRIMARY KEY (id, message_id),
+    CONSTRAINT wchat_messagereceiver_receiver_message_uniq UNIQUE (receiver_id, message_id)
+) PARTITION BY HASH (message_id);
+ALTER TABLE wchat_messagereceiver ALTER COLUMN id SET DEFAULT nextval('wchat_messagereceiver_pid_seq');
+
+DO $$
+BEGIN
+    FOR i IN 0..%(last)s LOOP
+        EXECUTE format(
+            'CREATE TABLE wchat_messagereceiver_p%%s PARTITION OF wchat_messagereceiver '
+            'FOR VALUES WITH (MODULUS %(modulus)s, REMAINDER %%s)', i, i);
+    END LOOP;
+END $$;
+
+INSERT INTO wchat_messagereceiver SELECT * FROM wchat_messagereceiver_unpartitioned;
+SELECT setval('wchat_messagereceiver_pid_seq', COALESCE(MAX(id), 0) + 1, false) FROM wchat_messagereceiver;
+DROP TABLE wchat_messagereceiver_unpartitioned;
+ALTER SEQUENCE wchat_messagereceiver_pid_seq OWNED BY wchat_messagereceiver.id;
+
+""" % {'last': PARTITIONS - 1, 'modulus': PARTITIONS} + INDEXES_SQL
+
+UNPARTITION_SQL = """
+ALTER TABLE wchat_messagereceiver RENAME TO wchat_messagereceiver_partitioned;
+ALTER SEQUENCE wchat_messagereceiver_pid_seq OWNED BY NONE;
+
+CREATE TABLE wchat_messagereceiver (LIKE wchat_messagereceiver_partitioned INCLUDING DEFAULTS);
+INSERT INTO wchat_messagereceiver SELECT * FROM wchat_messagereceiver_partitioned;
+DROP TABLE wchat_messagereceiver_partitioned;
+ALTER SEQUENCE wchat_messagereceiver_pid_seq OWNED BY wchat_messagereceiver.id;
+
+ALTER TABLE wchat_messagereceiver
+    ADD CONSTRAINT wchat_messagereceiver_pkey PRIMARY KEY (id),
+    ADD CONSTRAINT wchat_messagereceiver_receiver_message_uniq UNIQUE (receiver_id, message_id);
+""" + INDEXES_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wchat', '0022_chatfilecount'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="DELETE FROM wchat_messagereceiver WHERE message_id IS NULL",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='messagereceiver',
+            name='message',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wchat.chatmessage'),
+        ),
+        migrations.RunSQL(sql=PARTITION_SQL, reverse_sql=UNPARTITION_SQL),
+    ]
@@ -1,12 +1,17 @@
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
-from django.db.models import Max
+from django.db.models import Max, Q
 from django.utils import timezone
 
 from base_model.models import BaseModel
 from utils.constants import CONSTANTS
 
+# text search configuration of the message full-text index; chats mix languages, so no stemming
+MESSAGE_SEARCH_CONFIG = 'simple'
+
 
 class Chat(BaseModel):
     uid = models.UUIDField(default=uuid.uuid4, editable=False)
@@ -22,6 +27,11 @@ class Chat(BaseModel):
     def __str__(self):
         return '{} - {} - {}'.format(self.id, self.type, self.created_by.full_name)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='wchat_chat_title_trgm_idx'),
+        ]
+
 
 class ChatImage(BaseModel):
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='images')
@@ -80,6 +90,16 @@ class ChatMessage(BaseModel):
 
     objects = MessageQueryManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat', 'created_date', 'id'],
+                         condition=Q(deleted=False),
+                         name='wchat_message_position_idx'),
+            GinIndex(SearchVector('text', config=MESSAGE_SEARCH_CONFIG),
+                     condition=Q(deleted=False),
+                     name='wchat_message_text_fts_idx'),
+        ]
+
     def __str__(self):
         return f'{self.id}'
 
@@ -124,6 +144,22 @@ class ChatMessageFile(BaseModel):
         return ''.format(self.message.id)
 
 
+class ChatFileCount(models.Model):
+    """
+    Number of undeleted file messages of a chat per message type.
+    Kept up to date by the ChatMessage signals; rebuilt by `rebuild_chat_file_counts`.
+    """
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='file_counts')
+    type = models.CharField(max_length=30, choices=CONSTANTS.CHAT.MESSAGE_TYPES.CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('chat', 'type')]
+
+    def __str__(self):
+        return '{} - {}: {}'.format(self.chat_id, self.type, self.count)
+
+
 class ChatMessageReaction(BaseModel):
     message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='reactions')
     user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True)
@@ -137,8 +173,13 @@ class ChatMessageReaction(BaseModel):
 
 
 class MessageReceiver(BaseModel):
+    """
+    Delivery and read state of a message per receiver.
+    The table is hash-partitioned by message_id (see migration 0023), so its primary key
+    is (id, message_id) in the database; `id` alone stays unique through its sequence.
+    """
     receiver = models.ForeignKey("user.User", null=True, on_delete=models.SET_NULL)
-    message = models.ForeignKey(ChatMessage, null=True, blank=True, on_delete=models.CASCADE)
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE)
     delivered = models.DateTimeField(null=True)
     read = models.DateTimeField(null=True)
     re_read = models.DateTimeField(null=True)
@@ -514,6 +514,7 @@ class MessagePageSerializer(serializers.Serializer):
     page_size = serializers.IntegerField(required=False)
     message_id = serializers.IntegerField(required=False)
     chat_id = serializers.IntegerField(required=False)
+    with_messages = serializers.BooleanField(required=False, default=False)
 
     def validate(self, attrs):
         request = self.context.get('request', None)
@@ -0,0 +1,309 @@
+import base64
+import os
+import re
+from datetime import timedelta
+from typing import Optional
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchHeadline
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from apps.wchat.models import Chat, ChatFileCount, ChatMember, ChatMessage, MESSAGE_SEARCH_CONFIG
+from utils.constants import CONSTANTS
+
+# opt-in: 0 keeps the delivery rows of live messages forever, only those of deleted messages are purged
+MESSAGE_RECEIVER_RETENTION_DAYS = int(os.getenv('MESSAGE_RECEIVER_RETENTION_DAYS', 0))
+
+
+def message_receiver_cutoff():
+    """
+    Creation time before which the delivery rows of messages are purged, or None when age-based purging is off.
+    """
+    if MESSAGE_RECEIVER_RETENTION_DAYS > 0:
+        return timezone.now() - timedelta(days=MESSAGE_RECEIVER_RETENTION_DAYS)
+    return None
+
+
+def newer_than(message):
+    """
+    Messages of the same chat that come before `message` in the
+    ('-created_date', '-id') order used by the message list.
+    """
+    return (Q(created_date__gt=message.created_date) |
+            Q(created_date=message.created_date, id__gt=message.id))
+
+
+def older_than(message):
+    return (Q(created_date__lt=message.created_date) |
+            Q(created_date=message.created_date, id__lt=message.id))
+
+
+def get_message_position(message) -> int:
+    """
+    Returns the zero-based position of a message in its chat, newest first.
+    A single COUNT over the (chat, created_date, id) index instead of loading every id of the chat.
+    """
+    return (ChatMessage.objects
+            .filter(chat_id=message.chat_id, created_date__gte=message.created_date)
+            .filter(newer_than(message))
+            .count())
+
+
+def get_message_page_items(queryset, message, position: int, page_size: int) -> list:
+    """
+    Returns the messages of the page that contains `message`, newest first,
+    read with two keyset queries around it instead of OFFSET.
+    """
+    offset_in_page = position % page_size
+    newer = list(queryset.filter(newer_than(message)).order_by('created_date', 'id')[:offset_in_page])
+    older = list(queryset.filter(older_than(message)).order_by('-created_date', '-id')[:page_size - offset_in_page - 1])
+    return list(reversed(newer)) + [message] + older
+
+
+# ---------------------------------------------------------------------------
+# File counts
+# ---------------------------------------------------------------------------
+
+def file_count_key(chat_id, message_type, deleted):
+    """
+    Returns the (chat_id, type) counter a message contributes to, or None.
+    """
+    if chat_id and not deleted and message_type in CONSTANTS.CHAT.MESSAGE_TYPES.FILES:
+        return chat_id, message_type
+    return None
+
+
+def adjust_file_count(key, delta: int) -> None:
+    """
+    Adds `delta` to a (chat_id, type) counter with a single upsert, so concurrent
+    messages of a chat only queue on the counter row instead of losing updates.
+    """
+    if key is None or not delta:
+        return
+    chat_id, message_type = key
+    table = ChatFileCount._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (chat_id, type, count) VALUES (%s, %s, GREATEST(%s, 0)) "
+            f"ON CONFLICT (chat_id, type) DO UPDATE SET count = GREATEST({table}.count + %s, 0)",
+            [chat_id, message_type, delta, delta])
+
+
+def get_file_counts(chat_id) -> dict:
+    return dict(ChatFileCount.objects
+                .filter(chat_id=chat_id, count__gt=0)
+                .values_list('type', 'count'))
+
+
+def rebuild_file_counts(chat_ids=None) -> int:
+    """
+    Recomputes the counters of the given chats (all chats by default) from the messages.
+    The counter table is locked for writes meanwhile: messages created during the rebuild
+    wait for it and are then added on top of the fresh counts. Returns the number of rows written.
+    """
+    table = ChatFileCount._meta.db_table
+    chat_filter = ' AND chat_id = ANY(%s)' if chat_ids is not None else ''
+    params = [list(chat_ids)] if chat_ids is not None else []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+        cursor.execute(f"DELETE FROM {table} WHERE TRUE{chat_filter}", params)
+        cursor.execute(
+            f"INSERT INTO {table} (chat_id, type, count) "
+            f"SELECT chat_id, type, count(*) FROM {ChatMessage._meta.db_table} "
+            f"WHERE deleted = FALSE AND chat_id IS NOT NULL AND type = ANY(%s){chat_filter} "
+            f"GROUP BY chat_id, type",
+            [list(CONSTANTS.CHAT.MESSAGE_TYPES.FILES)] + params)
+        return cursor.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+HIGHLIGHT_START = '<b>'
+HIGHLIGHT_STOP = '</b>'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(search) -> list:
+    return _WORD_RE.findall(search or '')
+
+
+def build_prefix_query(search) -> Optional[SearchQuery]:
+    """
+    Turns user input into a prefix tsquery: 'hello wor' -> 'hello:* & wor:*',
+    so results appear while the user is still typing a word.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return None
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    return SearchQuery(raw, search_type='raw', config=MESSAGE_SEARCH_CONFIG)
+
+
+def encode_search_cursor(rank: float, message_id: int) -> str:
+    return base64.urlsafe_b64encode(f'{rank!r}:{message_id}'.encode()).decode()
+
+
+def decode_search_cursor(cursor: str):
+    """
+    Returns (rank, message_id) of a cursor, or raises ValueError.
+    """
+    rank, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+    return float(rank), int(message_id)
+
+
+def get_chat_titles(user_id, chat_ids) -> dict:
+    """
+    Maps chat id -> (type, title, uid). A private chat is titled with the other member's name.
+    """
+    chats = {c['id']: c for c in Chat.objects.filter(id__in=chat_ids).values('id', 'type', 'title', 'uid')}
+    private_ids = [i for i, c in chats.items() if c['type'] == CONSTANTS.CHAT.TYPES.PRIVATE]
+    names = {}
+    for member in (ChatMember.objects
+                   .filter(chat_id__in=private_ids)
+                   .exclude(user_id=user_id)
+                   .values('chat_id', 'user__last_name', 'user__first_name')):
+        names[member['chat_id']] = f"{member['user__last_name']} {member['user__first_name']}"
+
+    titles = {}
+    for chat_id, chat in chats.items():
+        title = chat['title'] if chat['type'] == CONSTANTS.CHAT.TYPES.GROUP else names.get(chat_id)
+        titles[chat_id] = (chat['type'], title or 'Unknown', chat['uid'])
+    return titles
+
+
+def search_messages(user_id, search, cursor=None, page_size=SEARCH_PAGE_SIZE) -> dict:
+    """
+    Full-text search over the messages of the chats the user belongs to.
+    Uses the `wchat_message_text_fts_idx` GIN index, orders by rank and pages by
+    the (rank, id) keyset of the last returned row. `count` is returned on the first page only.
+    """
+    query = build_prefix_query(search)
+    if query is None:
+        return {'count': 0, 'data': [], 'next': None}
+
+    page_size = max(1, min(page_size or SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE))
+    my_chats = ChatMember.objects.filter(user_id=user_id, chat__deleted=False).values('chat_id')
+    queryset = (
+        ChatMessage.objects
+        .annotate(document=SearchVector('text', config=MESSAGE_SEARCH_CONFIG))
+        .filter(document=query, chat_id__in=my_chats)
+    )
+
+    # ts_rank is a real; as double precision the cursor's rank round-trips exactly and compares equal to itself
+    rank = Cast(SearchRank(F('document'), query), FloatField())
+    count = None
+    if cursor:
+        last_rank, last_id = decode_search_cursor(cursor)
+        queryset = queryset.annotate(rank=rank).filter(
+            Q(rank__lt=last_rank) | Q(rank=last_rank, id__lt=last_id))
+    else:
+        count = queryset.count()
+        queryset = queryset.annotate(rank=rank)
+
+    rows = list(
+        queryset
+        .annotate(highlight=SearchHeadline('text', query, config=MESSAGE_SEARCH_CONFIG,
+                                           start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                                           max_fragments=1, max_words=20, min_words=5))
+        .order_by('-rank', '-id')
+        .values('id', 'text', 'type', 'created_date', 'chat_id', 'rank', 'highlight')[:page_size + 1]
+    )
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    titles = get_chat_titles(user_id, {row['chat_id'] for row in rows})
+    data = []
+    for row in rows:
+        chat_type, chat_title, uid = titles.get(row['chat_id'], (None, 'Unknown', None))
+        data.append({
+            'message_id': row['id'],
+            'message_text': row['text'],
+            'message_type': row['type'],
+            'created_date': row['created_date'],
+            'chat_id': row['chat_id'],
+            'chat_type': chat_type,
+            'chat_title': chat_title,
+            'uid': uid,
+            'highlight': row['highlight'],
+            'rank': row['rank'],
+        })
+
+    next_cursor = encode_search_cursor(rows[-1]['rank'], rows[-1]['id']) if has_next else None
+    return {'count': count, 'data': data, 'next': next_cursor}
+
+
+def search_chats(user_id, search) -> list:
+    """
+    Searches the chats of a user by group title or by the other member's name.
+    Every word of the input has to match; matching uses ILIKE, which the pg_trgm
+    GIN indexes on chat titles and user names serve. Best matches come first.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return []
+
+    params = {'user_id': user_id, 'search': ' '.join(terms)}
+    title_filters, name_filters = [], []
+    for index, term in enumerate(terms):
+        key = f'term_{index}'
+        params[key] = '%{}%'.format(term.replace('_', r'\_'))
+        title_filters.append(f'c.title ILIKE %({key})s')
+        name_filters.append(f'(u.first_name ILIKE %({key})s OR u.last_name ILIKE %({key})s)')
+
+    query = f"""
+            SELECT c.id,
+                   c.type,
+                   CASE
+                       WHEN c.type = 'group' THEN c.title
+                       ELSE CONCAT(u.last_name, ' ', u.first_name, ' ', u.father_name)
+                       END              AS chat_title,
+                   cm_last.text         AS last_message,
+                   cm_last.created_date AS last_message_date,
+                   c.modified_date,
+                   cm_last.type         AS last_message_type,
+                   c.uid,
+                   CASE
+                       WHEN c.type = 'group' THEN word_similarity(%(search)s, c.title)
+                       ELSE word_similarity(%(search)s, CONCAT(u.last_name, ' ', u.first_name))
+                       END              AS rank
+            FROM wchat_chatmember me
+                     JOIN wchat_chat c ON c.id = me.chat_id AND c.deleted = FALSE
+                     LEFT JOIN LATERAL (
+                         SELECT other.user_id
+                         FROM wchat_chatmember other
+                         WHERE other.chat_id = c.id
+                           AND other.user_id != %(user_id)s
+                         LIMIT 1
+                         ) other ON c.type = 'private'
+                     LEFT JOIN "user_user" u ON u.id = other.user_id
+                     LEFT JOIN "wchat_chatmessage" cm_last ON c.last_message_id = cm_last.id
+            WHERE me.user_id = %(user_id)s
+              AND (
+                (c.type = 'group' AND {' AND '.join(title_filters)})
+                    OR (c.type = 'private' AND {' AND '.join(name_filters)})
+                )
+            ORDER BY rank DESC, c.modified_date DESC
+            """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    return [{
+        'id': row[0],
+        'type': row[1],
+        'chat_title': (row[2] or '').strip(),
+        'last_message': row[3],
+        'last_message_date': row[4],
+        'modified_date': row[5],
+        'last_message_type': row[6],
+        'uid': row[7],
+    } for row in rows]
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.wchat.models import ChatMessage
+from apps.wchat.services import file_count_key, adjust_file_count
+
+_UNKNOWN = object()
+
+
+def _loaded_file_count_key(instance):
+    # read __dict__ directly: touching a deferred field here would cost a query per instance
+    values = instance.__dict__
+    if not {'chat_id', 'type', 'deleted'} <= values.keys():
+        return _UNKNOWN
+    return file_count_key(values['chat_id'], values['type'], values['deleted'])
+
+
+@receiver(post_init, sender=ChatMessage)
+def _remember_file_count_key(sender, instance, **kwargs):
+    instance._file_count_key = _loaded_file_count_key(instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def _update_file_count_on_save(sender, instance, created, **kwargs):
+    old = None if created else instance._file_count_key
+    new = file_count_key(instance.chat_id, instance.type, instance.deleted)
+    instance._file_count_key = new
+    if old is _UNKNOWN or old == new:
+        # partially loaded instances are left to `rebuild_chat_file_counts`
+        return
+    adjust_file_count(old, -1)
+    adjust_file_count(new, 1)
+
+
+@receiver(post_delete, sender=ChatMessage)
+def _update_file_count_on_delete(sender, instance, **kwargs):
+    old = instance._file_count_key
+    if old is not _UNKNOWN:
+        adjust_file_count(old, -1)
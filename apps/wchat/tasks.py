@@ -3,7 +3,8 @@ import logging
 from django.db import connection
 from django.utils import timezone
 
-from apps.wchat.models import ChatMessage, Chat, ChatMember, MessageReceiver
+from apps.wchat.models import ChatMessage, Chat, ChatMember
+from apps.wchat.services import message_receiver_cutoff
 from config.celery import app
 from utils.constants import CONSTANTS
 from utils.global_socket import (
@@ -149,17 +150,61 @@ def send_socket_about_chat_deleted(chat_id: int, chat_type: str, **kwargs):
 
 @app.task(max_retries=1, name='deliver_message')
 def deliver_message(message_id: int, chat_id: int, sender_id: int):
-    qs = ChatMember.objects.filter(chat_id=chat_id).exclude(user_id=sender_id)
-    # Stream user_ids to avoid loading huge lists in memory
-    rows = (
-        MessageReceiver(
-            message_id=message_id,
-            receiver_id=uid,
-            delivered=timezone.now(),
+    """
+    Marks the message as delivered to every other member of the chat.
+    The receivers are read from wchat_chatmember and written by the database itself
+    in one INSERT ... SELECT, so no member id travels through Python.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO wchat_messagereceiver
+                (message_id, receiver_id, delivered, created_date, modified_date, is_active)
+            SELECT %(message_id)s, cm.user_id, NOW(), NOW(), NOW(), TRUE
+            FROM wchat_chatmember cm
+            WHERE cm.chat_id = %(chat_id)s
+              AND cm.user_id IS NOT NULL
+              AND cm.user_id <> %(sender_id)s
+            ON CONFLICT (receiver_id, message_id) DO NOTHING
+            """,
+            {'message_id': message_id, 'chat_id': chat_id, 'sender_id': sender_id}
         )
-        for uid in qs.values_list("user_id", flat=True).iterator(chunk_size=10000)
-    )
-    MessageReceiver.objects.bulk_create(rows, batch_size=10000, ignore_conflicts=True)
+        return cursor.rowcount
+
+
+@app.task(max_retries=1, name='purge_message_receivers')
+def purge_message_receivers(batch_size: int = 50000):
+    """
+    Retention for wchat_messagereceiver: removes the delivery rows of deleted messages and, only
+    when MESSAGE_RECEIVER_RETENTION_DAYS is set (off by default), of messages older than that many days.
+    Deletes in batches so each transaction and the resulting vacuum work stay small.
+    """
+    params = {'batch_size': batch_size, 'before': message_receiver_cutoff()}
+
+    total = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                DELETE FROM wchat_messagereceiver
+                WHERE (id, message_id) IN (
+                    SELECT mr.id, mr.message_id
+                    FROM wchat_messagereceiver mr
+                             JOIN wchat_chatmessage m ON m.id = mr.message_id
+                    WHERE m.deleted = TRUE
+                       OR m.created_date < %(before)s
+                    LIMIT %(batch_size)s
+                )
+                """,
+                params
+            )
+            deleted = cursor.rowcount
+        total += deleted
+        if deleted < batch_size:
+            break
+
+    logging.info(f"Purged {total} message receivers")
+    return total
 
 
 @app.task(max_retries=1, name='send_about_message_outside_chat')
@@ -1,3 +1,412 @@
-from django.test import TestCase
+from collections import Counter, defaultdict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import pytest
+from django.db import connection, connections
+from django.utils import timezone
+
+from apps.user.principal import get_user_principal
+from apps.wchat import services as wchat_services
+from apps.wchat.models import Chat, ChatFileCount, ChatMember, ChatMessage, ChatMessageReaction, MessageReceiver
+from apps.wchat.services import (
+    get_file_counts,
+    get_message_position,
+    get_message_page_items,
+    rebuild_file_counts,
+    search_chats,
+    search_messages,
+)
+from apps.wchat.tasks import deliver_message, purge_message_receivers
+from config import socket_throttle
+from config.consumers import SocketConsumer
+from config.socket_throttle import SocketEventCounters, TokenBucket, TypingTracker, get_socket_event_counters
+from utils.constants import CONSTANTS
+
+
+def _chat_with_messages(user, count=23):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='chat')
+    ChatMessage.objects.bulk_create([ChatMessage(chat=chat, sender=user, text=str(i)) for i in range(count)])
+    # several messages sharing a timestamp, ordered by id
+    same_time = timezone.now()
+    ids = list(ChatMessage.objects.filter(chat=chat).order_by('id').values_list('id', flat=True))
+    ChatMessage.objects.filter(id__in=ids[5:10]).update(created_date=same_time)
+    ChatMessage.objects.filter(id=ids[12]).update(deleted=True)
+    return chat
+
+
+def test_message_position_matches_list_order(user):
+    chat = _chat_with_messages(user)
+    ordered = list(ChatMessage.objects.filter(chat=chat).order_by('-created_date', '-id'))
+
+    for index, message in enumerate(ordered):
+        assert get_message_position(message) == index
+
+
+def test_message_page_items(user):
+    chat = _chat_with_messages(user)
+    ordered = list(ChatMessage.objects.filter(chat=chat).order_by('-created_date', '-id'))
+    page_size = 5
+    queryset = ChatMessage.objects.filter(chat=chat)
+
+    for index, message in enumerate(ordered):
+        page_start = index - index % page_size
+        items = get_message_page_items(queryset, message, get_message_position(message), page_size)
+
+        assert [m.id for m in items] == [m.id for m in ordered[page_start:page_start + page_size]]
+
+
+def test_message_position_index_exists():
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, ChatMessage._meta.db_table)
+
+    assert constraints['wchat_message_position_idx']['columns'] == ['chat_id', 'created_date', 'id']
+
+
+def _search_chats(user, user2):
+    user2.first_name, user2.last_name = 'Aziza', 'Karimova'
+    user2.save()
+    group = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='Quarterly report')
+    private = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.PRIVATE)
+    foreign = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='Quarterly budget')
+    ChatMember.objects.bulk_create([
+        ChatMember(chat=group, user=user),
+        ChatMember(chat=private, user=user),
+        ChatMember(chat=private, user=user2),
+        ChatMember(chat=foreign, user=user2),
+    ])
+    return group, private, foreign
+
+
+def test_search_chats(user, user2):
+    group, private, foreign = _search_chats(user, user2)
+
+    assert [c['id'] for c in search_chats(user.id, 'quarter')] == [group.id]
+    found = search_chats(user.id, 'karimova azi')
+    assert [c['id'] for c in found] == [private.id]
+
+
+def test_search_messages_pages_by_keyset(user, user2):
+    group, private, foreign = _search_chats(user, user2)
+    ChatMessage.objects.bulk_create(
+        [ChatMessage(chat=group, sender=user, text=f'deadline number {i}') for i in range(5)] +
+        [ChatMessage(chat=foreign, sender=user2, text='deadline elsewhere')])
+
+    first = search_messages(user.id, 'deadl', page_size=3)
+    second = search_messages(user.id, 'deadl', cursor=first['next'], page_size=3)
+
+    assert first['count'] == 5
+    assert second['next'] is None
+    ids = [m['message_id'] for m in first['data'] + second['data']]
+    assert sorted(ids) == sorted(ChatMessage.objects.filter(chat=group).values_list('id', flat=True))
+    assert '<b>deadline</b>' in first['data'][0]['highlight']
+
+
+def test_search_messages_page_starts_inside_a_rank_tie(user, user2):
+    group, private, foreign = _search_chats(user, user2)
+    ChatMessage.objects.bulk_create(
+        [ChatMessage(chat=group, sender=user, text='deadline deadline deadline') for _ in range(2)] +
+        [ChatMessage(chat=group, sender=user, text='deadline tomorrow') for _ in range(4)])
+
+    pages = [search_messages(user.id, 'deadline', page_size=3)]
+    while pages[-1]['next']:
+        pages.append(search_messages(user.id, 'deadline', cursor=pages[-1]['next'], page_size=3))
+
+    # the first page ends on a 'deadline tomorrow' row, the second starts on one with the same rank
+    assert len(pages) == 2
+    ids = [m['message_id'] for page in pages for m in page['data']]
+    expected = ChatMessage.objects.filter(chat=group).order_by('text', '-id').values_list('id', flat=True)
+    assert ids == list(expected)
+
+
+def _actual_file_counts(chat):
+    counts = {}
+    for message_type in ChatMessage.objects.filter(
+            chat=chat, type__in=CONSTANTS.CHAT.MESSAGE_TYPES.FILES).values_list('type', flat=True):
+        counts[message_type] = counts.get(message_type, 0) + 1
+    return counts
+
+
+def test_file_counts_follow_message_changes(user):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='chat')
+    image = ChatMessage.objects.create(chat=chat, sender=user, type=CONSTANTS.CHAT.MESSAGE_TYPES.IMAGE)
+    ChatMessage.objects.create(chat=chat, sender=user, type=CONSTANTS.CHAT.MESSAGE_TYPES.IMAGE)
+    voice = ChatMessage.objects.create(chat=chat, sender=user, type=CONSTANTS.CHAT.MESSAGE_TYPES.VOICE)
+    ChatMessage.objects.create(chat=chat, sender=user, text='hello')
+
+    assert get_file_counts(chat.id) == {'image': 2, 'voice': 1}
+
+    image = ChatMessage.objects.get(id=image.id)
+    image.deleted = True
+    image.save()
+    ChatMessage.objects.get(id=voice.id).delete()
+
+    assert get_file_counts(chat.id) == {'image': 1}
+
+
+def test_rebuild_file_counts(user):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='chat')
+    ChatMessage.objects.bulk_create(
+        [ChatMessage(chat=chat, sender=user, type=CONSTANTS.CHAT.MESSAGE_TYPES.FILE) for _ in range(3)])
+    assert get_file_counts(chat.id) == {}
+
+    rebuild_file_counts([chat.id])
+
+    assert get_file_counts(chat.id) == {'file': 3}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_file_counts_are_consistent_under_concurrent_creation(user):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='chat')
+    message_types = [CONSTANTS.CHAT.MESSAGE_TYPES.IMAGE, CONSTANTS.CHAT.MESSAGE_TYPES.FILE,
+                     CONSTANTS.CHAT.MESSAGE_TYPES.TEXT]
+
+    def _create(i):
+        try:
+            ChatMessage.objects.create(chat_id=chat.id, sender_id=user.id, type=message_types[i % 3])
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_create, range(60)))
+
+    assert get_file_counts(chat.id) == _actual_file_counts(chat) == {'image': 20, 'file': 20}
+    assert not ChatFileCount.objects.filter(chat=chat, type=CONSTANTS.CHAT.MESSAGE_TYPES.TEXT).exists()
+
+
+def test_deliver_message(user, user2):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.PRIVATE)
+    ChatMember.objects.bulk_create([ChatMember(chat=chat, user=user), ChatMember(chat=chat, user=user2)])
+    message = ChatMessage.objects.create(chat=chat, sender=user, text='hello')
+
+    assert deliver_message(message.id, chat.id, user.id) == 1
+    # delivering twice does not duplicate receivers
+    assert deliver_message(message.id, chat.id, user.id) == 0
+
+    receiver = MessageReceiver.objects.get(message=message)
+    assert receiver.receiver_id == user2.id
+    assert receiver.delivered is not None
+
+
+def test_purge_message_receivers(user, user2, monkeypatch):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.PRIVATE)
+    ChatMember.objects.bulk_create([ChatMember(chat=chat, user=user), ChatMember(chat=chat, user=user2)])
+    kept, deleted, old = [ChatMessage.objects.create(chat=chat, sender=user, text=str(i)) for i in range(3)]
+    for message in (kept, deleted, old):
+        deliver_message(message.id, chat.id, user.id)
+    ChatMessage.objects.filter(id=deleted.id).update(deleted=True)
+    ChatMessage.objects.filter(id=old.id).update(created_date=timezone.now() - timedelta(days=400))
+
+    # age-based purging is opt-in
+    assert purge_message_receivers(batch_size=1) == 1
+    assert sorted(MessageReceiver.objects.values_list('message_id', flat=True)) == [kept.id, old.id]
+
+    monkeypatch.setattr(wchat_services, 'MESSAGE_RECEIVER_RETENTION_DAYS', 365)
+    assert purge_message_receivers(batch_size=1) == 1
+    assert list(MessageReceiver.objects.values_list('message_id', flat=True)) == [kept.id]
+
+
+def test_read_status_skips_purged_messages(user, user2, monkeypatch):
+    monkeypatch.setattr(wchat_services, 'MESSAGE_RECEIVER_RETENTION_DAYS', 365)
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.PRIVATE)
+    ChatMember.objects.bulk_create([ChatMember(chat=chat, user=user), ChatMember(chat=chat, user=user2)])
+    purged, delivered_old, recent = [ChatMessage.objects.create(chat=chat, sender=user, text=str(i)) for i in range(3)]
+    deliver_message(delivered_old.id, chat.id, user.id)
+    ChatMessage.objects.filter(id__in=[purged.id, delivered_old.id]).update(
+        created_date=timezone.now() - timedelta(days=400))
+
+    assert _consumer(user2).write_message_read_status(user2.id, chat.id, recent.id)
+
+    receivers = MessageReceiver.objects.filter(receiver=user2)
+    assert sorted(receivers.values_list('message_id', flat=True)) == [delivered_old.id, recent.id]
+    assert not receivers.filter(read__isnull=True).exists()
+
+
+class _ChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+def _consumer(user):
+    # a connected consumer without the websocket: the scope carries the principal, as in the auth middleware
+    consumer = SocketConsumer()
+    consumer.scope = {'user': get_user_principal(user.id)}
+    consumer.user = consumer.scope['user']
+    consumer.channel_layer = _ChannelLayer()
+    consumer.event_counters = SocketEventCounters()
+    consumer.command_buckets = {}
+    return consumer
+
+
+def test_message_reaction_with_principal(user, user2):
+    chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.PRIVATE)
+    ChatMember.objects.bulk_create([ChatMember(chat=chat, user=user), ChatMember(chat=chat, user=user2)])
+    message = ChatMessage.objects.create(chat=chat, sender=user2, text='hello')
+    consumer = _consumer(user)
+    command = {'command': 'message_reaction', 'message_id': message.id, 'chat_id': chat.id,
+               'chat_type': chat.type, 'emoji': '+1'}
+
+    consumer.receive_json(command)
+    reaction = ChatMessageReaction.objects.get(message=message)
+    assert (reaction.user_id, reaction.emoji) == (user.id, '+1')
+    group, event = consumer.channel_layer.sent[-1]
+    assert group == f'{chat.type}_{chat.id}'
+    assert (event['type'], event['action'], event['user']) == ('chat.message.reaction', 'created', user.simple_dict())
+
+    consumer.receive_json(dict(command, emoji='-1'))
+    assert ChatMessageReaction.objects.get(message=message).emoji == '-1'
+    consumer.receive_json(dict(command, emoji='-1'))
+    assert not ChatMessageReaction.objects.filter(message=message).exists()
+    assert [event['action'] for _, event in consumer.channel_layer.sent] == ['created', 'updated', 'deleted']
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Redis:
+    """
+    The keys with expiry and the hashes socket_throttle uses, on the fake clock.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.expires = {}
+        self.hashes = defaultdict(Counter)
+        self.writes = 0
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and self.expires.get(key, float('-inf')) > self.clock.now:
+            return False
+        self.expires[key] = self.clock.now + px / 1000 if px else float('inf')
+        return True
+
+    def delete(self, key):
+        self.expires.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hincrby(self, name, field, count):
+        self.hashes[name][field] += count
+
+    def execute(self):
+        self.writes += 1
+
+    def hgetall(self, name):
+        return {field: str(count) for field, count in self.hashes[name].items()}
+
+
+class _Timer:
+    started = []
+
+    def __init__(self, delay, function, args):
+        self.delay, self.function, self.args = delay, function, args
+        self.cancelled = False
+        _Timer.started.append(self)
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        self.function(*self.args)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(socket_throttle, 'time', clock)
+    monkeypatch.setattr(socket_throttle, 'redis_client', _Redis(clock))
+    monkeypatch.setattr(socket_throttle.threading, 'Timer', _Timer)
+    monkeypatch.setattr(_Timer, 'started', [])
+    return clock
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5
+    assert [bucket.allow(), bucket.allow()] == [True, False]
+    # never more than the burst, however long the connection was idle
+    clock.now += 60
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+    assert TokenBucket(rate=0, burst=0).allow()
+
+
+def test_socket_event_counters_are_flushed_per_interval(clock):
+    redis = socket_throttle.redis_client
+    counters = SocketEventCounters()
+
+    counters.forwarded('ping')
+    counters.forwarded('ping')
+    counters.dropped('typing')
+    assert redis.writes == 0
+
+    clock.now += socket_throttle.COUNTERS_FLUSH_INTERVAL
+    counters.dropped('typing')
+    assert redis.writes == 1
+    counters.flush()
+    assert redis.writes == 1
+    assert get_socket_event_counters() == {
+        'ping': {'forwarded': 2, 'dropped': 0},
+        'typing': {'forwarded': 0, 'dropped': 2},
+    }
+
+
+def test_state_changing_commands_are_rejected_not_dropped(clock):
+    consumer = SocketConsumer()
+    consumer.event_counters = SocketEventCounters()
+    consumer.command_buckets = {command: TokenBucket(rate=2, burst=0) for command in ('ping', 'message_read')}
+    sent = []
+    consumer.send_json = sent.append
+
+    # an idempotent command over the limit is dropped, the client sends it again anyway
+    consumer.receive_json({'command': 'ping', 'key': 'k'})
+    assert sent == []
+
+    consumer.receive_json({'command': 'message_read', 'chat_id': 1, 'message_id': 2})
+    assert sent == [{
+        'type': 'error',
+        'action': 'message_read',
+        'code': 'throttled',
+        'message': 'Too many commands, try again later',
+        'context': {'retry_after': 0.5},
+    }]
+
+
+def test_typing_is_coalesced_and_expires(clock):
+    stopped = []
+    tracker = TypingTracker(7, lambda chat_type, chat_id: stopped.append((chat_type, chat_id)))
+
+    assert tracker.typing('group', 1)
+    clock.now += socket_throttle.TYPING_INTERVAL / 2
+    assert not tracker.typing('group', 1)
+    # another connection of the same user typing in the same chat is coalesced too
+    assert not TypingTracker(7, None).typing('group', 1)
+    clock.now += socket_throttle.TYPING_INTERVAL
+    assert tracker.typing('group', 1)
+
+    # the first timer fires while the chat is still active and waits for the rest of the timeout
+    timer = _Timer.started[0]
+    clock.now += timer.delay - socket_throttle.TYPING_INTERVAL * 1.5
+    timer.fire()
+    assert stopped == []
+    rescheduled = _Timer.started[-1]
+    clock.now += rescheduled.delay
+    rescheduled.fire()
+    assert stopped == [('group', 1)]
+
+    # a stopped chat is not stopped twice
+    tracker.stop('group', 1)
+    assert stopped == [('group', 1)]
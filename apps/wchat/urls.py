@@ -17,4 +17,6 @@ urlpatterns = [
     path('api/v1/chat/message/links/', views.MessageLinkListView.as_view(), name='message-links'),
     path('api/v1/chat/message/files/', views.ChatMessageFileListView.as_view(), name='message-files'),
     path('api/v1/chat/<int:chat_id>/files-count/', views.ChatFileCountsView.as_view(), name='chat-files'),
+    path('api/v1/chat/socket-event-counters/', views.SocketEventCountersView.as_view(),
+         name='socket-event-counters'),
 ]
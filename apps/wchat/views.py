@@ -1,6 +1,6 @@
 from typing import Optional
 
-from django.db import connection, transaction
+from django.db import transaction
 from django.db.models import OuterRef, Exists, Prefetch, Subquery, IntegerField, Value, Count, Q
 from django.db.models.functions import Coalesce
 from django.http import Http404
@@ -14,6 +14,7 @@ from rest_framework import viewsets, views, status, mixins, generics
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 from apps.docflow.serializers.docflow import SimpleResponseSerializer
@@ -22,6 +23,14 @@ from apps.wchat.filters import MessageLinkFilter
 from apps.wchat.models import Chat, ChatMember, ChatMessage, ChatImage, ChatMessageFile, ChatMessageReaction, \
     MessageReceiver
 from apps.wchat.pagination import MessageCursorPagination
+from apps.wchat.services import (
+    SEARCH_PAGE_SIZE,
+    get_file_counts,
+    get_message_position,
+    get_message_page_items,
+    search_chats,
+    search_messages,
+)
 from apps.wchat.serializers import (
     PrivateChatSerializer,
     PrivateChatListSerializer,
@@ -40,6 +49,7 @@ from apps.wchat.tasks import (
     send_socket_about_chat_deleted,
 )
 from config.middlewares.current_user import get_current_user_id
+from config.socket_throttle import get_socket_event_counters
 from utils.constants import CONSTANTS
 from utils.exception import ValidationError2, get_response_message
 
@@ -494,69 +504,7 @@ class ChatSearchView(views.APIView):
     def get(self, request):
         search = self.request.GET.get('search')
         user_id = get_current_user_id()
-
-        query = """
-                SELECT DISTINCT c.id,
-                                c.type,
-                                CASE
-                                    WHEN c.type = 'group' THEN c.title
-                                    WHEN c.type = 'private' THEN
-                                        CASE
-                                            WHEN c.created_by_id = %(user_id)s
-                                                THEN CONCAT(u2.last_name, ' ', u2.first_name, ' ', u2.father_name)
-                                            ELSE CONCAT(u1.last_name, ' ', u1.first_name, ' ', u1.father_name)
-                                            END
-                                    ELSE ''
-                                    END              AS chat_title,
-                                cm_last.text         AS last_message,
-                                cm_last.created_date AS last_message_date,
-                                c.modified_date,
-                                cm_last.type         AS last_message_type,
-                                c.uid
-                FROM wchat_chat c
-                         JOIN wchat_chatmember cm ON c.id = cm.chat_id
-                         LEFT JOIN wchat_chatmember cm_other
-                                   ON cm_other.chat_id = c.id AND cm_other.user_id != %(user_id)s
-                         LEFT JOIN "user_user" u1 ON c.created_by_id = u1.id
-                         LEFT JOIN "user_user" u2 ON cm_other.user_id = u2.id
-                         LEFT JOIN "wchat_chatmessage" cm_last ON c.last_message_id = cm_last.id
-                WHERE cm.user_id = %(user_id)s
-                  AND c.deleted = FALSE
-                  AND (
-                    (c.type = 'group' AND c.title ILIKE %(search_term)s)
-                        OR (c.type = 'private' AND
-                            (
-                                CONCAT(u1.first_name, ' ', u1.last_name) ILIKE %(search_term)s OR
-                                CONCAT(u2.first_name, ' ', u2.last_name) ILIKE %(search_term)s OR
-                                CONCAT(u1.last_name, ' ', u1.first_name) ILIKE %(search_term)s OR
-                                CONCAT(u2.last_name, ' ', u2.first_name) ILIKE %(search_term)s
-                                )
-                        )
-                    )
-                ORDER BY c.modified_date DESC; \
-                """
-
-        cursor = connection.cursor()
-        params = {
-            'user_id': user_id,
-            'search_term': f'%{search}%'
-        }
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        data = []
-
-        for row in result:
-            data.append({
-                'id': row[0],
-                'type': row[1],
-                'chat_title': row[2].strip(),
-                'last_message': row[3],
-                'last_message_date': row[4],
-                'modified_date': row[5],
-                'last_message_type': row[6],
-                'uid': row[7],
-            })
-
+        data = search_chats(user_id, search)
         return Response(data)
 
 
@@ -812,69 +760,24 @@ class MessageSearchView(views.APIView):
                                description="type anything",
                                type=openapi.TYPE_STRING, required=True)
 
+    cursor = openapi.Parameter('cursor', openapi.IN_QUERY,
+                               description="`next` of the previous page",
+                               type=openapi.TYPE_STRING, required=False)
+    page_size = openapi.Parameter('page_size', openapi.IN_QUERY,
+                                  type=openapi.TYPE_INTEGER, required=False)
+
     response = openapi.Response('response description', SimpleResponseSerializer)
 
-    @swagger_auto_schema(manual_parameters=[search], responses={200: response})
+    @swagger_auto_schema(manual_parameters=[search, cursor, page_size], responses={200: response})
     def get(self, request):
         search = self.request.GET.get('search')
         user_id = get_current_user_id()
-
-        query = """
-                SELECT cm.id   AS message_id,
-                       cm.text AS message_text,
-                       cm.type AS message_type,
-                       cm.created_date,
-                       c.id    AS chat_id,
-                       c.type  AS chat_type,
-                       COALESCE(
-                               CASE
-                                   WHEN c.type = 'group' THEN c.title
-                                   WHEN c.type = 'private' THEN
-                                       CASE
-                                           WHEN c.created_by_id = %(user_id)s
-                                               THEN u2.last_name || ' ' || u2.first_name
-                                           ELSE u1.last_name || ' ' || u1.first_name
-                                           END
-                                   ELSE 'Unknown'
-                                   END, 'Unknown'
-                       )       AS chat_title,
-                       c.uid
-                FROM wchat_chatmessage cm
-                         JOIN wchat_chat c ON cm.chat_id = c.id AND c.deleted = false
-                         JOIN wchat_chatmember cmem ON cm.chat_id = cmem.chat_id
-                         LEFT JOIN "user_user" u1 ON c.created_by_id = u1.id
-                         LEFT JOIN wchat_chatmember cm_other
-                                   ON cm_other.chat_id = c.id AND cm_other.user_id != %(user_id)s
-                         LEFT JOIN "user_user" u2 ON cm_other.user_id = u2.id
-                WHERE cm.deleted = FALSE
-                  AND cmem.user_id = %(user_id)s
-                  AND cm.text ILIKE %(search)s
-                ORDER BY cm.created_date DESC; \
-                """
-
-        cursor = connection.cursor()
-        params = {
-            'user_id': user_id,
-            'search': f'%{search}%'
-        }
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        data = []
-
-        for row in result:
-            data.append({
-                'message_id': row[0],
-                'message_text': row[1],
-                'message_type': row[2],
-                'created_date': row[3],
-                'chat_id': row[4],
-                'chat_type': row[5],
-                'chat_title': row[6] if row[6] else 'Unknown',
-                'uid': row[7],
-            })
-
-        count = len(data)
-        return Response({'count': count, 'data': data})
+        try:
+            page_size = int(self.request.GET.get('page_size') or SEARCH_PAGE_SIZE)
+            data = search_messages(user_id, search, self.request.GET.get('cursor'), page_size)
+        except ValueError:
+            raise ValidationError2({"message": "Invalid cursor or page_size."})
+        return Response(data)
 
 
 class MessageLinkListView(generics.ListAPIView):
@@ -933,28 +836,20 @@ class ChatFileCountsView(views.APIView):
             message = get_response_message(request, 650)
             return Response(message, status=status.HTTP_403_FORBIDDEN)
 
-        # Group by message file types
-        sql = """
-              SELECT count(*) AS count, type
-              FROM wchat_chatmessage cm
-              WHERE chat_id = %(chat_id)s
-                AND deleted = false
-                AND type in %(type)s
-              GROUP BY type \
-              """
-
-        params = {
-            'chat_id': chat_id,
-            'type': CONSTANTS.CHAT.MESSAGE_TYPES.FILES
-        }
+        # Maintained per (chat, type) by the ChatMessage signals
+        file_counts = get_file_counts(chat_id)
 
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
+        return Response(file_counts)
 
-        file_counts = {row[1]: row[0] for row in rows}
 
-        return Response(file_counts)
+class SocketEventCountersView(views.APIView):
+    """
+    Forwarded and dropped websocket commands (typing coalescing and rate limits), per command.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_socket_event_counters())
 
 
 class GetMessagePageView(generics.GenericAPIView):
@@ -976,24 +871,28 @@ class GetMessagePageView(generics.GenericAPIView):
 
         # Get the target message
         try:
-            target_message = ChatMessage.objects.get(id=message_id, chat_id=chat_id)
+            target_message = (ChatMessage.objects.only('id', 'chat_id', 'created_date')
+                              .get(id=message_id, chat_id=chat_id))
         except ChatMessage.DoesNotExist:
             raise Http404
 
-        # Get all message ids in the chat
-        all_message_ids = list(
-            ChatMessage.objects.filter(chat_id=chat_id).
-            order_by('-created_date').
-            values_list('id', flat=True))
-
-        # Find the index of the target message
-        try:
-            target_index = all_message_ids.index(target_message.id)
-            page = (target_index // page_size) + 1
-        except ValueError:
-            raise Http404
+        # Rank of the target message, counted on the (chat, created_date, id) index
+        position = get_message_position(target_message)
+        page = (position // page_size) + 1
+        data = {'page': page, 'page_size': page_size}
+
+        if serializer.validated_data.get('with_messages'):
+            queryset = (
+                ChatMessage.objects.filter(chat_id=chat_id)
+                .select_related('sender', 'replied_to', 'replied_to__sender')
+                .prefetch_related('attachments', 'reactions')
+                .annotate(is_read_annotated=Exists(
+                    MessageReceiver.objects.filter(message_id=OuterRef('pk'), read__isnull=False)))
+            )
+            items = get_message_page_items(queryset, queryset.get(id=message_id), position, page_size)
+            data['results'] = MessageSerializer(items, many=True, context=self.get_serializer_context()).data
 
-        return Response({'page': page, 'page_size': page_size})
+        return Response(data)
 
 
 class GetMessageCursorView(generics.GenericAPIView):
@@ -1,23 +1,17 @@
-from django.contrib.contenttypes.models import ContentType
 from rest_framework import permissions
 
-from apps.user.models import ProjectPermission, RoleModel
+from apps.user.permission_set import has_permission
 
 
 class IsUserRequestAllowed(permissions.BasePermission):
+    """
+    Allows the request if the user's roles or direct permissions grant
+    (request method, url name of the matched route).
+    """
 
     def has_permission(self, request, view):
-        # if request.user.is_superuser:
-        #     return True
-        # else:
-        method = request.method.upper()
         user = request.user
-        role = user.role.id if user.role else None
-        model = view.__class__.queryset.model
-        path = request.path.split('/')[3]
-        content_type = ContentType.objects.get_for_model(model).id
-        has_perm = RoleModel.objects.filter(id=role, permissions__content_type_id=content_type,
-                                            permissions__methods__overlap=[method],
-                                            permissions__url_path=path)
-        # print(has_perm.exists())
-        return has_perm.exists()
+        if not user or not user.is_authenticated:
+            return False
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        return has_permission(user.id, request.method.upper(), url_name)
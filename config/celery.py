@@ -27,6 +27,14 @@ app.conf.beat_schedule = {
         'task': 'apps.company.tasks.update_company_branches',
         'schedule': crontab(minute='0', hour='0'),
     },
+    '0005-core-precompute-effective-managers': {
+        'task': 'apps.core.tasks.precompute_effective_managers',
+        'schedule': crontab(minute='5', hour='0'),
+    },
+    '0030-wchat-purge-message-receivers': {
+        'task': 'purge_message_receivers',
+        'schedule': crontab(minute='30', hour='0'),
+    },
     '0100-company-sync-positions': {
         'task': 'apps.company.tasks.update_positions',
         'schedule': crontab(minute='0', hour='1'),
@@ -0,0 +1,92 @@
+import logging
+import time
+from collections import defaultdict
+
+from channels_redis.core import RedisChannelLayer
+
+logger = logging.getLogger(__name__)
+
+# Same delivery script RedisChannelLayer.group_send uses for a single group
+GROUP_SEND_LUA = """
+    local over_capacity = 0
+    local current_time = ARGV[#ARGV - 1]
+    local expiry = ARGV[#ARGV]
+    for i=1,#KEYS do
+        if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+            redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+            redis.call('EXPIRE', KEYS[i], expiry)
+        else
+            over_capacity = over_capacity + 1
+        end
+    end
+    return over_capacity
+"""
+
+
+class BatchedRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer with `group_send_many`, which delivers one message to many groups.
+    Group members are read with one pipeline per Redis host and the message is
+    delivered with one Lua call per host (in chunks), instead of a full
+    `group_send` round trip per group.
+    """
+    send_chunk_size = 1000
+
+    async def group_send_many(self, groups, message):
+        groups = list(dict.fromkeys(groups))
+        for group in groups:
+            assert self.valid_group_name(group), "Group name not valid"
+
+        channel_names = await self._group_channels(groups)
+        if not channel_names:
+            return
+
+        (
+            connection_to_channel_keys,
+            channel_keys_to_message,
+            channel_keys_to_capacity,
+        ) = self._map_channel_keys_to_connection(channel_names, message)
+
+        for connection_index, channel_redis_keys in connection_to_channel_keys.items():
+            connection = self.connection(connection_index)
+            pipe = connection.pipeline(transaction=False)
+            for key in channel_redis_keys:
+                pipe.zremrangebyscore(key, min=0, max=int(time.time()) - int(self.expiry))
+            await pipe.execute()
+
+            for i in range(0, len(channel_redis_keys), self.send_chunk_size):
+                keys = channel_redis_keys[i:i + self.send_chunk_size]
+                args = [channel_keys_to_message[key] for key in keys]
+                args += [channel_keys_to_capacity[key] for key in keys]
+                args += [time.time(), self.expiry]
+                channels_over_capacity = await connection.eval(GROUP_SEND_LUA, len(keys), *keys, *args)
+                if channels_over_capacity > 0:
+                    logger.info(
+                        "%s of %s channels over capacity in %s groups",
+                        channels_over_capacity,
+                        len(channel_names),
+                        len(groups),
+                    )
+
+    async def _group_channels(self, groups) -> list:
+        """
+        Members of all groups, deduplicated, read with one pipeline per Redis host.
+        """
+        groups_by_connection = defaultdict(list)
+        for group in groups:
+            groups_by_connection[self.consistent_hash(group)].append(group)
+
+        expired_before = int(time.time()) - self.group_expiry
+        channel_names = {}
+        for connection_index, connection_groups in groups_by_connection.items():
+            pipe = self.connection(connection_index).pipeline(transaction=False)
+            for group in connection_groups:
+                key = self._group_key(group)
+                # Discard old channels based on group_expiry
+                pipe.zremrangebyscore(key, min=0, max=expired_before)
+                pipe.zrange(key, 0, -1)
+            results = await pipe.execute()
+            for names in results[1::2]:
+                for name in names:
+                    channel_names[name.decode('utf8')] = None
+        return list(channel_names)
@@ -12,8 +12,18 @@ from apps.wchat.models import (
     ChatMessageFile,
     ChatMessageReaction,
 )
+from apps.wchat.services import message_receiver_cutoff
 from apps.wchat.tasks import deliver_message, send_about_message_outside_chat, send_message_read
 from config.redis_client import redis_client
+from config.socket_throttle import (
+    COMMAND_BURST,
+    COMMAND_RATE,
+    RATE_LIMITED_COMMANDS,
+    THROTTLED_COMMANDS,
+    SocketEventCounters,
+    TokenBucket,
+    TypingTracker,
+)
 from utils.exception import SocketClientError, ValidationError2
 from utils.tools import update_user_last_seen
 from utils.utils import as_str
@@ -22,6 +32,9 @@ from utils.utils import as_str
 class SocketConsumer(JsonWebsocketConsumer):
     def connect(self):
         self.user = self.scope['user']
+        self.typing_tracker = TypingTracker(self.user.id, self._stopped_typing)
+        self.event_counters = SocketEventCounters()
+        self.command_buckets = {}
         # Join users group
         async_to_sync(self.channel_layer.group_add)(
             'users',
@@ -40,11 +53,23 @@ class SocketConsumer(JsonWebsocketConsumer):
 
         if self.user.is_authenticated:
             self.set_user_offline()
+        self.typing_tracker.stop_all()
+        self.event_counters.flush()
         self.close()
 
     # Receive json message from WebSocket
     def receive_json(self, content, **kwargs):
         command = content.get('command')
+        if command in RATE_LIMITED_COMMANDS and not self._allow_command(command):
+            return
+        if command in THROTTLED_COMMANDS and not self._allow_command(command):
+            self.send_error(
+                action=command,
+                code="throttled",
+                message="Too many commands, try again later",
+                context={"retry_after": round(self.command_buckets[command].retry_after(), 2)},
+            )
+            return
         if command == 'ping':
             self.pong(content)
         elif command == 'chat_handshake':
@@ -64,6 +89,19 @@ class SocketConsumer(JsonWebsocketConsumer):
         elif command == 'user_offline':
             self.set_user_offline()
 
+    def _allow_command(self, command) -> bool:
+        """
+        Per-connection token bucket for commands that clients tend to repeat in bursts.
+        """
+        bucket = self.command_buckets.get(command)
+        if bucket is None:
+            bucket = self.command_buckets[command] = TokenBucket(COMMAND_RATE, COMMAND_BURST)
+        if bucket.allow():
+            self.event_counters.forwarded(command)
+            return True
+        self.event_counters.dropped(command)
+        return False
+
     def set_user_online(self):
         """Mark the user as online in Redis."""
         redis_client.set(f'user_{self.user.id}', '1', ex=1200)
@@ -345,6 +383,7 @@ class SocketConsumer(JsonWebsocketConsumer):
             # 4) Broadcast + side effects only after commit
             def _after_commit():
                 group = f"{chat_type}_{chat_id}"  # or your existing convention e.g., f"{chat.type}_{chat_id}"
+                self.typing_tracker.stop(chat_type, chat_id)
                 payload = self._build_event_payload(
                     message=message,
                     replied_to_payload=replied_to_payload,
@@ -485,12 +524,11 @@ class SocketConsumer(JsonWebsocketConsumer):
             chat_type = data.get('chat_type')
             chat = f'{chat_type}_{chat_id}'
             emoji = data.get('emoji')
-            user = self.user
 
             # Check if user has already reacted to the message
             reaction, created = ChatMessageReaction.objects.get_or_create(
                 message_id=message_id,
-                user=user
+                user_id=self.user.id
             )
             if not created:
                 if reaction.emoji == emoji:
@@ -513,7 +551,7 @@ class SocketConsumer(JsonWebsocketConsumer):
                 chat,
                 {
                     "type": "chat.message.reaction",
-                    "user": user.simple_dict(),
+                    "user": self._user_simple_dict(),
                     "message_id": message_id,
                     "emoji": emoji,
                     "action": action
@@ -555,7 +593,7 @@ class SocketConsumer(JsonWebsocketConsumer):
             chat,
             {
                 "type": "chat.message.read",
-                "user": self.user.simple_dict(),
+                "user": self._user_simple_dict(),
                 "message_id": message_id
             }
         )
@@ -572,6 +610,13 @@ class SocketConsumer(JsonWebsocketConsumer):
               WHERE m.chat_id = %(chat_id)s
                 AND m.sender_id <> %(user_id)s
                 AND m.id <= %(message_id)s
+                -- no new rows for messages the retention purge would delete again
+                AND (%(before)s::timestamptz IS NULL
+                  OR m.created_date >= %(before)s
+                  OR EXISTS (SELECT 1
+                             FROM wchat_messagereceiver AS mr
+                             WHERE mr.receiver_id = %(user_id)s
+                               AND mr.message_id = m.id))
               ON CONFLICT (receiver_id, message_id) DO UPDATE
                   SET read    = COALESCE(wchat_messagereceiver.read, NOW()),
                       re_read = NOW(); \
@@ -580,7 +625,8 @@ class SocketConsumer(JsonWebsocketConsumer):
         params = {
             "user_id": user_id,
             "chat_id": chat_id,
-            "message_id": message_id
+            "message_id": message_id,
+            "before": message_receiver_cutoff(),
         }
 
         try:
@@ -626,12 +672,38 @@ class SocketConsumer(JsonWebsocketConsumer):
         except SocketClientError as e:
             return self.handle_client_error(e)
 
+        # Coalesce keystrokes: at most one broadcast per (user, chat) per interval
+        if not self.typing_tracker.typing(chat_type, chat_id):
+            self.event_counters.dropped('typing')
+            return
+        self.event_counters.forwarded('typing')
+
         # Send message to the group
         async_to_sync(self.channel_layer.group_send)(
             chat,
             {
                 "type": "chat.typing",
-                "user": self.user.simple_dict(),
+                "user": self._user_simple_dict(),
+                "chat_id": chat_id,
+                "chat_type": chat_type
+            }
+        )
+
+    def _user_simple_dict(self):
+        # built once per connection: the typing tracker's timer thread must not touch the database
+        if getattr(self, '_simple_user_dict', None) is None:
+            self._simple_user_dict = self.user.simple_dict()
+        return self._simple_user_dict
+
+    def _stopped_typing(self, chat_type, chat_id):
+        """
+        Called by the typing tracker after inactivity, a sent message or disconnect.
+        """
+        async_to_sync(self.channel_layer.group_send)(
+            f'{chat_type}_{chat_id}',
+            {
+                "type": "chat.stopped_typing",
+                "user": self._user_simple_dict(),
                 "chat_id": chat_id,
                 "chat_type": chat_type
             }
@@ -648,6 +720,17 @@ class SocketConsumer(JsonWebsocketConsumer):
             'chat_type': event.get('chat_type')
         })
 
+    def chat_stopped_typing(self, event):
+        """
+        This helper method is used to send stopped typing status
+        """
+        self.send_json({
+            'type': 'stopped_typing',
+            'user': event.get('user'),
+            'chat_id': event.get('chat_id'),
+            'chat_type': event.get('chat_type')
+        })
+
     def handle_client_error(self, e):
         """
         Called when a ClientError is raised.
@@ -4,13 +4,12 @@ from urllib.parse import parse_qs
 from channels.auth import AuthMiddlewareStack
 from channels.db import database_sync_to_async
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.db import close_old_connections
 from jwt import decode as jwt_decode
 from jwt import InvalidSignatureError, ExpiredSignatureError, DecodeError
 
-User = get_user_model()
+from apps.user.principal import get_user_principal
 
 
 class JWTAuthMiddleware:
@@ -53,10 +52,10 @@ class JWTAuthMiddleware:
 
     @database_sync_to_async
     def get_user(self, user_id):
-        try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        principal = get_user_principal(user_id)
+        if principal is None:
             return AnonymousUser()
+        return principal
 
 
 def JWTAuthMiddlewareStack(app):
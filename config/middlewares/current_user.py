@@ -35,6 +35,13 @@ def get_current_user():
     return getattr(_thread_locals, 'user_{0}'.format(current_thread().name), None)
 
 
+def set_current_user(user):
+    """
+    Sets the user of the current thread outside a request, e.g. in Celery tasks.
+    """
+    setattr(_thread_locals, 'user_{0}'.format(current_thread().name), user)
+
+
 def get_signed_in_user():
     return get_current_user().id if isinstance(get_current_user().id, Model) else None
 
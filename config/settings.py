@@ -119,7 +119,7 @@ ASGI_APPLICATION = 'config.asgi.application'
 
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'config.channel_layers.BatchedRedisChannelLayer',
         'CONFIG': {
             'hosts': [(os.getenv('BROKER_IP'), 6379)],
             'capacity': 1500,
@@ -241,6 +241,7 @@ CELERY_IMPORTS = (
     'apps.compose.tasks',
     'apps.news.tasks',
     'apps.wchat.tasks',
+    'apps.wcalendar.tasks',
     'apps.hr.tasks',
 )
 CELERY_RESULT_BACKEND = 'django-db'
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import Counter
+
+from config.redis_client import redis_client
+
+# at most one typing broadcast per (user, chat) per interval, across all connections of the user
+TYPING_INTERVAL = float(os.getenv('SOCKET_TYPING_INTERVAL', 3))
+# "stopped typing" is broadcast after this many seconds without a typing command
+TYPING_TIMEOUT = float(os.getenv('SOCKET_TYPING_TIMEOUT', 6))
+
+# per-connection token bucket for commands a client may repeat in bursts
+COMMAND_RATE = float(os.getenv('SOCKET_COMMAND_RATE', 5))
+COMMAND_BURST = int(os.getenv('SOCKET_COMMAND_BURST', 20))
+# idempotent commands the client repeats anyway: those over the limit are dropped silently
+RATE_LIMITED_COMMANDS = (
+    'ping',
+    'chat_handshake',
+    'user_handshake',
+)
+# commands that change state: those over the limit are rejected with a `throttled` error
+# so the client knows the command was not applied and can send it again
+THROTTLED_COMMANDS = (
+    'message_reaction',
+    'message_read',
+    'user_online',
+    'user_offline',
+)
+
+SOCKET_EVENT_COUNTERS_KEY = 'socket_event_counters'
+COUNTERS_FLUSH_INTERVAL = 10
+TYPING_SLOT_KEY = 'typing:{}:{}_{}'
+
+
+class TokenBucket:
+    """
+    Allows `rate` events per second on average and bursts of up to `burst` events.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def allow(self) -> bool:
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def retry_after(self) -> float:
+        """
+        Seconds until `allow()` lets the next event through.
+        """
+        if not self.rate:
+            return 0.0
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class SocketEventCounters:
+    """
+    Forwarded/dropped counters of one connection. They are added to a shared Redis hash
+    every COUNTERS_FLUSH_INTERVAL seconds and on disconnect, not on every event.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def forwarded(self, command):
+        self._add(f'{command}:forwarded')
+
+    def dropped(self, command):
+        self._add(f'{command}:dropped')
+
+    def _add(self, field):
+        with self._lock:
+            self._counts[field] += 1
+        if time.monotonic() - self._flushed_at >= COUNTERS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return
+        pipe = redis_client.pipeline(transaction=False)
+        for field, count in counts.items():
+            pipe.hincrby(SOCKET_EVENT_COUNTERS_KEY, field, count)
+        pipe.execute()
+
+
+def get_socket_event_counters() -> dict:
+    """
+    Returns {command: {'forwarded': n, 'dropped': n}} summed over all connections.
+    """
+    counters = {}
+    for field, count in redis_client.hgetall(SOCKET_EVENT_COUNTERS_KEY).items():
+        command, _, kind = field.rpartition(':')
+        counters.setdefault(command, {'forwarded': 0, 'dropped': 0})[kind] = int(count)
+    return counters
+
+
+class TypingTracker:
+    """
+    Coalesces the typing commands of one connection.
+
+    `typing()` tells whether a typing command should be broadcast: it is dropped if this
+    connection, or another connection of the same user, broadcast one for the chat less
+    than TYPING_INTERVAL seconds ago. Every typing command, dropped or not, keeps the chat
+    active; `on_stop(chat_type, chat_id)` is called once the chat has been inactive for
+    TYPING_TIMEOUT seconds, or on `stop()`.
+    """
+
+    def __init__(self, user_id, on_stop):
+        self.user_id = user_id
+        self.on_stop = on_stop
+        self._lock = threading.Lock()
+        self._sent_at = {}
+        self._active_at = {}
+        self._timers = {}
+        self._chats = {}
+
+    def typing(self, chat_type, chat_id) -> bool:
+        chat = (chat_type, str(chat_id))
+        now = time.monotonic()
+        with self._lock:
+            self._chats[chat] = (chat_type, chat_id)
+            self._active_at[chat] = now
+            if chat not in self._timers:
+                self._schedule(chat, TYPING_TIMEOUT)
+            if now - self._sent_at.get(chat, float('-inf')) < TYPING_INTERVAL:
+                return False
+
+        slot = TYPING_SLOT_KEY.format(self.user_id, chat_type, chat_id)
+        if not redis_client.set(slot, 1, nx=True, px=int(TYPING_INTERVAL * 1000)):
+            return False
+        with self._lock:
+            self._sent_at[chat] = now
+        return True
+
+    def stop(self, chat_type, chat_id):
+        chat = (chat_type, str(chat_id))
+        with self._lock:
+            timer = self._timers.pop(chat, None)
+            self._active_at.pop(chat, None)
+            was_sent = self._sent_at.pop(chat, None) is not None
+            chat_type, chat_id = self._chats.pop(chat, (chat_type, chat_id))
+        if timer is None:
+            return
+        timer.cancel()
+        if was_sent:
+            redis_client.delete(TYPING_SLOT_KEY.format(self.user_id, chat_type, chat_id))
+            self.on_stop(chat_type, chat_id)
+
+    def stop_all(self):
+        with self._lock:
+            chats = list(self._chats.values())
+        for chat_type, chat_id in chats:
+            self.stop(chat_type, chat_id)
+
+    def _schedule(self, chat, delay):
+        timer = threading.Timer(delay, self._expire, (chat,))
+        timer.daemon = True
+        self._timers[chat] = timer
+        timer.start()
+
+    def _expire(self, chat):
+        with self._lock:
+            if chat not in self._timers:
+                return
+            idle = time.monotonic() - self._active_at.get(chat, 0)
+            if idle < TYPING_TIMEOUT:
+                # typed again meanwhile: wait for the rest of the timeout instead of a timer per keystroke
+                self._schedule(chat, TYPING_TIMEOUT - idle)
+                return
+        self.stop(*chat)
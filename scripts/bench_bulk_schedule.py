@@ -0,0 +1,86 @@
+"""
+Benchmark assigning a default work schedule to many employees.
+
+    python manage.py runscript bench_bulk_schedule
+    python manage.py runscript bench_bulk_schedule --script-args 30000
+
+Arguments: employees. Half of them start with a default on another schedule.
+Compares the previous chunked implementation (lock, rebuild in Python, bulk_update +
+bulk_create per 500 employees) with the set-based `bulk_assign_default_schedule`.
+Everything is created inside a transaction that is rolled back.
+"""
+import datetime
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.hr.models import EmployeeSchedule, WorkSchedule
+from apps.hr.services.scheduling import bulk_assign_default_schedule
+from apps.user.models import User
+
+BULK_CHUNK = 500
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _chunked_assign(schedule_id, employee_ids):
+    """The previous implementation, without the notes and modified_by handling."""
+    created = 0
+    for i in range(0, len(employee_ids), BULK_CHUNK):
+        chunk = employee_ids[i:i + BULK_CHUNK]
+        rows_by_emp = {}
+        for row in EmployeeSchedule.objects.select_for_update().filter(employee_id__in=chunk):
+            rows_by_emp.setdefault(row.employee_id, []).append(row)
+        to_update, to_create = [], []
+        for eid in chunk:
+            rows = rows_by_emp.get(eid, [])
+            for r in rows:
+                if r.is_default:
+                    r.is_default = False
+                    to_update.append(r)
+            if not any(r.schedule_id == schedule_id for r in rows):
+                to_create.append(EmployeeSchedule(employee_id=eid, schedule_id=schedule_id, is_default=True))
+        if to_update:
+            EmployeeSchedule.objects.bulk_update(to_update, ["is_default", "modified_by", "notes", "modified_date"])
+        if to_create:
+            EmployeeSchedule.objects.bulk_create(to_create, batch_size=BULK_CHUNK)
+            created += len(to_create)
+    return created
+
+
+def _measure(label, func):
+    try:
+        with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            raise _Rollback
+    except _Rollback:
+        pass
+    print(f"{label:<22} {elapsed:8.2f} s  {len(ctx.captured_queries):6d} queries")
+
+
+def run(*args):
+    employees = int(args[0]) if args else 30000
+
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [User(username=f'bench_schedule_{i}') for i in range(employees)], batch_size=5000
+            )
+            ids = [u.id for u in users]
+            day, night = [WorkSchedule.objects.create(name=name, start_time=datetime.time(9),
+                                                      end_time=datetime.time(18)) for name in ('Day', 'Night')]
+            EmployeeSchedule.objects.bulk_create(
+                [EmployeeSchedule(employee_id=i, schedule=day, is_default=True) for i in ids[::2]], batch_size=5000
+            )
+
+            print(f"{employees} employees, {len(ids[::2])} with another default")
+            _measure('chunked (old)', lambda: _chunked_assign(night.id, ids))
+            _measure('set-based', lambda: bulk_assign_default_schedule(schedule_id=night.id, employee_ids=ids))
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,84 @@
+"""
+Benchmark participant creation and sms fan-out for a 500-participant event.
+
+    python manage.py runscript bench_calendar_participants
+    python manage.py runscript bench_calendar_participants --script-args 500 0.05
+
+Arguments: number of participants, simulated sms gateway latency in seconds.
+Everything runs inside a transaction that is rolled back at the end.
+"""
+import time
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.user.models import User
+from apps.wcalendar import tasks
+from apps.wcalendar.models import CalendarModel, CalendarParticipant
+from apps.wcalendar.services import create_participants, sync_participants
+from utils.constants import CONSTANTS
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms  {len(ctx.captured_queries):6} queries")
+    return result
+
+
+def _fake_gateway(latency):
+    def _send(phone, text):
+        time.sleep(latency)
+        return True, None
+
+    return _send
+
+
+def run(*args):
+    size = int(args[0]) if args else 500
+    latency = float(args[1]) if len(args) > 1 else 0.05
+
+    users = list(User.objects.exclude(phone__isnull=True).only('id', 'phone')[:size])
+    if len(users) < size:
+        print(f"Only {len(users)} users with a phone number found, benchmarking with them")
+    payload = [{'user': u, 'is_informed': False} for u in users]
+
+    try:
+        with transaction.atomic():
+            calendar = CalendarModel.objects.create(
+                title='benchmark', start_date=timezone.now(), source='zoom', notify_by=CONSTANTS.NOTIFY_BY.SMS)
+
+            _measure('loop create (old)', lambda: [
+                CalendarParticipant.objects.create(calendar=calendar, **item) for item in payload])
+            CalendarParticipant.objects.filter(calendar=calendar).delete()
+
+            created = _measure('bulk create', lambda: create_participants(
+                calendar, payload, CONSTANTS.NOTIFY_BY.SMS))
+
+            half = [{'id': p.id, 'is_informed': True} for p in created[:len(created) // 2]]
+            _measure('bulk sync (update half, delete half)', lambda: sync_participants(calendar, half))
+            CalendarParticipant.objects.filter(calendar=calendar).delete()
+            created = create_participants(calendar, payload, CONSTANTS.NOTIFY_BY.SMS)
+            ids = [p.id for p in created]
+
+            with mock.patch.object(tasks, 'send_sms_to_phone', _fake_gateway(latency)):
+                _measure('sequential sms (old)', lambda: [
+                    tasks.send_sms_to_phone(u.phone, 'benchmark') for u in users])
+                _measure('batched concurrent sms', lambda: [
+                    tasks.send_calendar_sms_batch(ids[i:i + tasks.SMS_BATCH_SIZE], 'benchmark')
+                    for i in range(0, len(ids), tasks.SMS_BATCH_SIZE)])
+
+            sent = CalendarParticipant.objects.filter(
+                calendar=calendar, sms_status=CONSTANTS.SMS_STATUS.SENT).count()
+            print(f"Recorded as sent: {sent}/{len(ids)}")
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,95 @@
+"""
+Benchmark chat and message search on a generated dataset.
+
+    python manage.py runscript bench_chat_search
+    python manage.py runscript bench_chat_search --script-args 10000000 2000 quarterly
+
+Arguments: number of messages, number of chats, search term.
+The benchmark user is a member of every tenth chat. The dataset is created
+inside a transaction that is rolled back.
+"""
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.user.models import User
+from apps.wchat.models import Chat, ChatMember, ChatMessage
+from apps.wchat.services import search_chats, search_messages
+from utils.constants import CONSTANTS
+
+WORDS = ['report', 'quarterly', 'meeting', 'deadline', 'budget', 'contract', 'approval', 'salom',
+         'hujjat', 'shartnoma', 'договор', 'встреча', 'отчет', 'invoice', 'schedule', 'holiday']
+
+OLD_MESSAGE_SEARCH = """
+    SELECT cm.id, cm.text, cm.type, cm.created_date, c.id, c.type
+    FROM wchat_chatmessage cm
+             JOIN wchat_chat c ON cm.chat_id = c.id AND c.deleted = false
+             JOIN wchat_chatmember cmem ON cm.chat_id = cmem.chat_id
+    WHERE cm.deleted = FALSE
+      AND cmem.user_id = %(user_id)s
+      AND cm.text ILIKE %(search)s
+    ORDER BY cm.created_date DESC
+"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed * 1000:10.1f} ms  {len(ctx.captured_queries):6} queries")
+    return result
+
+
+def _old_message_search(user_id, search):
+    with connection.cursor() as cursor:
+        cursor.execute(OLD_MESSAGE_SEARCH, {'user_id': user_id, 'search': f'%{search}%'})
+        return cursor.fetchall()
+
+
+def _generate(size, chats, user):
+    chat_ids = [c.id for c in Chat.objects.bulk_create(
+        [Chat(type=CONSTANTS.CHAT.TYPES.GROUP, title=f'{WORDS[i % len(WORDS)]} chat {i}') for i in range(chats)])]
+    ChatMember.objects.bulk_create([ChatMember(chat_id=chat_id, user=user) for chat_id in chat_ids[::10]])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {ChatMessage._meta.db_table} "
+            "(uid, sender_id, chat_id, text, edited, deleted, type, is_active, created_date, modified_date) "
+            "SELECT gen_random_uuid(), %s, (%s::int[])[1 + g %% %s], "
+            "(%s::text[])[1 + (g * 7) %% %s] || ' ' || (%s::text[])[1 + (g * 13) %% %s] || ' ' || g, "
+            "false, false, %s, true, now(), now() "
+            "FROM generate_series(1, %s) AS g",
+            [user.id, chat_ids, chats, WORDS, len(WORDS), WORDS, len(WORDS),
+             CONSTANTS.CHAT.MESSAGE_TYPES.DEFAULT, size])
+        cursor.execute(f"ANALYZE {ChatMessage._meta.db_table}")
+        cursor.execute(f"ANALYZE {Chat._meta.db_table}")
+
+
+def run(*args):
+    size = int(args[0]) if args else 10000000
+    chats = int(args[1]) if len(args) > 1 else 2000
+    term = args[2] if len(args) > 2 else 'quarterly'
+    user = User.objects.first()
+    if user is None:
+        print('No user found')
+        return
+
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            _generate(size, chats, user)
+            print(f"Generated {size} messages in {chats} chats in {time.perf_counter() - started:.1f} s")
+
+            old = _measure('messages, ILIKE (old)', lambda: _old_message_search(user.id, term))
+            first = _measure('messages, full-text first page', lambda: search_messages(user.id, term))
+            _measure('messages, full-text next page', lambda: search_messages(user.id, term, first['next']))
+            print(f"Matches: old {len(old)}, new {first['count']}")
+            _measure('chats, trigram', lambda: search_chats(user.id, term[:5]))
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,102 @@
+"""
+Benchmark storage size and reconstruction latency of compose version history.
+
+    python manage.py runscript bench_compose_versions
+    python manage.py runscript bench_compose_versions --script-args 200 60
+
+Arguments: versions (edits of one document), document size in KB.
+Stores the same edit history as plain old/new texts and as snapshots + zstandard deltas,
+compares the table size taken by each and times reconstruction of the oldest and latest version.
+Everything is created inside a transaction that is rolled back.
+"""
+import random
+import time
+
+from django.db import connection, transaction
+
+from apps.compose.models import Compose, ComposeVersionModel
+from apps.compose.versioning import VERSION_SNAPSHOT_INTERVAL
+
+SYLLABLES = 'ha ju jat buy ruq xiz mat sa fa ri bo yi cha tas diq lash bank fi li al rah bar ij ro mud dat'.split()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+
+def _document(size_kb, rng):
+    paragraphs = []
+    while sum(len(p) for p in paragraphs) < size_kb * 1024:
+        paragraphs.append(f"<p>{' '.join(_word(rng) for _ in range(60))}</p>")
+    return paragraphs
+
+
+def _edit(paragraphs, rng):
+    paragraphs = list(paragraphs)
+    i = rng.randrange(len(paragraphs))
+    words = paragraphs[i][3:-4].split()
+    words[rng.randrange(len(words))] = _word(rng).upper()
+    paragraphs[i] = f"<p>{' '.join(words)}</p>"
+    return paragraphs
+
+
+def _table_size(ids):
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT COALESCE(SUM(pg_column_size(old_text) + COALESCE(pg_column_size(new_text), 0)
+                                + COALESCE(pg_column_size(data), 0)), 0)
+            FROM {ComposeVersionModel._meta.db_table} WHERE id = ANY(%s)
+        """, [ids])
+        return cursor.fetchone()[0]
+
+
+def _time_load(label, version_id, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        version = ComposeVersionModel.objects.defer('data').get(id=version_id)
+        ComposeVersionModel.load_texts([version])
+    print(f"  {label:<10} {(time.perf_counter() - started) / repeat * 1000:8.2f} ms")
+
+
+def run(*args):
+    versions = int(args[0]) if args else 200
+    size_kb = int(args[1]) if len(args) > 1 else 60
+    rng = random.Random(42)
+
+    try:
+        with transaction.atomic():
+            compose = Compose.objects.create()
+            history, paragraphs = [], _document(size_kb, rng)
+            for _ in range(versions):
+                edited = _edit(paragraphs, rng)
+                history.append((''.join(paragraphs), ''.join(edited)))
+                paragraphs = edited
+
+            plain = ComposeVersionModel.objects.bulk_create([
+                ComposeVersionModel(old_text=old_text, new_text=new_text) for old_text, new_text in history
+            ])
+            started = time.perf_counter()
+            encoded = [ComposeVersionModel.create_history(old_text, new_text, compose, None)
+                       for old_text, new_text in history]
+            write_ms = (time.perf_counter() - started) / versions * 1000
+
+            plain_size = _table_size([v.id for v in plain])
+            encoded_size = _table_size([v.id for v in encoded])
+            print(f"{versions} versions of a {size_kb} KB document, snapshot every {VERSION_SNAPSHOT_INTERVAL}")
+            print(f"  plain      {plain_size / 1024:10.1f} KB")
+            print(f"  delta      {encoded_size / 1024:10.1f} KB  ({plain_size / max(encoded_size, 1):.1f}x smaller, "
+                  f"{write_ms:.2f} ms/write)")
+
+            # the latest version of a full chain needs the most deltas
+            latest_full_chain = encoded[(versions // VERSION_SNAPSHOT_INTERVAL) * VERSION_SNAPSHOT_INTERVAL - 1]
+            _time_load('oldest', encoded[0].id)
+            _time_load('latest', encoded[-1].id)
+            _time_load('worst', latest_full_chain.id)
+
+            raise _Rollback
+    except _Rollback:
+        pass
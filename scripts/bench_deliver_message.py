@@ -0,0 +1,67 @@
+"""
+Benchmark delivering one message to a large group chat.
+
+    python manage.py runscript bench_deliver_message
+    python manage.py runscript bench_deliver_message --script-args 10000 5
+
+Arguments: number of group members, number of messages.
+Compares the old per-row bulk_create of MessageReceiver with the set-based
+`deliver_message`. Users, chat and receivers are created inside a transaction
+that is rolled back.
+"""
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.user.models import User
+from apps.wchat.models import Chat, ChatMember, ChatMessage, MessageReceiver
+from apps.wchat.tasks import deliver_message
+from utils.constants import CONSTANTS
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms  {len(ctx.captured_queries):6} queries")
+    return result
+
+
+def _old_deliver_message(message_id, chat_id, sender_id):
+    qs = ChatMember.objects.filter(chat_id=chat_id).exclude(user_id=sender_id)
+    rows = (
+        MessageReceiver(message_id=message_id, receiver_id=uid, delivered=timezone.now())
+        for uid in qs.values_list("user_id", flat=True).iterator(chunk_size=10000)
+    )
+    MessageReceiver.objects.bulk_create(rows, batch_size=10000, ignore_conflicts=True)
+
+
+def run(*args):
+    members = int(args[0]) if args else 10000
+    messages = int(args[1]) if len(args) > 1 else 5
+
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [User(username=f'bench_deliver_{i}') for i in range(members)], batch_size=5000)
+            chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='benchmark')
+            ChatMember.objects.bulk_create([ChatMember(chat=chat, user=u) for u in users], batch_size=5000)
+            sender = users[0]
+            print(f"Chat {chat.id}: {members} members")
+
+            for i in range(messages):
+                old = ChatMessage.objects.create(chat=chat, sender=sender, text=f'old {i}')
+                new = ChatMessage.objects.create(chat=chat, sender=sender, text=f'new {i}')
+                _measure('bulk_create (old)', lambda: _old_deliver_message(old.id, chat.id, sender.id))
+                _measure('INSERT ... SELECT', lambda: deliver_message(new.id, chat.id, sender.id))
+
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,57 @@
+"""
+Load-test E-IMZO timestamp + verification calls against the local stub service.
+
+    python manage.py runscript bench_e_imzo
+    python manage.py runscript bench_e_imzo --script-args 500 16 0.005
+
+Arguments: signatures, concurrent threads, simulated service latency per call in seconds.
+Compares bare `requests.post` calls (a new connection each) with the pooled client.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from apps.user.tests.fake_e_imzo import FakeEImzoServer
+from utils.e_imzo import EImzoClient
+
+
+def _old_sign(server):
+    response = requests.post(f'{server.url}/timestamp', data='pkcs7')
+    response.raise_for_status()
+    response = requests.post(f'{server.url}/verify', data=response.json()['pkcs7b64'])
+    response.raise_for_status()
+    return response.json()
+
+
+def _pooled_sign(client, server):
+    ts = client.post('timestamp', f'{server.url}/timestamp', 'pkcs7', {})
+    return client.post('verify', f'{server.url}/verify', ts['pkcs7b64'], {})
+
+
+def _measure(label, server, func, signatures, threads):
+    connections = server.connections
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: func(), range(signatures)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {signatures / elapsed:8.1f} signatures/s  "
+          f"{server.connections - connections:5d} connections")
+
+
+def run(*args):
+    signatures = int(args[0]) if args else 500
+    threads = int(args[1]) if len(args) > 1 else 16
+    latency = float(args[2]) if len(args) > 2 else 0.005
+
+    server = FakeEImzoServer(latency=latency).start()
+    client = EImzoClient(pool_size=threads)
+    try:
+        _measure('old (requests.post)', server, lambda: _old_sign(server), signatures, threads)
+        _measure('pooled client', server, lambda: _pooled_sign(client, server), signatures, threads)
+        for endpoint, stats in client.stats.snapshot().items():
+            print(f"  {endpoint:<10} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+                  f"max {stats['max_ms']:7.2f} ms  errors {stats['errors']}")
+    finally:
+        client.session.close()
+        server.stop()
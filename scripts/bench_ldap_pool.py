@@ -0,0 +1,80 @@
+"""
+Load-test LDAP logins against the in-process fake directory, without Active Directory.
+
+    python manage.py runscript bench_ldap_pool
+    python manage.py runscript bench_ldap_pool --script-args 500 16 0.005
+
+Arguments: logins, concurrent threads, simulated server latency per operation in seconds.
+Compares a new connection per login (the old authenticate) with the bind and search pools.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ldap
+
+from apps.user.ldap_pool import LDAPConnectionPool, LDAP_BIND_POOL_SIZE, LDAP_POOL_SIZE
+from apps.user.tests.fake_ldap import FakeLDAPServer
+from utils.circuit_breaker import CircuitBreaker
+
+USERNAME = 'john@cbu.uz'
+PASSWORD = 'secret'
+BASE_DN = 'DC=cbu,DC=uz'
+FILTER = '(|(userPrincipalName=john@cbu.uz)(sAMAccountName=john))'
+
+
+def _old_login(server):
+    conn = ldap.initialize(server.uri)
+    try:
+        conn.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
+        conn.set_option(ldap.OPT_REFERRALS, 0)
+        conn.simple_bind_s(USERNAME, PASSWORD)
+        conn.search_s(BASE_DN, ldap.SCOPE_SUBTREE, filterstr=FILTER, attrlist=['postalCode'])
+    finally:
+        conn.unbind_s()
+
+
+def _pooled_login(bind_pool, search_pool):
+    with bind_pool.connection() as conn:
+        conn.simple_bind_s(USERNAME, PASSWORD)
+    with search_pool.connection() as conn:
+        conn.search_s(BASE_DN, ldap.SCOPE_SUBTREE, filterstr=FILTER, attrlist=['postalCode'])
+
+
+def _measure(label, server, func, logins, threads):
+    connections = server.connections
+    latencies = []
+
+    def _timed(i):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_timed, range(logins)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<24} {logins / elapsed:8.1f} logins/s  p95 {p95:7.2f} ms  "
+          f"{server.connections - connections:5d} connections")
+
+
+def run(*args):
+    logins = int(args[0]) if args else 500
+    threads = int(args[1]) if len(args) > 1 else 16
+    latency = float(args[2]) if len(args) > 2 else 0.005
+
+    server = FakeLDAPServer(users={USERNAME: {'password': PASSWORD, 'postalCode': '12345678901234'}},
+                            latency=latency).start()
+    breaker = CircuitBreaker()
+    bind_pool = LDAPConnectionPool(server.uri, LDAP_BIND_POOL_SIZE, breaker)
+    search_pool = LDAPConnectionPool(server.uri, LDAP_POOL_SIZE, breaker,
+                                     bind_dn=server.service_account[0], password=server.service_account[1])
+    try:
+        _measure('old (per login)', server, lambda: _old_login(server), logins, threads)
+        _measure('pooled', server, lambda: _pooled_login(bind_pool, search_pool), logins, threads)
+    finally:
+        bind_pool.close()
+        search_pool.close()
+        server.stop()
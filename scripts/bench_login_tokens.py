@@ -0,0 +1,64 @@
+"""
+Benchmark token issuance on the login path.
+
+    python manage.py runscript bench_login_tokens
+    python manage.py runscript bench_login_tokens --script-args 2000
+
+Compares the old path (re-fetch the user by username, sign tokens, full `User.save()`)
+with `issue_tokens` on the authenticated user (sign tokens, one `last_login` UPDATE).
+Password hashing is left out: it costs the same on both paths.
+Everything runs inside a transaction that is rolled back.
+"""
+import time
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.user.models import User
+from apps.user.tokens import issue_tokens
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _old_tokens(username):
+    user = User.objects.get(username=username)
+    refresh = RefreshToken.for_user(user)
+    data = {
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'expires_in': str(datetime.fromtimestamp(refresh.access_token.payload['exp'])),
+    }
+    user.last_login = timezone.now()
+    user.save()
+    return data
+
+
+def _measure(label, func, logins):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(logins):
+            func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<28} {logins / elapsed:9.1f} logins/s  "
+          f"{len(ctx.captured_queries) / logins:5.2f} queries/login")
+
+
+def run(*args):
+    logins = int(args[0]) if args else 1000
+    user = User.objects.filter(is_active=True, username__isnull=False).first()
+    if user is None:
+        print('No active user found')
+        return
+
+    try:
+        with transaction.atomic():
+            _measure('old (get + full save)', lambda: _old_tokens(user.username), logins)
+            _measure('issue_tokens', lambda: issue_tokens(user), logins)
+            raise _Rollback
+    except _Rollback:
+        pass
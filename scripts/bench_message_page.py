@@ -0,0 +1,79 @@
+"""
+Benchmark finding the page of a message in a large chat.
+
+    python manage.py runscript bench_message_page
+    python manage.py runscript bench_message_page --script-args 1000000 50
+
+Arguments: number of messages in the chat, page size.
+The synthetic chat is created inside a transaction that is rolled back.
+"""
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.user.models import User
+from apps.wchat.models import Chat, ChatMessage
+from apps.wchat.services import get_message_position, get_message_page_items
+from utils.constants import CONSTANTS
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms  {len(ctx.captured_queries):6} queries")
+    return result
+
+
+def _old_page(message, page_size):
+    ids = list(ChatMessage.objects.filter(chat_id=message.chat_id).
+               order_by('-created_date').
+               values_list('id', flat=True))
+    return ids.index(message.id) // page_size + 1
+
+
+def _new_page(message, page_size):
+    return get_message_position(message) // page_size + 1
+
+
+def run(*args):
+    size = int(args[0]) if args else 1000000
+    page_size = int(args[1]) if len(args) > 1 else 50
+    user = User.objects.first()
+
+    try:
+        with transaction.atomic():
+            chat = Chat.objects.create(type=CONSTANTS.CHAT.TYPES.GROUP, title='benchmark')
+            start = timezone.now() - timedelta(seconds=size)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {ChatMessage._meta.db_table} "
+                    "(uid, sender_id, chat_id, text, edited, deleted, type, is_active, created_date, modified_date) "
+                    "SELECT gen_random_uuid(), %s, %s, 'message ' || g, false, false, %s, true, "
+                    "%s + g * interval '1 second', %s + g * interval '1 second' "
+                    "FROM generate_series(1, %s) AS g",
+                    [user.id if user else None, chat.id, CONSTANTS.CHAT.MESSAGE_TYPES.DEFAULT, start, start, size])
+                cursor.execute(f"ANALYZE {ChatMessage._meta.db_table}")
+            print(f"Chat {chat.id}: {size} messages, page size {page_size}")
+
+            messages = ChatMessage.objects.filter(chat=chat)
+            for label, message in (('newest', messages.order_by('-created_date', '-id').first()),
+                                   ('middle', messages.order_by('-created_date', '-id')[size // 2]),
+                                   ('oldest', messages.order_by('created_date', 'id').first())):
+                old = _measure(f'list.index, {label} (old)', lambda: _old_page(message, page_size))
+                new = _measure(f'rank count, {label}', lambda: _new_page(message, page_size))
+                position = get_message_position(message)
+                _measure(f'keyset page, {label}',
+                         lambda: get_message_page_items(messages, message, position, page_size))
+                print(f"Same page: {old == new} ({new})")
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,82 @@
+"""
+Benchmark department and condition resolution of an HR import.
+
+    python manage.py runscript bench_org_resolver
+    python manage.py runscript bench_org_resolver --script-args 20000 20
+
+Arguments: employees, top-level departments (each gets 10 sub and 100 sub-sub departments).
+Resolves (department code, company) and condition code of every employee with the
+per-row helpers (`get_dept_ids`, `get_condition_id`) and with one `OrgResolver`.
+Everything is created inside a transaction that is rolled back.
+"""
+import random
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.company.models import Company, Department
+from apps.user.models import UserStatus
+from apps.user.services import OrgResolver, get_condition_id, get_dept_ids
+
+CONDITIONS = ['A', 'O', 'B', 'K']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _departments(company, tops):
+    top_level = Department.objects.bulk_create([
+        Department(name=f'Bench {i}', code=f'B{i}', company=company) for i in range(tops)
+    ])
+    subs = Department.objects.bulk_create([
+        Department(name=f'{t.code}.{j}', code=f'{t.code}.{j}', company=company, parent=t)
+        for t in top_level for j in range(10)
+    ])
+    sub_subs = Department.objects.bulk_create([
+        Department(name=f'{s.code}.{k}', code=f'{s.code}.{k}', company=company, parent=s)
+        for s in subs for k in range(10)
+    ])
+    return [d.code for d in sub_subs]
+
+
+def _measure(label, func, employees):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed:8.2f} s  {employees / elapsed:10.0f} employees/s  "
+          f"{len(ctx.captured_queries):6d} queries")
+
+
+def run(*args):
+    employees = int(args[0]) if args else 20000
+    tops = int(args[1]) if len(args) > 1 else 20
+    rng = random.Random(42)
+
+    try:
+        with transaction.atomic():
+            company = Company.objects.create(name='Bench company')
+            codes = _departments(company, tops)
+            for code in CONDITIONS:
+                UserStatus.objects.get_or_create(code=code, defaults={'name': code})
+            rows = [(rng.choice(codes), rng.choice(CONDITIONS)) for _ in range(employees)]
+
+            def _per_row():
+                for code, condition in rows:
+                    get_dept_ids(code, company.id)
+                    get_condition_id(condition)
+
+            def _resolver():
+                resolver = OrgResolver()
+                for code, condition in rows:
+                    resolver.dept_ids(code, company.id)
+                    resolver.condition_id(condition)
+
+            print(f"{employees} employees, {len(codes) * 111 // 100} departments")
+            _measure('per-row queries (old)', _per_row, employees)
+            _measure('OrgResolver', _resolver, employees)
+            raise _Rollback
+    except _Rollback:
+        pass
@@ -0,0 +1,109 @@
+"""
+Benchmark the CPU time spent preparing the HTML of one PDF, without the PDF renderer itself.
+
+    python manage.py runscript bench_pdf_assets
+    python manage.py runscript bench_pdf_assets --script-args 200 <env code>
+
+Arguments: documents to prepare, EnvModel code (defaults to the first one).
+Compares the old path (new QR image, EnvModel query, template lookup and f-string
+signer/receiver blocks per document) with the asset cache.
+"""
+import base64
+import os
+import time
+from io import BytesIO
+
+import qrcode
+from django.db import connection
+from django.template.loader import get_template
+from django.test.utils import CaptureQueriesContext
+
+from apps.company.models import EnvModel
+from apps.pdf_kit.assets import get_compiled_template
+from apps.pdf_kit.generate_letter import BasePDFConfig
+
+TEMPLATE_NAME = 'letters/service.html'
+
+
+def _old_qrcode_base64(check_id):
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=10, border=4)
+    qr.add_data(f"{os.getenv('DOC_VERIFICATION_URL')}home?check={check_id}")
+    qr.make(fit=True)
+    stream = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(stream, "PNG")
+    return base64.b64encode(stream.getvalue()).decode('utf-8')
+
+
+def _old_signers(signers, check_id):
+    b64 = _old_qrcode_base64(check_id)
+    html = ''
+    for signer in signers:
+        if signer.get('is_signed') is True:
+            html += f"""<table style="width: 100%"><tr><td>{signer.get('position')}</td>
+                <td><img src="data:image/png;base64, {b64}" alt="qr-code"/></td><td>{signer.get('name')}</td></tr></table>"""
+        else:
+            html += f"""<table class="w-full"><tr><td>{signer.get('position')}</td>
+                <td><span></span></td><td>{signer.get('name')}</td></tr></table>"""
+    return html
+
+
+def _old_receivers(receivers):
+    html = ''
+    for receiver in receivers:
+        html += f"""<tr><td style="width: 30%;"></td><td><div>{receiver.get('name')}</div></td></tr>"""
+    return html
+
+
+def _old_html(env_code, check_id, signers, receivers):
+    env = EnvModel.objects.get(code=env_code)
+    context = {
+        'check_id': check_id,
+        'content': '<p>Lorem ipsum dolor sit amet.</p>',
+        'signers': _old_signers(signers, check_id),
+        'receivers': _old_receivers(receivers),
+        'company_name_uz': env.name_uz,
+        'company_name_ru': env.name_ru,
+        'company_logo': env.company_logo,
+        'logo_size': env.logo_size,
+    }
+    return get_template(TEMPLATE_NAME).render(context)
+
+
+def _new_html(env_code, check_id, signers, receivers):
+    config = BasePDFConfig()
+    assets = config.get_logo_and_name(env_code)
+    context = {
+        'check_id': check_id,
+        'content': '<p>Lorem ipsum dolor sit amet.</p>',
+        'signers': config.get_signers(signers, check_id),
+        'receivers': config.get_receivers(receivers),
+        'company_name_uz': assets.name_uz,
+        'company_name_ru': assets.name_ru,
+        'company_logo': assets.company_logo,
+        'logo_size': assets.logo_size,
+    }
+    return get_compiled_template(TEMPLATE_NAME).render(context)
+
+
+def _measure(label, func, documents):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.process_time()
+        for i in range(documents):
+            # a document is rendered on every signature, so check ids repeat
+            func(f'benchmark-check-{i % 20}')
+        elapsed = time.process_time() - started
+    print(f"{label:<24} {elapsed / documents * 1000:8.2f} ms CPU/pdf  {len(queries) / documents:5.1f} queries/pdf")
+
+
+def run(*args):
+    documents = int(args[0]) if args else 200
+    env_code = args[1] if len(args) > 1 else EnvModel.objects.values_list('code', flat=True).first()
+    if env_code is None:
+        print('No EnvModel rows, create one first')
+        return
+
+    signers = [{'is_signed': i % 2 == 0, 'position': f'Position {i}', 'name': f'Signer {i}'} for i in range(4)]
+    receivers = [{'name': f'Receiver {i}'} for i in range(3)]
+
+    _measure('old (per document)', lambda check_id: _old_html(env_code, check_id, signers, receivers), documents)
+    _measure('asset cache', lambda check_id: _new_html(env_code, check_id, signers, receivers), documents)
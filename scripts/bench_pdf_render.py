@@ -0,0 +1,81 @@
+"""
+Benchmark PDF rendering throughput of the Generate*ToPdf templates.
+
+    python manage.py runscript bench_pdf_render
+    python manage.py runscript bench_pdf_render --script-args 3 8
+
+Arguments: renders per template, concurrent requests.
+Each template is rendered with a synthetic context (nothing is uploaded or saved).
+Compares sequential `pdfkit.from_string` with the shared `PDFRenderer`.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pdfkit
+from django.template.loader import get_template
+
+from apps.pdf_kit import generate_letter
+from apps.pdf_kit.renderer import WKHTMLTOPDF_OPTIONS, PDF_RENDER_BACKEND, get_renderer
+
+TEMPLATES = {
+    generate_letter.GenerateInnerLetterToPdf: 'letters/service.html',
+    generate_letter.GenerateApplicationToPDF: 'letters/application.html',
+    generate_letter.GenerateTripNoticeToPdf: 'letters/trip_notice.html',
+    generate_letter.GenerateNoticeToPdf: 'letters/notice.html',
+    generate_letter.GenerateOrderToPdf: 'letters/hr_order.html',
+    generate_letter.GenerateDecreeToPdf: 'letters/decree.html',
+    generate_letter.GenerateLocalTripOrderToPdf: 'letters/local_trip_order.html',
+    generate_letter.GeneratePowerOfAttorneyToPdf: 'poa/power_of_attorney.html',
+    generate_letter.GenerateActToPdf: 'letters/act.html',
+    generate_letter.GenerateTripNoticeV2ToPdf: 'letters/trip_notice_v2.html',
+}
+
+
+def _html(template_name):
+    config = generate_letter.BasePDFConfig()
+    check_id = 'benchmark-check-id'
+    signers = [{'is_signed': i % 2 == 0, 'position': f'Position {i}', 'name': f'Signer {i}'} for i in range(4)]
+    context = {
+        'check_id': check_id,
+        'content': '<p>' + 'Lorem ipsum dolor sit amet. ' * 200 + '</p>',
+        'signers': config.get_signers(signers, check_id),
+        'negotiators': config.get_signers(signers, check_id),
+        'curator': config.get_signers(signers[:1], check_id),
+        'receivers': config.get_receivers([{'name': f'Receiver {i}'} for i in range(3)]),
+        'qr_b64': config.generate_qrcode_base64(check_id),
+        'qr_code': config.generate_qrcode_base64(check_id),
+        'company_name_uz': 'Company', 'company_name_ru': 'Company',
+        'register_number': '01-24/1', 'register_date': '01.01.2025',
+    }
+    return get_template(template_name).render(context)
+
+
+def _throughput(label, func, documents):
+    started = time.perf_counter()
+    func(documents)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:8.2f} s  {len(documents) / elapsed:7.2f} pdf/s")
+
+
+def run(*args):
+    per_template = int(args[0]) if args else 3
+    concurrency = int(args[1]) if len(args) > 1 else 8
+
+    documents = []
+    for cls, template_name in TEMPLATES.items():
+        html = _html(template_name)
+        documents.extend([html] * per_template)
+        started = time.perf_counter()
+        get_renderer().render(html)
+        print(f"{cls.__name__:<34} {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    print(f"\n{len(documents)} documents, backend {PDF_RENDER_BACKEND}, {concurrency} concurrent requests")
+    if PDF_RENDER_BACKEND == 'wkhtmltopdf':
+        _throughput('pdfkit.from_string, sequential (old)',
+                    lambda docs: [pdfkit.from_string(d, False, options=WKHTMLTOPDF_OPTIONS) for d in docs], documents)
+
+    def _concurrent(docs):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda d: get_renderer().render(d, wait=600), docs))
+
+    _throughput('renderer pool, concurrent', _concurrent, documents)
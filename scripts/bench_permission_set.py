@@ -0,0 +1,70 @@
+"""
+Benchmark authorization checks of a user with many roles.
+
+    python manage.py runscript bench_permission_set
+    python manage.py runscript bench_permission_set --script-args 50 20 1000
+
+Arguments: roles, permissions per role, checks.
+Compares the old per-role `exists()` queries of `User.has_permission` with the compiled,
+cached permission set. Roles, permissions and the user are created inside a transaction
+that is rolled back.
+"""
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.user.models import ProjectPermission, RoleModel, User
+from apps.user.permission_set import get_permission_set, has_permission
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func, checks):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(checks):
+            func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<30} {elapsed / checks * 1e6:10.1f} us/check  "
+          f"{len(ctx.captured_queries) / checks:6.2f} queries/check")
+
+
+def _old_has_permission(user, method, url_name):
+    if user.roles.exists():
+        for role in user.roles.all():
+            if role.permissions.filter(method=method, url_name=url_name).exists():
+                return True
+    if user.permissions.filter(method=method, url_name=url_name).exists():
+        return True
+    return False
+
+
+def run(*args):
+    roles = int(args[0]) if args else 50
+    per_role = int(args[1]) if len(args) > 1 else 20
+    checks = int(args[2]) if len(args) > 2 else 1000
+
+    try:
+        with transaction.atomic():
+            user = User.objects.create(username='bench_permission_set')
+            for r in range(roles):
+                role = RoleModel.objects.create(name=f'bench role {r}')
+                permissions = ProjectPermission.objects.bulk_create([
+                    ProjectPermission(name=f'bench {r}.{p}', method='GET', url_name=f'bench-{r}-{p}')
+                    for p in range(per_role)
+                ])
+                role.permissions.add(*permissions)
+            user.roles.add(*RoleModel.objects.filter(name__startswith='bench role '))
+            print(f"{roles} roles x {per_role} permissions")
+
+            # the worst case for the old check: a permission the user does not have
+            _measure('per-role queries (old)', lambda: _old_has_permission(user, 'POST', 'bench-0-0'), checks)
+            get_permission_set(user.id)
+            _measure('compiled permission set', lambda: has_permission(user.id, 'POST', 'bench-0-0'), checks)
+
+            raise _Rollback
+    except _Rollback:
+        pass
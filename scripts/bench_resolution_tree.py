@@ -0,0 +1,80 @@
+"""
+Benchmark the resolution tree of a document: recursive serializers vs. the flat builder.
+
+    python manage.py runscript bench_resolution_tree
+    python manage.py runscript bench_resolution_tree --script-args 500 5
+
+Arguments: number of tree nodes (assignments + assignees), tree depth.
+The synthetic document is created inside a transaction that is rolled back.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.docflow.models import BaseDocument, Reviewer, Assignment, Assignee
+from apps.docflow.serializers import ResolutionTreeSerializer
+from apps.docflow.services.resolution_tree import (
+    RESOLUTION_TREE_CACHE_KEY,
+    build_resolution_tree,
+    get_resolution_tree,
+)
+from apps.user.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(label, func):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms  {len(ctx.captured_queries):6} queries")
+    return result
+
+
+def _build_document(size, depth, user_ids):
+    document = BaseDocument.objects.create(title='benchmark')
+    reviewers = Reviewer.objects.bulk_create(
+        [Reviewer(document=document, user_id=user_ids[i % len(user_ids)]) for i in range(2)])
+
+    nodes = 0
+    level = Assignment.objects.bulk_create(
+        [Assignment(reviewer=r, content='root') for r in reviewers for _ in range(2)])
+    for current_depth in range(1, depth + 1):
+        Assignee.objects.bulk_create(
+            [Assignee(assignment=a, user_id=user_ids[(a.id + j) % len(user_ids)]) for a in level for j in range(2)])
+        nodes += len(level) * 3
+        if current_depth == depth or nodes >= size:
+            break
+        remaining = max((size - nodes) // 3, 1)
+        per_parent = max(remaining // (len(level) * (depth - current_depth)), 1)
+        level = Assignment.objects.bulk_create(
+            [Assignment(reviewer_id=a.reviewer_id, parent=a, content='child')
+             for a in level for _ in range(per_parent)][:remaining])
+    return document, nodes
+
+
+def run(*args):
+    size = int(args[0]) if args else 500
+    depth = int(args[1]) if len(args) > 1 else 5
+    user_ids = list(User.objects.values_list('id', flat=True)[:50])
+
+    try:
+        with transaction.atomic():
+            document, nodes = _build_document(size, depth, user_ids)
+            print(f"Document {document.id}: {nodes} nodes, depth {depth}")
+
+            old = _measure('recursive serializers (old)', lambda: ResolutionTreeSerializer(document).data)
+            new = _measure('flat builder', lambda: build_resolution_tree(document.id))
+            _measure('cached (cold)', lambda: get_resolution_tree(document.id))
+            _measure('cached (warm)', lambda: get_resolution_tree(document.id))
+
+            print(f"Same reviewers: {len(old['reviewers']) == len(new['reviewers'])}")
+            cache.delete(RESOLUTION_TREE_CACHE_KEY.format(document.id))
+            raise _Rollback
+    except _Rollback:
+        pass
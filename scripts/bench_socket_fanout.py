@@ -0,0 +1,54 @@
+"""
+Benchmark socket fan-out to many user groups against the configured Redis channel layer.
+
+    python manage.py runscript bench_socket_fanout
+    python manage.py runscript bench_socket_fanout --script-args 2000
+
+Registers one fake channel per user group, then compares the old per-key
+`async_to_sync(group_send)` loop with the batched `send_to_socket`.
+"""
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from utils.global_socket import send_to_socket
+
+
+def _old_send_to_socket(data, keys):
+    for key in keys:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(key, {'type': 'send.socket', 'message': data})
+
+
+def _measure(label, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+
+
+def run(*args):
+    members = int(args[0]) if args else 2000
+    channel_layer = get_channel_layer()
+    keys = [f'bench_user_{i}' for i in range(members)]
+
+    async def _setup():
+        channels = []
+        for key in keys:
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(key, channel)
+            channels.append(channel)
+        return channels
+
+    async def _teardown(channels):
+        for key, channel in zip(keys, channels):
+            await channel_layer.group_discard(key, channel)
+
+    channels = async_to_sync(_setup)()
+    try:
+        data = {'type': 'benchmark', 'text': 'x' * 200}
+        _measure(f'sequential ({members} keys)', lambda: _old_send_to_socket(data, keys))
+        _measure(f'batched ({members} keys)', lambda: send_to_socket(data, keys))
+    finally:
+        async_to_sync(_teardown)(channels)
@@ -0,0 +1,61 @@
+"""
+Benchmark the per-request cost of resolving the JWT user in the auth middleware.
+
+    python manage.py runscript bench_user_principal
+    python manage.py runscript bench_user_principal --script-args 2000
+
+Compares the previous middleware path, which validated the token and then loaded and
+checked the user row on every request, with the current middleware, which validates the
+token and checks the cached `UserPrincipal` used by the HTTP and WebSocket middlewares.
+"""
+import time
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.user.models import User
+from apps.user.principal import get_user_principal
+from config.middlewares.request_with_token import JWTAuthenticationMiddleware
+
+
+def _measure(label, func, requests):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(requests):
+            func()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed / requests * 1e6:9.1f} us/request  "
+          f"{len(ctx.captured_queries) / requests:5.2f} queries/request")
+
+
+def _old_middleware(request):
+    """
+    The previous per-request work: token validation, then the user row and its checks.
+    """
+    authentication = JWTTokenUserAuthentication()
+    token = AccessToken(authentication.get_raw_token(authentication.get_header(request)))
+    user = User.objects.get(id=token['user_id'])
+    request.user = user
+    return user.is_active and user.is_user_active and user.is_registered and (
+        not user.password_update_time or token.get('iat', 0) >= user.password_update_time)
+
+
+def run(*args):
+    requests = int(args[0]) if args else 1000
+    user = User.objects.filter(is_active=True).first()
+    if user is None:
+        print('No active user found')
+        return
+
+    token = str(AccessToken.for_user(user))
+    request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    middleware = JWTAuthenticationMiddleware(lambda r: HttpResponse())
+    get_user_principal(user.id)  # warm up the cache
+
+    _measure('user row per request (old)', lambda: _old_middleware(request), requests)
+    _measure('middleware with cached principal', lambda: middleware(request), requests)
+    _measure('principal lookup only', lambda: get_user_principal(user.id), requests)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+
+
+def _fresh_version() -> int:
+    # never a value an earlier stamp of the key had, so entries cached in a process
+    # under the old stamp are not served again after Redis lost the key
+    return time.time_ns()
+
+
+def get_versions(*keys) -> dict:
+    """
+    Reads version stamps with one cache round trip. A missing stamp is initialised to a
+    fresh value instead of being read as 0, which earlier entries may have been cached under.
+    """
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh_version(), None)
+        # another process may have initialised the stamp first
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def get_version(key) -> int:
+    return get_versions(key)[key]
+
+
+def bump_version(key) -> None:
+    cache.add(key, _fresh_version(), None)
+    cache.incr(key)
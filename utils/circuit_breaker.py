@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds; then lets one trial call through and closes again if it succeeds.
+    Shared by the clients of external services (LDAP, E-IMZO) so that a dead service
+    fails requests immediately instead of tying up workers on timeouts.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def abandon(self):
+        """
+        Ends a call without an outcome; if it was the trial, the next call becomes the trial.
+        """
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
@@ -282,6 +282,22 @@ class CONSTANTS:
             'default': DEFAULT
         }
 
+    class SMS_STATUS:
+        PENDING = "pending"
+        SENT = "sent"
+        FAILED = "failed"
+
+        DEFAULT = None
+        CHOICES = (
+            (PENDING, _("pending")),
+            (SENT, _("sent")),
+            (FAILED, _("failed")),
+        )
+        AS_RESPONSE = {
+            'choices': [{"name": y, "code": x} for x, y in CHOICES],
+            'default': DEFAULT
+        }
+
     class ACTIONS:
         CREATED = "created"
         UPDATED = "updated"
@@ -348,6 +364,34 @@ class CONSTANTS:
                 'default': DEFAULT
             }
 
+        class SIGNING_STATUSES:
+            PENDING = "pending"
+            RUNNING = "running"
+            RETRYING = "retrying"
+            DONE = "done"
+            FAILED = "failed"
+
+            DEFAULT = PENDING
+            CHOICES = (
+                (PENDING, _("Pending")),
+                (RUNNING, _("Running")),
+                (RETRYING, _("Retrying")),
+                (DONE, _("Done")),
+                (FAILED, _("Failed")),
+            )
+
+        class VERSION_STORAGE:
+            PLAIN = "plain"
+            SNAPSHOT = "snapshot"
+            DELTA = "delta"
+
+            DEFAULT = PLAIN
+            CHOICES = (
+                (PLAIN, _("Plain")),
+                (SNAPSHOT, _("Snapshot")),
+                (DELTA, _("Delta")),
+            )
+
         class LINK_TYPES:
             IS_CHILD_OF = "is_child_of"
             IS_PARENT_OF = "is_parent_of"
@@ -0,0 +1,119 @@
+"""
+HTTP client for the E-IMZO timestamp and PKCS#7 verification services,
+shared by EDS login (`apps.user.e_imzo_auth`) and document signing (`apps.compose.services`).
+
+One keep-alive session per process with explicit connect/read timeouts, bounded retries
+of connection errors and 502/503/504, a circuit breaker and per-endpoint latency stats.
+Errors are raised as `requests` exceptions, so callers keep their existing handling.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.circuit_breaker import CircuitBreaker
+from utils.latency import LatencyStats
+
+# seconds to open a connection and to wait for a response
+E_IMZO_CONNECT_TIMEOUT = float(os.getenv('E_IMZO_CONNECT_TIMEOUT', 3))
+E_IMZO_READ_TIMEOUT = float(os.getenv('E_IMZO_READ_TIMEOUT', 15))
+# retries of connection errors and 502/503/504 responses, with exponential backoff
+E_IMZO_RETRIES = int(os.getenv('E_IMZO_RETRIES', 2))
+E_IMZO_BACKOFF = float(os.getenv('E_IMZO_BACKOFF', 0.2))
+# keep-alive connections per process
+E_IMZO_POOL_SIZE = int(os.getenv('E_IMZO_POOL_SIZE', 10))
+# consecutive failed calls that open the circuit, and seconds until a trial call
+E_IMZO_FAILURE_THRESHOLD = int(os.getenv('E_IMZO_FAILURE_THRESHOLD', 5))
+E_IMZO_RESET_TIMEOUT = float(os.getenv('E_IMZO_RESET_TIMEOUT', 30))
+# calls slower than this many seconds are logged
+E_IMZO_SLOW_CALL = float(os.getenv('E_IMZO_SLOW_CALL', 2))
+
+
+class SignatureServiceUnavailable(requests.exceptions.ConnectionError):
+    """
+    The circuit is open: E-IMZO failed repeatedly and is not called until the reset timeout passes.
+    """
+
+
+class EImzoClient:
+
+    def __init__(self, connect_timeout=E_IMZO_CONNECT_TIMEOUT, read_timeout=E_IMZO_READ_TIMEOUT,
+                 retries=E_IMZO_RETRIES, pool_size=E_IMZO_POOL_SIZE, breaker=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker(E_IMZO_FAILURE_THRESHOLD, E_IMZO_RESET_TIMEOUT)
+        self.stats = LatencyStats()
+
+        # timestamping and verification have no side effects, so POSTs are safe to retry;
+        # a read timeout is not retried, it already held the worker for the whole read timeout
+        retry = Retry(
+            total=retries,
+            read=False,
+            backoff_factor=E_IMZO_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, endpoint, url, data, headers) -> dict:
+        if not self.breaker.allow():
+            raise SignatureServiceUnavailable('E-IMZO service is unavailable')
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+            ok = True
+            return result
+        except requests.exceptions.HTTPError as e:
+            # a 4xx is an answer about the request, not a sign that the service is down
+            if e.response is not None and e.response.status_code < 500:
+                ok = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats.record(endpoint, elapsed, ok)
+            if ok:
+                self.breaker.success()
+            else:
+                self.breaker.failure()
+            if elapsed > E_IMZO_SLOW_CALL:
+                logging.warning(f"E-IMZO {endpoint} took {elapsed:.2f}s")
+
+    def attach_timestamp(self, pkcs7, headers) -> dict:
+        return self.post('timestamp', os.getenv('TIMESTAMP_URL'), pkcs7, headers)
+
+    def verify_attached(self, pkcs7, headers) -> dict:
+        return self.post('verify', os.getenv('VERIFY_ATTACHED'), pkcs7, headers)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_e_imzo_client() -> EImzoClient:
+    # keyed by pid so that forked workers never share a parent's sockets
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(pid)
+            if client is None:
+                client = _clients[pid] = EImzoClient()
+    return client
+
+
+def reset_e_imzo_client():
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
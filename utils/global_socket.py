@@ -1,8 +1,32 @@
+import asyncio
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from utils.constants import CONSTANTS
 
+# Upper bound of concurrent group sends for channel layers without `group_send_many`
+MAX_CONCURRENT_GROUP_SENDS = 100
+
+
+async def group_send_many(channel_layer, keys, event) -> None:
+    """
+    Sends one event to many groups inside a single event loop.
+    Uses the layer's own `group_send_many` when it has one, otherwise runs
+    the `group_send` calls concurrently with a bounded fan-out.
+    """
+    if hasattr(channel_layer, 'group_send_many'):
+        await channel_layer.group_send_many(keys, event)
+        return
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_GROUP_SENDS)
+
+    async def _send(key):
+        async with semaphore:
+            await channel_layer.group_send(key, event)
+
+    await asyncio.gather(*(_send(key) for key in keys))
+
 
 def send_to_socket(data, keys=None) -> None:
     """
@@ -17,18 +41,15 @@ def send_to_socket(data, keys=None) -> None:
         if not isinstance(keys, (list, tuple)):
             keys = [keys]
 
-        sent_keys = set()
-        for key in keys:
-            if key not in sent_keys:
-                sent_keys.add(key)
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    key,
-                    {
-                        'type': 'send.socket',
-                        'message': data
-                    }
-                )
+        channel_layer = get_channel_layer()
+        async_to_sync(group_send_many)(
+            channel_layer,
+            list(dict.fromkeys(keys)),
+            {
+                'type': 'send.socket',
+                'message': data
+            }
+        )
 
 
 def send_to_user_socket(message, *user_ids):
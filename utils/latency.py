@@ -0,0 +1,41 @@
+import math
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """
+    Call counts, errors and latency percentiles of the last `window` calls per endpoint.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            calls = self._calls.setdefault(endpoint, {'count': 0, 'errors': 0, 'latencies': deque(maxlen=self.window)})
+            calls['count'] += 1
+            calls['errors'] += 0 if ok else 1
+            calls['latencies'].append(seconds)
+
+    @staticmethod
+    def _percentile(latencies, q):
+        if not latencies:
+            return None
+        return round(latencies[math.ceil(len(latencies) * q) - 1] * 1000, 2)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for endpoint, calls in self._calls.items():
+                latencies = sorted(calls['latencies'])
+                result[endpoint] = {
+                    'count': calls['count'],
+                    'errors': calls['errors'],
+                    'p50_ms': self._percentile(latencies, 0.5),
+                    'p95_ms': self._percentile(latencies, 0.95),
+                    'max_ms': self._percentile(latencies, 1),
+                }
+            return result